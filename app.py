@@ -2,10 +2,15 @@ import streamlit as st
 import os
 from utils.auth import authenticate_user, register_user, hash_password
 from utils.database import init_db, add_user_to_db, get_user_from_db
+from utils.model import start_model_warmup
 
 # Pastikan database terinisialisasi saat aplikasi dimulai
 init_db()
 
+# Model dimuat dan dipanaskan di thread latar belakang selagi pengguna login,
+# sehingga halaman login tampil segera dan model sudah siap saat halaman deteksi dibuka
+start_model_warmup()
+
 # --- Konfigurasi Halaman Streamlit ---
 st.set_page_config(layout="wide", page_title="Deteksi Penyakit Daun Melon")
 
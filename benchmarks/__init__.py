@@ -0,0 +1,2 @@
+# Suite benchmark offline (gambar sintetis, model stub, database sementara).
+# Jalankan dari root repo: python -m benchmarks.run
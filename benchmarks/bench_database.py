@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from utils import database
+from utils.database import (init_db, get_connection, save_detection, save_detection_records,
+                            get_user_detections, count_user_detections)
+
+DEFAULT_SIZES = (10_000, 100_000)
+BENCH_USERNAME = "bench_user"
+OTHER_USERS = 99
+INSERT_CHUNK = 50_000
+
+_DISEASE_CHOICES = (["Daun Sehat"], ["Downy_Mildew (87.3%)"], ["Virus_Gemini (64.0%)"],
+                    ["Downy_Mildew (71.5%)", "Virus_Gemini (55.2%)"])
+
+
+@contextmanager
+def temporary_database():
+    """
+    Mengalihkan utils.database ke file SQLite sementara (pool ikut dibuat ulang),
+    lalu mengembalikan DB_NAME semula dan menghapus file sementaranya.
+    """
+    original_db_name = database.DB_NAME
+    temp_dir = tempfile.mkdtemp(prefix="melon_bench_")
+    database.DB_NAME = os.path.join(temp_dir, "bench.db")
+    try:
+        init_db()
+        yield database.DB_NAME
+    finally:
+        database._get_pool().close_all()
+        database.DB_NAME = original_db_name
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def populate(rows, seed=0):
+    """
+    Mengisi database aktif dengan `rows` deteksi sintetis yang tersebar selama setahun
+    untuk 100 pengguna; `bench_user` memiliki sekitar 10% baris.
+    """
+    rng = random.Random(seed)
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO users (username, password_hash, fullname, email) VALUES (?, ?, ?, ?)",
+                         [(BENCH_USERNAME, "x", "Bench", "bench@example.com")] +
+                         [(f"user_{i}", "x", f"User {i}", f"user_{i}@example.com") for i in range(OTHER_USERS)])
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+
+    for chunk_start in range(0, rows, INSERT_CHUNK):
+        chunk = []
+        for i in range(chunk_start, min(rows, chunk_start + INSERT_CHUNK)):
+            user_id = user_ids[0] if rng.random() < 0.1 else rng.choice(user_ids)
+            day, second = rng.randrange(365), rng.randrange(86400)
+            chunk.append((user_id, f"2025-{1 + day // 31 % 12:02d}-{1 + day % 28:02d} "
+                                   f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+                          f"temp_images/synthetic_{i}.jpg", json.dumps(rng.choice(_DISEASE_CHOICES)),
+                          rng.random(), "Rekomendasi sintetis.", 1920, 1080))
+        with get_connection() as conn:
+            conn.executemany("INSERT INTO detections (user_id, detection_date, image_path, diseases, confidence, "
+                             "recommendations, frame_width, frame_height) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+    with get_connection() as conn:
+        conn.execute("ANALYZE")
+
+def _synthetic_record(i):
+    boxes = [(1, 0.87, 10.0, 20.0, 200.0, 220.0), (2, 0.64, 300.0, 310.0, 420.0, 500.0)]
+    return {"username": BENCH_USERNAME, "image_path": f"temp_images/bench_write_{i}.jpg",
+            "diseases": ["Downy_Mildew (87.0%)", "Virus_Gemini (64.0%)"], "confidence": 0.755,
+            "recommendations": "Rekomendasi sintetis.", "boxes": boxes,
+            "class_names": {1: "Downy_Mildew", 2: "Virus_Gemini"}, "frame_size": (1920, 1080)}
+
+def _timed(fn, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+def run(sizes=DEFAULT_SIZES, writes=200, reads=50, page_size=20):
+    """
+    Throughput `save_detection` / `save_detection_records` dan latensi
+    `get_user_detections` (halaman pertama dan halaman dalam lewat cursor keyset)
+    pada database sintetis berukuran `sizes`.
+    """
+    results = []
+    for rows in sizes:
+        with temporary_database():
+            started = time.perf_counter()
+            populate(rows)
+            populate_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for i in range(writes):
+                record = _synthetic_record(i)
+                save_detection(BENCH_USERNAME, record["image_path"], record["diseases"], record["confidence"],
+                               record["recommendations"], boxes=record["boxes"],
+                               class_names=record["class_names"], frame_size=record["frame_size"])
+            single_write_s = time.perf_counter() - started
+
+            batch = [_synthetic_record(writes + i) for i in range(writes)]
+            started = time.perf_counter()
+            save_detection_records(batch)
+            batch_write_s = time.perf_counter() - started
+
+            user_rows = count_user_detections(BENCH_USERNAME)
+            with get_connection() as conn:
+                deep_cursor = conn.execute(
+                    "SELECT d.detection_date, d.id FROM detections d JOIN users u ON u.id = d.user_id "
+                    "WHERE u.username = ? ORDER BY d.detection_date DESC, d.id DESC LIMIT 1 OFFSET ?",
+                    (BENCH_USERNAME, user_rows // 2)).fetchone()
+
+            results.append({
+                "rows": rows,
+                "user_rows": user_rows,
+                "populate_s": populate_s,
+                "save_detection_per_s": writes / single_write_s,
+                "save_detection_records_per_s": writes / batch_write_s,
+                "first_page_ms": _timed(lambda: get_user_detections(BENCH_USERNAME, limit=page_size + 1), reads),
+                "deep_page_ms": _timed(lambda: get_user_detections(BENCH_USERNAME, limit=page_size + 1,
+                                                                   before_cursor=tuple(deep_cursor)), reads),
+                "count_ms": _timed(lambda: count_user_detections(BENCH_USERNAME), reads),
+            })
+            print(f"  db rows={rows:<8} save={results[-1]['save_detection_per_s']:.0f}/s "
+                  f"batch={results[-1]['save_detection_records_per_s']:.0f}/s "
+                  f"halaman1={results[-1]['first_page_ms']:.2f} ms halaman-dalam={results[-1]['deep_page_ms']:.2f} ms")
+    return {"writes": writes, "reads": reads, "page_size": page_size, "results": results}
@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+
+from utils.engine import MelonDiseaseEngine
+from benchmarks.stub_model import StubYOLO, synthetic_leaf_images
+
+DEFAULT_RESOLUTIONS = (320, 416, 512, 640)
+DEFAULT_BATCH_SIZES = (1, 4, 8)
+
+
+def _percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+    }
+
+def run(resolutions=DEFAULT_RESOLUTIONS, batch_sizes=DEFAULT_BATCH_SIZES, iterations=20,
+        image_size=(1920, 1080), model_path=None, backend="pytorch"):
+    """
+    Latensi inferensi per gambar untuk setiap kombinasi imgsz x ukuran batch, ditambah
+    postprocess dan annotate. Tanpa `model_path` dipakai `StubYOLO` (sepenuhnya offline).
+    """
+    if model_path:
+        engine = MelonDiseaseEngine(model_path, backend=backend)
+        engine.load()
+    else:
+        engine = MelonDiseaseEngine(None, model=StubYOLO())
+    images = synthetic_leaf_images(max(batch_sizes), *image_size)
+
+    results = []
+    for imgsz in resolutions:
+        for batch_size in batch_sizes:
+            batch = images[:batch_size]
+            list(engine.infer_batch(batch, batch_size=batch_size, imgsz=imgsz))  # pemanasan
+
+            per_image_ms = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                if batch_size == 1:
+                    engine.infer(batch[0], use_cache=False, imgsz=imgsz)
+                else:
+                    list(engine.infer_batch(batch, batch_size=batch_size, imgsz=imgsz))
+                per_image_ms.append((time.perf_counter() - started) * 1000 / batch_size)
+
+            raw_detections = engine.infer(batch[0], use_cache=False, imgsz=imgsz)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                summary = engine.postprocess(raw_detections, 0.5)
+            postprocess_ms = (time.perf_counter() - started) * 1000 / iterations
+            started = time.perf_counter()
+            for _ in range(iterations):
+                engine.annotate(batch[0], summary)
+            annotate_ms = (time.perf_counter() - started) * 1000 / iterations
+
+            results.append({
+                "imgsz": imgsz,
+                "batch_size": batch_size,
+                "infer_per_image": _percentiles(per_image_ms),
+                "images_per_s": 1000.0 / float(np.mean(per_image_ms)),
+                "postprocess_ms": postprocess_ms,
+                "annotate_ms": annotate_ms,
+            })
+            print(f"  infer imgsz={imgsz:<4} batch={batch_size:<2} "
+                  f"{results[-1]['infer_per_image']['mean_ms']:.2f} ms/gambar")
+    return {"model": model_path or "stub", "backend": backend if model_path else "stub",
+            "image_size": list(image_size), "iterations": iterations, "results": results}
@@ -0,0 +1,67 @@
+import os
+import time
+from contextlib import contextmanager
+
+from benchmarks.bench_database import temporary_database, populate, BENCH_USERNAME
+from benchmarks.stub_model import StubYOLO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAGES = ("pages/history.py", "pages/main_app.py")
+
+
+@contextmanager
+def stub_engine():
+    """
+    Memasang StubYOLO sebagai model utils.model.ENGINE dan menandai model sudah siap,
+    sehingga halaman deteksi tidak memulai warm-up (memuat best.pt lewat Ultralytics).
+    Model dan status semula dikembalikan setelahnya.
+    """
+    from utils import model
+
+    original_model, original_remote = model.ENGINE.model, model.ENGINE.remote
+    original_state = model.model_status()
+    model.ENGINE.model, model.ENGINE.remote = StubYOLO(), None
+    model._set_model_state(status=model.MODEL_STATUS_READY, error=None, load_ms=0.0)
+    try:
+        yield model.ENGINE
+    finally:
+        model.ENGINE.model, model.ENGINE.remote = original_model, original_remote
+        model._set_model_state(**original_state)
+
+def _run_page(page, runs, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    timings_ms = []
+    exceptions = []
+    for _ in range(runs):
+        app = AppTest.from_file(os.path.join(REPO_ROOT, page), default_timeout=timeout)
+        app.session_state["logged_in"] = True
+        app.session_state["username"] = BENCH_USERNAME
+        app.session_state["fullname"] = "Bench"
+        started = time.perf_counter()
+        app.run()
+        timings_ms.append((time.perf_counter() - started) * 1000)
+        exceptions = [str(exception.value) for exception in app.exception]
+    return timings_ms, exceptions
+
+def run(pages=DEFAULT_PAGES, rows=10_000, runs=5, timeout=120):
+    """
+    Waktu eksekusi skrip halaman end-to-end dengan `streamlit.testing.v1.AppTest`
+    pada database sintetis berisi `rows` deteksi, dengan model stub (offline). Run pertama
+    (dingin, termasuk import) dilaporkan terpisah dari run berikutnya.
+    """
+    results = []
+    with temporary_database(), stub_engine():
+        populate(rows)
+        for page in pages:
+            timings_ms, exceptions = _run_page(page, runs, timeout)
+            warm = timings_ms[1:] or timings_ms
+            results.append({
+                "page": page,
+                "cold_ms": timings_ms[0],
+                "warm_mean_ms": sum(warm) / len(warm),
+                "warm_min_ms": min(warm),
+                "exceptions": exceptions,
+            })
+            print(f"  page {page:<20} dingin={timings_ms[0]:.0f} ms hangat={results[-1]['warm_mean_ms']:.0f} ms")
+    return {"rows": rows, "runs": runs, "results": results}
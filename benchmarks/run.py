@@ -0,0 +1,69 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks import bench_database, bench_inference, bench_pages
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+SUITES = ("inference", "database", "pages")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """
+    Menjalankan suite benchmark dan menulis hasilnya ke JSON untuk dibandingkan antar-run:
+
+        python -m benchmarks.run
+        python -m benchmarks.run --suites database --db-sizes 10000 100000 1000000
+    """
+    parser = argparse.ArgumentParser(description="Benchmark inferensi, database dan halaman Streamlit.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--resolutions", nargs="+", type=int, default=list(bench_inference.DEFAULT_RESOLUTIONS))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(bench_inference.DEFAULT_BATCH_SIZES))
+    parser.add_argument("--iterations", type=int, default=20, help="Pengulangan per kombinasi inferensi.")
+    parser.add_argument("--model", help="File bobot asli (default: model stub offline).")
+    parser.add_argument("--backend", default="pytorch", help="Backend untuk --model (lihat utils/backends.py).")
+    parser.add_argument("--db-sizes", nargs="+", type=int, default=list(bench_database.DEFAULT_SIZES),
+                        help="Jumlah baris database sintetis (10k-1M).")
+    parser.add_argument("--page-rows", type=int, default=10_000, help="Jumlah baris database untuk benchmark halaman.")
+    parser.add_argument("--page-runs", type=int, default=5)
+    parser.add_argument("--output", help="File JSON hasil (default: benchmarks/results/<waktu>.json).")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "suites": {},
+    }
+    if "inference" in args.suites:
+        print("Inferensi:")
+        report["suites"]["inference"] = bench_inference.run(args.resolutions, args.batch_sizes, args.iterations,
+                                                            model_path=args.model, backend=args.backend)
+    if "database" in args.suites:
+        print("Database:")
+        report["suites"]["database"] = bench_database.run(args.db_sizes)
+    if "pages" in args.suites:
+        print("Halaman:")
+        report["suites"]["pages"] = bench_pages.run(rows=args.page_rows, runs=args.page_runs)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan ke {output}")
+
+
+if __name__ == "__main__":
+    main()
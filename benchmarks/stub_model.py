@@ -0,0 +1,82 @@
+import numpy as np
+import cv2
+
+# Nama kelas sama seperti model best.pt, agar postprocess/annotate berjalan seperti aslinya
+STUB_CLASS_NAMES = {0: "Daun Sehat", 1: "Downy_Mildew", 2: "Virus_Gemini"}
+
+
+class _StubBoxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+
+class _StubResult:
+    def __init__(self, boxes, names):
+        self.boxes = boxes
+        self.names = names
+
+
+class StubYOLO:
+    """
+    Pengganti model YOLO untuk benchmark tanpa file bobot. Antarmukanya sama dengan
+    yang dipakai `MelonDiseaseEngine` (dipanggil dengan gambar atau list gambar, plus
+    conf/imgsz/verbose; hasil punya boxes.xyxy/conf/cls dan names).
+
+    Biayanya mengikuti preprocessing Ultralytics yang sebenarnya (letterbox ke imgsz,
+    normalisasi float32, CHW), sehingga waktu tetap berskala dengan resolusi dan ukuran
+    batch. Kotak yang dihasilkan deterministik (seed tetap) agar hasil bisa diulang.
+    """
+
+    def __init__(self, boxes_per_image=8, seed=0):
+        self.boxes_per_image = boxes_per_image
+        self.names = dict(STUB_CLASS_NAMES)
+        self._rng = np.random.default_rng(seed)
+
+    def __call__(self, source, conf=0.25, imgsz=640, verbose=False):
+        images = source if isinstance(source, list) else [source]
+        batch = np.stack([self._letterbox(image, imgsz) for image in images])
+        # "Forward pass" murah yang tetap menyentuh seluruh tensor batch
+        batch.mean(axis=(2, 3))
+        return [self._fake_result(image, conf) for image in images]
+
+    @staticmethod
+    def _letterbox(image, imgsz):
+        height, width = image.shape[:2]
+        scale = min(imgsz / height, imgsz / width)
+        resized = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))))
+        canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+        canvas[:resized.shape[0], :resized.shape[1]] = resized
+        return canvas.transpose(2, 0, 1).astype(np.float32) / 255.0
+
+    def _fake_result(self, image, conf):
+        height, width = image.shape[:2]
+        count = self.boxes_per_image
+        top_left = self._rng.uniform(0, 0.7, size=(count, 2)) * (width, height)
+        size = self._rng.uniform(0.05, 0.3, size=(count, 2)) * (width, height)
+        xyxy = np.concatenate([top_left, top_left + size], axis=1).astype(np.float32)
+        scores = self._rng.uniform(0.01, 1.0, size=count).astype(np.float32)
+        classes = self._rng.integers(0, len(self.names), size=count).astype(np.float32)
+        keep = scores >= conf
+        return _StubResult(_StubBoxes(xyxy[keep], scores[keep], classes[keep]), self.names)
+
+
+def synthetic_leaf_images(count, width, height, seed=0):
+    """
+    Gambar RGB uint8 sintetis (latar hijau bertekstur dengan bercak), cukup mirip foto
+    daun agar ukuran encode JPEG dan biaya decode realistis.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        base = np.empty((height, width, 3), dtype=np.uint8)
+        base[..., 0] = rng.integers(30, 90, size=(height, width), dtype=np.uint8)
+        base[..., 1] = rng.integers(110, 200, size=(height, width), dtype=np.uint8)
+        base[..., 2] = rng.integers(20, 70, size=(height, width), dtype=np.uint8)
+        base = cv2.GaussianBlur(base, (7, 7), 0)
+        for _ in range(int(rng.integers(3, 10))):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            cv2.circle(base, center, int(rng.integers(5, max(6, min(width, height) // 12))), (150, 140, 60), -1)
+        images.append(base)
+    return images
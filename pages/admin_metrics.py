@@ -0,0 +1,97 @@
+import streamlit as st
+import pandas as pd
+
+from utils.auth import logout_user, is_admin
+from utils.metrics import METRICS, METRICS_FILE, METRICS_PORT, start_metrics_exporters
+from utils.persistence import get_write_queue
+from utils.session_store import SESSION_STORE
+from utils.model import model_status, MODEL_STATUS_READY, MODEL_STATUS_FAILED
+
+# --- Konfigurasi Halaman Streamlit ---
+st.set_page_config(layout="wide", page_title="Metrik Performa")
+
+# --- Injeksi CSS Kustom (Perbaikan untuk Sidebar) ---
+st.markdown("""
+<style>
+/* HANYA Menyembunyikan daftar navigasi bawaan Streamlit */
+[data-testid="stSidebarNav"] {
+    display: none !important;
+}
+</style>
+""", unsafe_allow_html=True)
+
+# --- Verifikasi Login & Hak Admin ---
+if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
+    st.warning("Anda belum login. Silakan login terlebih dahulu.")
+    st.switch_page("app.py")
+
+if not is_admin(st.session_state.get('username')):
+    st.error("Halaman ini hanya untuk admin.")
+    if st.button("Kembali ke Deteksi 🌿"):
+        st.switch_page("pages/main_app.py")
+    st.stop()
+
+start_metrics_exporters()
+
+# --- Sidebar ---
+with st.sidebar:
+    st.markdown("### 🌿🍈 **Navigasi Aplikasi**")
+    st.write(f"**Halo, {st.session_state['fullname']}!** 👋")
+    st.markdown("---")
+    if st.button("Deteksi Baru 🌿", use_container_width=True):
+        st.switch_page("pages/main_app.py")
+    if st.button("Riwayat Deteksi Saya 📅", use_container_width=True):
+        st.switch_page("pages/history.py")
+    st.markdown("---")
+    if st.button("Logout 🚪", use_container_width=True):
+        logout_user()
+
+st.title("Metrik Performa Pipeline Deteksi")
+st.write("Durasi per tahap (jendela bergulir sampel terakhir) dan counter sejak server dimulai.")
+
+if st.button("Muat Ulang 🔄"):
+    st.rerun()
+
+status = model_status()
+if status["status"] == MODEL_STATUS_READY:
+    st.success(f"Model siap (muat + warm-up {status['load_ms'] / 1000:.1f} detik).")
+elif status["status"] == MODEL_STATUS_FAILED:
+    st.error(status["error"])
+else:
+    st.info(f"Status model: {status['status']}")
+
+snapshot = METRICS.snapshot()
+
+st.subheader("Durasi per Tahap (ms)")
+if snapshot["stages"]:
+    stage_rows = [{"Tahap": stage, "Jumlah": stats["count"], "Rata-rata": stats["mean_ms"],
+                   "p50": stats["p50_ms"], "p95": stats["p95_ms"], "p99": stats["p99_ms"]}
+                  for stage, stats in snapshot["stages"].items()]
+    st.dataframe(pd.DataFrame(stage_rows).set_index("Tahap").round(2), use_container_width=True)
+else:
+    st.write("Belum ada data. Lakukan deteksi terlebih dahulu.")
+
+st.subheader("Counter")
+if snapshot["counters"]:
+    st.dataframe(pd.DataFrame(list(snapshot["counters"].items()), columns=["Counter", "Nilai"]).set_index("Counter"),
+                 use_container_width=True)
+write_queue_stats = get_write_queue().stats()
+st.caption(f"Antrean simpan: {write_queue_stats['pending']} menunggu, {write_queue_stats['written']} tertulis, "
+           f"{write_queue_stats['failed']} gagal")
+
+st.subheader("Ekspor Prometheus")
+exports = []
+if METRICS_FILE:
+    exports.append(f"file `{METRICS_FILE}`")
+if METRICS_PORT:
+    exports.append(f"`http://127.0.0.1:{METRICS_PORT}/metrics`")
+st.write("Aktif: " + ", ".join(exports) if exports else
+         "Tidak aktif. Atur `MELON_METRICS_FILE` dan/atau `MELON_METRICS_PORT` untuk mengekspor metrik.")
+prometheus_text = METRICS.prometheus_text()
+st.download_button("Unduh metrics.prom", prometheus_text, file_name="metrics.prom", mime="text/plain")
+with st.expander("Lihat teks Prometheus"):
+    st.code(prometheus_text, language="text")
+store_stats = SESSION_STORE.stats()
+st.caption(f"Session store: {store_stats['memory_bytes'] / 2**20:.1f} MB di memori, "
+           f"{store_stats['disk_bytes'] / 2**20:.1f} MB di disk, {len(store_stats['sessions'])} sesi, "
+           f"{store_stats['spills']} spill, {store_stats['evictions']} dibuang")
@@ -1,12 +1,28 @@
 import streamlit as st
 import pandas as pd # For displaying data in a table format
 import os # To check for image file existence
-from PIL import Image # To display images
+from PIL import Image, ImageOps # To display images
+import numpy as np # To redraw stored detection boxes on history images
 import json # To parse the diseases JSON string from the database
+import datetime # For the dashboard period filter
 
 # --- Import Utility Modules ---
 from utils.auth import logout_user # Function for logging out
-from utils.database import get_user_detections # Function to retrieve user's detection history
+from utils.database import (get_user_detections, count_user_detections, detection_cursor, update_detection_thumbnails,
+                            get_detection_boxes, get_daily_stats) # Detection history, stored boxes and daily stats
+from utils.thumbnails import create_thumbnails # Thumbnails for detections saved before thumbnails existed
+from utils.engine import MelonDiseaseEngine, box_rows_to_raw_detections # Annotation only, no YOLO model is loaded
+
+# Number of detections loaded per history page
+HISTORY_PAGE_SIZE = 20
+# Dashboard periods (label -> number of days)
+DASHBOARD_PERIODS = {"30 hari terakhir": 30, "90 hari terakhir": 90, "6 bulan terakhir": 182, "1 tahun terakhir": 365}
+
+# Number of thumbnails per row in the history gallery
+GALLERY_COLUMNS = 5
+
+# Engine used only for thresholding and drawing stored boxes; it never loads the model
+ANNOTATION_ENGINE = MelonDiseaseEngine(model_path=None)
 
 # --- Streamlit Page Configuration ---
 st.set_page_config(layout="wide", page_title="Riwayat Deteksi Melon")
@@ -105,20 +121,56 @@ with st.sidebar:
 st.title("Riwayat Deteksi Penyakit Anda")
 st.write("Berikut adalah daftar deteksi penyakit daun melon yang pernah Anda lakukan.")
 
-# Retrieve detection history for the current user
-user_detections = get_user_detections(st.session_state['username'])
+# --- Disease Trend Dashboard ---
+# Reads only the detection_daily_stats rollup, so it renders in constant time regardless of history size.
+with st.expander("📈 Dasbor Tren Penyakit", expanded=False):
+    period_label = st.selectbox("Periode", list(DASHBOARD_PERIODS), key="dashboard_period")
+    # Rollup days are UTC (SQLite date(detection_date) of CURRENT_TIMESTAMP), so the window is too
+    today_utc = datetime.datetime.now(datetime.timezone.utc).date()
+    start_day = (today_utc - datetime.timedelta(days=DASHBOARD_PERIODS[period_label])).isoformat()
+    daily_stats = get_daily_stats(st.session_state['username'], start_day=start_day)
+
+    if daily_stats:
+        stats_df = pd.DataFrame(daily_stats, columns=["Tanggal", "Kelas", "Jumlah", "Keyakinan Rata-rata"])
+        stats_df["Tanggal"] = pd.to_datetime(stats_df["Tanggal"])
+
+        st.write("**Jumlah deteksi per kelas per hari**")
+        st.line_chart(stats_df.pivot_table(index="Tanggal", columns="Kelas", values="Jumlah", aggfunc="sum", fill_value=0))
+
+        # Per-class totals; the mean confidence is weighted by the daily counts
+        stats_df["Total Keyakinan"] = stats_df["Jumlah"] * stats_df["Keyakinan Rata-rata"]
+        summary_df = stats_df.groupby("Kelas")[["Jumlah", "Total Keyakinan"]].sum()
+        summary_df["Keyakinan Rata-rata"] = (summary_df["Total Keyakinan"] / summary_df["Jumlah"]).map(lambda v: f"{v*100:.1f}%")
+        st.dataframe(summary_df.drop(columns=["Total Keyakinan"]), use_container_width=True)
+    else:
+        st.write("Belum ada data deteksi pada periode ini.")
+
+# --- Pagination State ---
+# Keyset pagination: we keep a stack of cursors (detection_date, id), one per visited page,
+# so each page is a single indexed query no matter how large the history grows.
+if 'history_cursor_stack' not in st.session_state:
+    st.session_state['history_cursor_stack'] = [None] # Page 1 starts without a cursor
+
+total_detections = count_user_detections(st.session_state['username'])
+cursor_stack = st.session_state['history_cursor_stack']
+page_number = len(cursor_stack)
+
+# Fetch one extra row to know whether a next page exists
+page_rows = get_user_detections(st.session_state['username'], limit=HISTORY_PAGE_SIZE + 1, before_cursor=cursor_stack[-1])
+has_next_page = len(page_rows) > HISTORY_PAGE_SIZE
+user_detections = page_rows[:HISTORY_PAGE_SIZE]
 
 if user_detections:
-    # Prepare data for DataFrame display
+    # Prepare data for DataFrame display (current page only)
     df_data = []
     for det in user_detections:
-        detection_date, image_path, diseases_list, confidence, recommendations = det
+        diseases_list = det["diseases"]
         df_data.append({
-            "Tanggal Deteksi": detection_date,
-            "Gambar_Path": image_path, # Keep path for internal use, don't display directly
+            "Tanggal Deteksi": det["detection_date"],
+            "Gambar_Path": det["image_path"], # Keep path for internal use, don't display directly
             "Penyakit Terdeteksi": ", ".join(diseases_list) if isinstance(diseases_list, list) else diseases_list,
-            "Keyakinan Rata-rata": f"{confidence*100:.1f}%",
-            "Rekomendasi": recommendations
+            "Keyakinan Rata-rata": f"{det['confidence']*100:.1f}%",
+            "Rekomendasi": det["recommendations"]
         })
     
     df = pd.DataFrame(df_data)
@@ -126,37 +178,101 @@ if user_detections:
     # Display the table without the 'Gambar_Path' column initially
     st.dataframe(df.drop(columns=["Gambar_Path"]), use_container_width=True)
 
+    # Page navigation
+    total_pages = max(1, -(-total_detections // HISTORY_PAGE_SIZE))
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ Sebelumnya", use_container_width=True, disabled=page_number <= 1):
+            cursor_stack.pop()
+            st.rerun()
+    with col_info:
+        st.write(f"Halaman {page_number} dari {total_pages} ({total_detections} deteksi)")
+    with col_next:
+        if st.button("Berikutnya ➡️", use_container_width=True, disabled=not has_next_page):
+            cursor_stack.append(detection_cursor(user_detections[-1]))
+            st.rerun()
+
+    st.subheader("Galeri Riwayat")
+
+    # Thumbnail grid for the current page only; full-size images are never loaded here
+    for row_start in range(0, len(user_detections), GALLERY_COLUMNS):
+        gallery_cols = st.columns(GALLERY_COLUMNS)
+        for col, det in zip(gallery_cols, user_detections[row_start:row_start + GALLERY_COLUMNS]):
+            with col:
+                thumbnail_path = det["thumbnail_path"]
+                if (not thumbnail_path or not os.path.exists(thumbnail_path)) and os.path.exists(det["image_path"]):
+                    # Older detections: create the thumbnail once and remember it in the database
+                    try:
+                        thumbnail_path, preview_path = create_thumbnails(det["image_path"])
+                        update_detection_thumbnails(det["id"], thumbnail_path, preview_path)
+                        det["thumbnail_path"], det["preview_path"] = thumbnail_path, preview_path
+                    except Exception:
+                        thumbnail_path = None
+                if thumbnail_path and os.path.exists(thumbnail_path):
+                    st.image(thumbnail_path, use_container_width=True)
+                else:
+                    st.write("🖼️ Gambar tidak tersedia")
+                st.caption(f"{det['detection_date']}\n\n{', '.join(det['diseases'])}")
+                if st.button("Lihat", key=f"history_view_{det['id']}", use_container_width=True):
+                    st.session_state['history_selected_id'] = det["id"]
+
     st.subheader("Detail Gambar Riwayat")
-    
-    # Allow user to select an image from their history to view details
-    image_paths_for_selection = df["Gambar_Path"].tolist()
-    if image_paths_for_selection:
-        selected_image_path = st.selectbox("Pilih gambar dari riwayat untuk melihat detailnya:", image_paths_for_selection)
-        
-        if selected_image_path:
-            try:
-                # Display the selected image
-                st.image(selected_image_path, caption=f"Gambar: {os.path.basename(selected_image_path)}", use_column_width=True)
-                
-                # Find the corresponding detection details
-                selected_detection = df[df["Gambar_Path"] == selected_image_path].iloc[0]
-                
-                # Display details from the selected detection
-                st.write(f"**Tanggal Deteksi:** {selected_detection['Tanggal Deteksi']}")
-                st.write(f"**Penyakit Terdeteksi:** {selected_detection['Penyakit Terdeteksi']}")
-                st.write(f"**Keyakinan Rata-rata:** {selected_detection['Keyakinan Rata-rata']}")
-
-                # --- BAGIAN INI DIMODIFIKASI ---
-                if selected_detection['Rekomendasi']: # Kolom ini sekarang berisi 'keterangan_text'
-                    st.info(f"**Keterangan:** {selected_detection['Rekomendasi']}") # Ubah label
-                # --- AKHIR MODIFIKASI ---
-
-            except FileNotFoundError:
-                st.error("Gambar tidak ditemukan. Mungkin telah dihapus dari server.")
-            except Exception as e:
-                st.error(f"Terjadi kesalahan saat memuat detail gambar: {e}")
+
+    selected_detection = next((det for det in user_detections
+                               if det["id"] == st.session_state.get('history_selected_id')), None)
+    if selected_detection is None:
+        st.write("Klik **Lihat** pada salah satu gambar di galeri untuk melihat detailnya.")
     else:
-        st.write("Tidak ada gambar yang dapat dipilih untuk detail.")
+        try:
+            # Show the medium-size preview; the full-size original is only loaded on request
+            display_path = selected_detection["preview_path"]
+            if not display_path or not os.path.exists(display_path):
+                display_path = selected_detection["image_path"]
+            display_caption = f"Gambar: {os.path.basename(selected_detection['image_path'])}"
+
+            box_rows, class_names = get_detection_boxes(selected_detection["id"])
+            if box_rows and selected_detection["frame_size"]:
+                # Redraw (and optionally re-threshold) the stored boxes, scaled to the displayed image
+                history_threshold = st.slider(
+                    "Ambang Batas Anotasi",
+                    min_value=0,
+                    max_value=100,
+                    value=int(st.session_state.get('confidence_threshold', 0.5) * 100),
+                    step=5,
+                    format="%d%%",
+                    key="history_annotation_threshold"
+                ) / 100.0
+                with Image.open(display_path) as display_image:
+                    display_array = np.array(ImageOps.exif_transpose(display_image).convert('RGB'))
+                scale = display_array.shape[1] / selected_detection["frame_size"][0]
+                raw_detections = box_rows_to_raw_detections(box_rows, class_names, scale)
+                annotated_array, redrawn_diseases, _, _ = ANNOTATION_ENGINE.apply_threshold(
+                    display_array, raw_detections, history_threshold)
+                st.image(annotated_array, caption=display_caption, use_container_width=True)
+                st.write(f"**Hasil pada ambang batas {history_threshold*100:.0f}%:** {', '.join(redrawn_diseases)}")
+            else:
+                st.image(display_path, caption=display_caption, use_container_width=True)
+
+            if st.button("Tampilkan Gambar Asli (resolusi penuh)", key=f"history_full_{selected_detection['id']}"):
+                st.image(selected_detection["image_path"], use_container_width=True)
+
+            # Display details from the selected detection
+            st.write(f"**Tanggal Deteksi:** {selected_detection['detection_date']}")
+            st.write(f"**Penyakit Terdeteksi:** {', '.join(selected_detection['diseases'])}")
+            st.write(f"**Keyakinan Rata-rata:** {selected_detection['confidence']*100:.1f}%")
+
+            if selected_detection['recommendations']: # Kolom ini berisi 'keterangan_text'
+                st.info(f"**Keterangan:** {selected_detection['recommendations']}")
+
+        except FileNotFoundError:
+            st.error("Gambar tidak ditemukan. Mungkin telah dihapus dari server.")
+        except Exception as e:
+            st.error(f"Terjadi kesalahan saat memuat detail gambar: {e}")
+
+elif page_number > 1:
+    # The page we were on became empty (e.g. rows deleted); go back to the first page
+    st.session_state['history_cursor_stack'] = [None]
+    st.rerun()
 
 else:
     st.info("Anda belum memiliki riwayat deteksi. Mulai deteksi baru sekarang dari halaman utama!")
\ No newline at end of file
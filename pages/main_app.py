@@ -5,6 +5,7 @@ import numpy as np
 from PIL import Image
 import cv2
 import io 
+import importlib.util
 
 st.set_page_config(layout="wide", page_title="Deteksi Daun Melon")
 
@@ -66,17 +67,18 @@ st.markdown(
 
 
 # --- Impor Modul Utilitas ---
-from utils.auth import logout_user
-from utils.model import predict_melon_disease, MODEL
+from utils.auth import logout_user, is_admin
+from utils.model import start_model_warmup
 from utils.database import save_detection
 
-# Impor WEBRTC_AVAILABLE dari utils.webcam_detection
-from utils.webcam_detection import WEBRTC_AVAILABLE # <--- INI SUDAH ADA
+# Handler video dan webcam (beserta streamlit-webrtc/aiortc) baru diimpor saat sumbernya dipilih;
+# di sini cukup dicek apakah pustakanya terpasang
+WEBRTC_AVAILABLE = importlib.util.find_spec("streamlit_webrtc") is not None
 
-# --- TAMBAHKAN IMPOR FUNGSI HANDLER INI ---
 from utils.image_detection import handle_image_upload_detection
-from utils.webcam_detection import handle_webcam_detection
-# --- AKHIR TAMBAH IMPOR ---
+
+# Biasanya sudah dimulai oleh app.py; dipanggil lagi untuk sesi yang langsung membuka halaman ini
+start_model_warmup()
 
 
 # --- Konfigurasi Halaman Streamlit ---
@@ -94,6 +96,10 @@ if 'current_image_bytes' not in st.session_state:
     st.session_state['current_image_bytes'] = None
 if 'current_image_name' not in st.session_state: 
     st.session_state['current_image_name'] = None
+if 'current_image_array' not in st.session_state: # Gambar hasil decode, dipakai ulang saat threshold berubah
+    st.session_state['current_image_array'] = None
+if 'current_raw_detections' not in st.session_state: # Deteksi mentah YOLO (kotak, skor, id kelas)
+    st.session_state['current_raw_detections'] = None
 if 'last_detection_source' not in st.session_state: 
     st.session_state['last_detection_source'] = None
 if 'detection_results_display' not in st.session_state: 
@@ -116,7 +122,7 @@ with st.sidebar:
     st.markdown("---")
 
     st.markdown("#### **Pilih Sumber Deteksi**")
-    detection_source_options = ["Gambar (Unggah File) 🖼️"]
+    detection_source_options = ["Gambar (Unggah File) 🖼️", "Video (Unggah File) 🎞️"]
     if WEBRTC_AVAILABLE: 
         detection_source_options.append("Webcam (Real-time) 🎥")
 
@@ -145,6 +151,9 @@ with st.sidebar:
         st.switch_page("pages/history.py")
     if st.button("Bantuan & FAQ ❓", use_container_width=True):
         st.info("Fitur Bantuan & FAQ akan hadir di sini!")
+    if is_admin(st.session_state['username']):
+        if st.button("Metrik Performa 📊", use_container_width=True):
+            st.switch_page("pages/admin_metrics.py")
     st.markdown("---")
 
     st.markdown("#### **Akun Saya**")
@@ -163,5 +172,9 @@ current_detection_source = st.session_state.get('detection_source_radio', "Gamba
 # Panggil fungsi penanganan berdasarkan pilihan sumber deteksi
 if current_detection_source == "Gambar (Unggah File) 🖼️":
     handle_image_upload_detection() # <--- Sekarang terdefinisi karena diimpor
+elif current_detection_source == "Video (Unggah File) 🎞️":
+    from utils.video_detection import handle_video_detection
+    handle_video_detection()
 elif current_detection_source == "Webcam (Real-time) 🎥":
-    handle_webcam_detection() # <--- Sekarang terdefinisi karena diimpor
\ No newline at end of file
+    from utils.webcam_detection import handle_webcam_detection
+    handle_webcam_detection()
\ No newline at end of file
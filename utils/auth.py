@@ -1,7 +1,11 @@
 import streamlit as st
+import os
 import hashlib # Digunakan untuk hashing password, untuk keamanan
 from utils.database import add_user_to_db, get_user_from_db # Mengimpor fungsi dari modul database
 
+# Username admin (dipisahkan koma), misalnya MELON_ADMIN_USERS="admin,operator1"
+ADMIN_USERNAMES = {name.strip() for name in os.environ.get("MELON_ADMIN_USERS", "").split(",") if name.strip()}
+
 def hash_password(password):
     """
     Mengubah password teks biasa menjadi hash SHA256.
@@ -43,4 +47,14 @@ def logout_user():
     st.session_state['logged_in'] = False
     st.session_state['username'] = None
     st.session_state['fullname'] = None
-    st.rerun() # Memaksa Streamlit untuk me-refresh halaman dan kembali ke kondisi awal (login)
\ No newline at end of file
+    # State halaman riwayat (kursor halaman, deteksi yang dipilih) milik pengguna sebelumnya
+    # tidak boleh terbawa ke pengguna berikutnya di sesi browser yang sama
+    for key in ('history_cursor_stack', 'history_selected_id'):
+        st.session_state.pop(key, None)
+    st.rerun() # Memaksa Streamlit untuk me-refresh halaman dan kembali ke kondisi awal (login)
+
+def is_admin(username):
+    """
+    Memeriksa apakah pengguna termasuk admin (dikonfigurasi lewat MELON_ADMIN_USERS).
+    """
+    return username in ADMIN_USERNAMES
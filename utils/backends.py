@@ -0,0 +1,74 @@
+import os
+import threading
+
+# Backend inferensi yang didukung:
+# - "pytorch"  : file .pt asli lewat Ultralytics/PyTorch
+# - "onnx"     : hasil ekspor .onnx, dijalankan dengan ONNX Runtime (CPU)
+# - "openvino" : hasil ekspor OpenVINO IR, dijalankan dengan OpenVINO Runtime (CPU Intel)
+# - "onnx-int8": ONNX yang dikuantisasi INT8 (kalibrasi dari CALIBRATION_DIR, lihat
+#                utils/quantization.py), untuk perangkat edge yang lebih murah
+# Semua backend dimuat lewat kelas YOLO Ultralytics, sehingga preprocessing dan
+# postprocessing (NMS, skala kotak) tetap sama persis dengan jalur PyTorch.
+MODEL_BACKENDS = ("pytorch", "onnx", "openvino", "onnx-int8")
+
+_EXPORT_LOCK = threading.Lock()
+
+
+def exported_artifact_path(model_path, backend):
+    """
+    Lokasi artefak hasil ekspor untuk `backend`, di sebelah file .pt
+    (misalnya best.pt -> best.onnx, best-int8.onnx atau best_openvino_model/).
+    """
+    stem = os.path.splitext(model_path)[0]
+    if backend == "pytorch":
+        return model_path
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    if backend == "onnx-int8":
+        return f"{stem}-int8.onnx"
+    raise ValueError(f"Backend model tidak dikenal: '{backend}'. Pilihan: {', '.join(MODEL_BACKENDS)}.")
+
+def _is_stale(artifact_path, model_path):
+    # Artefak dianggap usang jika belum ada atau lebih lama dari file .pt sumbernya
+    if not os.path.exists(artifact_path):
+        return True
+    return os.path.exists(model_path) and os.path.getmtime(artifact_path) < os.path.getmtime(model_path)
+
+def resolve_model_artifact(model_path, backend="pytorch", imgsz=640):
+    """
+    Mengembalikan path model yang siap dimuat untuk `backend`. Untuk ONNX/OpenVINO,
+    file .pt diekspor sekali lalu artefaknya dipakai ulang sampai .pt berubah.
+    Ekspor memakai ukuran input dinamis agar imgsz adaptif dan batch tetap bisa dipakai.
+    """
+    artifact_path = exported_artifact_path(model_path, backend)
+    if backend == "pytorch":
+        return artifact_path
+
+    if backend == "onnx-int8":
+        # Model INT8 dibuat dari ONNX FP32, dan dibuat ulang jika ONNX FP32 diperbarui
+        fp32_path = resolve_model_artifact(model_path, "onnx", imgsz)
+        with _EXPORT_LOCK:
+            if _is_stale(artifact_path, fp32_path):
+                from utils.quantization import quantize_onnx_model
+                quantize_onnx_model(fp32_path, artifact_path, imgsz=imgsz)
+        return artifact_path
+
+    with _EXPORT_LOCK:
+        if _is_stale(artifact_path, model_path):
+            from ultralytics import YOLO
+            exported_path = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True)
+            if exported_path and os.path.abspath(str(exported_path)) != os.path.abspath(artifact_path):
+                os.replace(str(exported_path), artifact_path)
+    return artifact_path
+
+def load_backend_model(model_path, backend="pytorch", imgsz=640):
+    """
+    Memuat model YOLO untuk `backend` (mengekspor lebih dulu jika perlu).
+    """
+    from ultralytics import YOLO
+    artifact_path = resolve_model_artifact(model_path, backend, imgsz)
+    if backend == "pytorch":
+        return YOLO(artifact_path)
+    return YOLO(artifact_path, task="detect")
@@ -0,0 +1,24 @@
+import argparse
+import time
+
+from utils.database import backfill_daily_stats
+
+
+def main():
+    """
+    Perintah backfill rekap harian untuk deteksi yang tersimpan sebelum tabel
+    `detection_daily_stats` ada:
+
+        python -m utils.backfill_stats
+    """
+    parser = argparse.ArgumentParser(description="Membangun ulang rekap harian deteksi penyakit (detection_daily_stats).")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Jumlah baris yang dibaca per batch.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    processed = backfill_daily_stats(batch_size=args.batch_size)
+    print(f"Rekap harian dibangun ulang dari {processed} deteksi dalam {time.perf_counter() - started:.1f} detik.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from utils.database import get_user_id, get_user_image_paths, save_detection_records
+from utils.engine import MelonDiseaseEngine, DEFAULT_IMGSZ, raw_detections_to_record
+from utils.ingest import decode_image, IMAGE_EXTENSIONS
+from utils.thumbnails import create_thumbnails
+
+# Folder tujuan salinan gambar (sama dengan gambar unggahan aplikasi web)
+INGEST_IMAGE_DIR = "temp_images"
+
+# Engine milik setiap worker process (dimuat sekali oleh _init_worker)
+_WORKER_ENGINE = None
+
+
+def find_images(root):
+    """
+    Semua file gambar di bawah `root` (rekursif), diurutkan agar urutan proses bisa diulang.
+    """
+    found = []
+    for directory, _, filenames in os.walk(root):
+        found.extend(os.path.join(directory, name) for name in filenames if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(found)
+
+def stored_image_path(username, source_path):
+    """
+    Path salinan gambar di INGEST_IMAGE_DIR. Deterministik terhadap path sumber, sehingga
+    gambar yang sudah tersimpan bisa dikenali saat ingest dilanjutkan, dan nama file sama
+    dari folder/kartu SD berbeda tidak saling menimpa.
+    """
+    digest = hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(INGEST_IMAGE_DIR, f"{username}_bulk_{digest}_{os.path.basename(source_path)}")
+
+def _init_worker(model_path, backend, imgsz, torch_threads):
+    # Dijalankan sekali per worker process: batasi thread PyTorch agar worker tidak saling
+    # berebut core, lalu muat model satu kali untuk semua gambar yang diproses worker ini
+    global _WORKER_ENGINE
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _WORKER_ENGINE = MelonDiseaseEngine(model_path, imgsz=imgsz, backend=backend)
+    _WORKER_ENGINE.load()
+
+def _process_chunk(task):
+    """
+    Dijalankan di worker: decode, inferensi satu micro-batch, postprocess, salin gambar
+    dan buat thumbnail. Mengembalikan (record siap simpan, daftar error).
+    """
+    username, items, confidence_threshold = task
+    records, errors, images = [], [], []
+    for source_path, image_path in items:
+        try:
+            images.append((source_path, image_path, decode_image(source_path)))
+        except Exception as e:
+            errors.append((source_path, f"decode: {e}"))
+
+    try:
+        raw_results = list(_WORKER_ENGINE.infer_batch([image for _, _, image in images],
+                                                      batch_size=max(1, len(images))))
+    except Exception as e:
+        return records, errors + [(source_path, f"inferensi: {e}") for source_path, _, _ in images]
+
+    for (source_path, image_path, image), (_, _, raw_detections) in zip(images, raw_results):
+        try:
+            summary = _WORKER_ENGINE.postprocess(raw_detections, confidence_threshold)
+            shutil.copyfile(source_path, image_path)
+            thumbnail_path, preview_path = create_thumbnails(image_path)
+            records.append({
+                "username": username,
+                "image_path": image_path,
+                "diseases": summary["diseases"],
+                "confidence": summary["avg_confidence"],
+                "recommendations": summary["keterangan"],
+                "thumbnail_path": thumbnail_path,
+                "preview_path": preview_path,
+                **raw_detections_to_record(raw_detections, image.shape, confidence_threshold),
+            })
+        except Exception as e:
+            errors.append((source_path, str(e)))
+    return records, errors
+
+def _print_progress(done, total, skipped, failed, started):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    sys.stdout.write(f"\r{done}/{total} gambar ({done / total * 100 if total else 100:.1f}%) | "
+                     f"{rate:.1f} gambar/detik | sisa ~{eta:.0f} detik | dilewati {skipped} | gagal {failed}   ")
+    sys.stdout.flush()
+
+
+def main():
+    """
+    Memasukkan banyak gambar survei lapangan sekaligus ke riwayat deteksi seorang pengguna:
+
+        python -m utils.bulk_ingest /media/sdcard/DCIM --user petani1 --workers 8
+
+    Gambar yang sudah pernah disimpan untuk pengguna tersebut dilewati, sehingga perintah
+    yang sama bisa dijalankan ulang untuk melanjutkan ingest yang terhenti.
+    """
+    parser = argparse.ArgumentParser(description="Bulk ingest gambar daun melon ke riwayat deteksi.")
+    parser.add_argument("directory", help="Folder sumber gambar (dipindai rekursif).")
+    parser.add_argument("--user", required=True, help="Username pemilik hasil deteksi.")
+    parser.add_argument("--model", default="best.pt", help="File bobot model.")
+    parser.add_argument("--backend", default=os.environ.get("MELON_MODEL_BACKEND", "pytorch"),
+                        help="Backend inferensi (lihat utils/backends.py).")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Ukuran inferensi.")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Ambang keyakinan untuk ringkasan diagnosis.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Jumlah worker process.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Gambar per micro-batch di setiap worker.")
+    parser.add_argument("--commit-every", type=int, default=256, help="Jumlah hasil per transaksi database.")
+    args = parser.parse_args()
+
+    if get_user_id(args.user) is None:
+        parser.error(f"Pengguna '{args.user}' tidak ditemukan.")
+
+    all_images = find_images(args.directory)
+    already_stored = get_user_image_paths(args.user)
+    pending = [(path, stored_image_path(args.user, path)) for path in all_images]
+    pending = [(path, image_path) for path, image_path in pending if image_path not in already_stored]
+    skipped = len(all_images) - len(pending)
+    print(f"{len(all_images)} gambar ditemukan, {skipped} sudah tersimpan, {len(pending)} akan diproses "
+          f"dengan {args.workers} worker.")
+    if not pending:
+        return
+
+    os.makedirs(INGEST_IMAGE_DIR, exist_ok=True)
+    tasks = [(args.user, pending[start:start + args.batch_size], args.threshold)
+             for start in range(0, len(pending), args.batch_size)]
+    torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    done, saved, failed = 0, 0, 0
+    buffered = []
+    started = time.perf_counter()
+    # Database hanya ditulis dari proses utama (satu penulis), dalam transaksi berukuran commit_every
+    with multiprocessing.Pool(args.workers, initializer=_init_worker,
+                              initargs=(args.model, args.backend, args.imgsz, torch_threads)) as pool:
+        try:
+            for records, errors in pool.imap_unordered(_process_chunk, tasks):
+                buffered.extend(records)
+                done += len(records) + len(errors)
+                failed += len(errors)
+                for source_path, error in errors:
+                    sys.stdout.write(f"\nGagal memproses {source_path}: {error}\n")
+                if len(buffered) >= args.commit_every:
+                    saved += save_detection_records(buffered)
+                    buffered = []
+                _print_progress(done, len(pending), skipped, failed, started)
+        except KeyboardInterrupt:
+            pool.terminate()
+            print("\nDihentikan; hasil yang sudah selesai disimpan. Jalankan ulang perintah yang sama untuk melanjutkan.")
+        finally:
+            saved += save_detection_records(buffered)
+
+    elapsed = time.perf_counter() - started
+    print(f"\nSelesai: {saved} hasil disimpan, {failed} gagal, dalam {elapsed:.1f} detik "
+          f"({saved / elapsed if elapsed else 0:.1f} gambar/detik).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,26 @@
 import sqlite3
 import os
 import json # Digunakan untuk menyimpan daftar penyakit sebagai string JSON di database
+import re
+import queue
+import threading
+from contextlib import contextmanager
 
 # Nama file database SQLite Anda
 DB_NAME = 'melon_detector.db'
 
-def init_db():
-    """
-    Menginisialisasi database SQLite dan membuat tabel `users` dan `detections`
-    jika tabel-tabel tersebut belum ada. Fungsi ini akan dipanggil otomatis saat modul dimuat.
-    """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+# Jumlah maksimum koneksi yang disimpan di pool (koneksi tambahan tetap dibuat jika perlu,
+# tetapi ditutup setelah dipakai)
+POOL_SIZE = 8
 
-    # Tabel untuk menyimpan informasi pengguna
-    c.execute('''
+# --- Migrasi Skema ---
+# Setiap migrasi dijalankan tepat sekali, berurutan, dan versinya dicatat di PRAGMA user_version.
+# Tambahkan migrasi baru di akhir daftar; jangan mengubah migrasi yang sudah ada.
+MIGRATIONS = [
+    # 1: skema awal
+    [
+        # Tabel untuk menyimpan informasi pengguna
+        '''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -22,12 +28,11 @@ def init_db():
             fullname TEXT,
             email TEXT
         )
-    ''')
-
-    # Tabel untuk menyimpan riwayat deteksi
-    # image_path akan menyimpan lokasi file gambar di server
-    # diseases akan menyimpan daftar penyakit dalam format JSON string
-    c.execute('''
+        ''',
+        # Tabel untuk menyimpan riwayat deteksi
+        # image_path akan menyimpan lokasi file gambar di server
+        # diseases akan menyimpan daftar penyakit dalam format JSON string
+        '''
         CREATE TABLE IF NOT EXISTS detections (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
@@ -38,20 +43,218 @@ def init_db():
             recommendations TEXT,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
-    ''')
-    conn.commit()
-    conn.close()
+        ''',
+        # Tabel cache hasil inferensi (tier persisten untuk utils/inference_cache.py)
+        # cache_key = hash isi gambar + hash bobot model, payload = deteksi mentah dalam JSON
+        '''
+        CREATE TABLE IF NOT EXISTS inference_cache (
+            cache_key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ],
+    # 2: indeks riwayat per pengguna, agar halaman riwayat tidak memindai seluruh tabel lalu mengurutkan
+    [
+        "CREATE INDEX IF NOT EXISTS idx_detections_user_date ON detections (user_id, detection_date)",
+    ],
+    # 3: thumbnail dan preview yang dibuat sekali saat deteksi disimpan (utils/thumbnails.py)
+    [
+        "ALTER TABLE detections ADD COLUMN thumbnail_path TEXT",
+        "ALTER TABLE detections ADD COLUMN preview_path TEXT",
+    ],
+    # 4: kotak deteksi per baris (semua kotak mentah, bukan hanya yang lolos threshold),
+    # sehingga riwayat bisa menggambar ulang / memfilter ulang anotasi tanpa model YOLO.
+    # frame_width/frame_height = ukuran gambar tempat koordinat kotak berlaku.
+    [
+        "ALTER TABLE detections ADD COLUMN frame_width INTEGER",
+        "ALTER TABLE detections ADD COLUMN frame_height INTEGER",
+        '''
+        CREATE TABLE IF NOT EXISTS detection_classes (
+            class_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS detection_boxes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            detection_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            x1 REAL NOT NULL,
+            y1 REAL NOT NULL,
+            x2 REAL NOT NULL,
+            y2 REAL NOT NULL,
+            FOREIGN KEY (detection_id) REFERENCES detections(id) ON DELETE CASCADE
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_detection_boxes_detection ON detection_boxes (detection_id)",
+        "CREATE INDEX IF NOT EXISTS idx_detection_boxes_class_score ON detection_boxes (class_id, score)",
+    ],
+    # 5: rekap harian per pengguna dan kelas, diperbarui di transaksi yang sama dengan setiap insert
+    # (rata-rata keyakinan = confidence_sum / detection_count). Isi untuk data lama dengan
+    # `python -m utils.backfill_stats`.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS detection_daily_stats (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            class_name TEXT NOT NULL,
+            detection_count INTEGER NOT NULL DEFAULT 0,
+            confidence_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, class_name)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 6: ambang keyakinan yang dipakai saat deteksi disimpan, agar rekap harian dihitung dari
+    # kotak di detection_boxes (bukan dari teks tampilan `diseases`)
+    [
+        "ALTER TABLE detections ADD COLUMN threshold REAL",
+    ],
+    # 7: peta class_id -> nama kelas per deteksi. detection_classes bersifat global dan ditimpa
+    # setiap kali disimpan, sehingga model dengan urutan kelas berbeda akan melabeli ulang semua
+    # kotak lama. Setiap peta unik disimpan sekali (JSON) dan dirujuk oleh deteksinya; deteksi
+    # lama yang sudah punya kotak memakai isi detection_classes terakhir.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS class_maps (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            names TEXT UNIQUE NOT NULL
+        )
+        ''',
+        "ALTER TABLE detections ADD COLUMN class_map_id INTEGER REFERENCES class_maps(id)",
+        "INSERT OR IGNORE INTO class_maps (names) "
+        "SELECT json_group_object(class_id, name) FROM (SELECT class_id, name FROM detection_classes ORDER BY class_id) "
+        "HAVING count(*) > 0",
+        "UPDATE detections SET class_map_id = (SELECT max(id) FROM class_maps) WHERE frame_width IS NOT NULL",
+    ],
+]
+
+# Ambang keyakinan untuk rekap harian jika deteksi disimpan tanpa `threshold`
+# (sama dengan default slider aplikasi)
+DEFAULT_STATS_THRESHOLD = 0.5
+
+# Nama kelas daun sehat persis seperti di model (lihat HEALTHY_CLASS_NAME di utils/engine.py)
+HEALTHY_CLASS_NAME = "Daun Sehat"
+
+# Format entri daftar penyakit dari engine, misalnya "Downy_Mildew (87.3%)"
+_DISEASE_ENTRY_PATTERN = re.compile(r"^(?P<name>.+) \((?P<percent>\d+(?:\.\d+)?)%\)$")
+
+
+def _connect(db_name):
+    """
+    Membuka koneksi SQLite dengan pengaturan untuk banyak sesi Streamlit bersamaan:
+    WAL (pembaca tidak memblokir penulis), synchronous=NORMAL, busy_timeout
+    dan cache prepared statement yang lebih besar.
+    """
+    conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool koneksi SQLite yang aman dipakai dari banyak thread. Setiap koneksi hanya
+    dipakai satu thread dalam satu waktu (dipinjam lewat `connection()`).
+    """
+
+    def __init__(self, db_name, max_size=POOL_SIZE):
+        self.db_name = db_name
+        self._idle = queue.LifoQueue(maxsize=max_size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Meminjam koneksi dari pool. Transaksi di-commit jika blok selesai tanpa error,
+        dan di-rollback jika terjadi exception.
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = _connect(self.db_name)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_INITIALIZED_DB = None
+
+def _get_pool():
+    # Pool dibuat ulang jika DB_NAME diganti (misalnya oleh benchmark yang memakai database sementara)
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.db_name != DB_NAME:
+            if _POOL is not None:
+                _POOL.close_all()
+            _POOL = ConnectionPool(DB_NAME)
+        return _POOL
+
+def get_connection():
+    """
+    Context manager untuk meminjam koneksi dari pool bersama:
+
+        with get_connection() as conn:
+            conn.execute(...)
+    """
+    return _get_pool().connection()
+
+def init_db():
+    """
+    Menginisialisasi database SQLite: menjalankan migrasi skema yang belum diterapkan
+    (tabel `users`, `detections`, `inference_cache` dan indeksnya).
+    Aman dipanggil berkali-kali; hanya bekerja sekali per proses untuk setiap file database.
+
+    Setiap migrasi berjalan dalam transaksi BEGIN IMMEDIATE-nya sendiri: user_version dibaca
+    ulang di dalam transaksi dan diperbarui bersama perubahan skemanya, sehingga beberapa
+    proses yang start bersamaan tidak menjalankan migrasi yang sama dua kali, dan migrasi
+    yang gagal di tengah jalan di-rollback seluruhnya.
+    """
+    global _INITIALIZED_DB
+    if _INITIALIZED_DB == DB_NAME:
+        return
+    with get_connection() as conn:
+        conn.commit() # Pastikan tidak ada transaksi terbuka sebelum BEGIN eksplisit
+        for version, statements in enumerate(MIGRATIONS, start=1):
+            conn.execute("BEGIN IMMEDIATE") # Kunci tulis diambil sebelum membaca versi
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    _INITIALIZED_DB = DB_NAME
 
 def get_user_id(username):
     """
     Mengambil ID pengguna dari database berdasarkan username.
     Digunakan untuk mengaitkan deteksi dengan pengguna yang benar.
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE username = ?", (username,))
-    user_id = c.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
     return user_id[0] if user_id else None
 
 def add_user_to_db(username, password_hash, fullname, email):
@@ -59,67 +262,362 @@ def add_user_to_db(username, password_hash, fullname, email):
     Menambahkan pengguna baru ke tabel `users`.
     Mengembalikan True jika berhasil, False jika username sudah ada (IntegrityError).
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
     try:
-        c.execute("INSERT INTO users (username, password_hash, fullname, email) VALUES (?, ?, ?, ?)",
-                  (username, password_hash, fullname, email))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("INSERT INTO users (username, password_hash, fullname, email) VALUES (?, ?, ?, ?)",
+                         (username, password_hash, fullname, email))
         return True
     except sqlite3.IntegrityError:
         return False # Username sudah ada
-    finally:
-        conn.close()
 
 def get_user_from_db(username):
     """
     Mengambil semua data pengguna dari database berdasarkan username.
     Berguna untuk proses login dan mengambil informasi profil.
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id, username, password_hash, fullname, email FROM users WHERE username = ?", (username,))
-    user_data = c.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        user_data = conn.execute("SELECT id, username, password_hash, fullname, email FROM users WHERE username = ?",
+                                 (username,)).fetchone()
     return user_data # Mengembalikan tuple: (id, username, password_hash, fullname, email)
 
-def save_detection(username, image_path, diseases, confidence, recommendations):
+def _class_map_id(conn, class_names):
+    """
+    id baris `class_maps` untuk peta class_id -> nama kelas (dibuat jika belum ada), atau None.
+    Format JSON-nya sama dengan json_group_object di migrasi 7 agar peta yang sama tidak dobel.
+    """
+    if not class_names:
+        return None
+    names = {int(class_id): name for class_id, name in class_names.items()}
+    names_json = json.dumps({str(class_id): names[class_id] for class_id in sorted(names)},
+                            ensure_ascii=False, separators=(",", ":"))
+    conn.execute("INSERT OR IGNORE INTO class_maps (names) VALUES (?)", (names_json,))
+    return conn.execute("SELECT id FROM class_maps WHERE names = ?", (names_json,)).fetchone()[0]
+
+def _load_class_map(names_json):
+    return {int(class_id): name for class_id, name in json.loads(names_json).items()} if names_json else {}
+
+def _insert_boxes(conn, detection_id, record):
+    """
+    Menulis kotak deteksi milik satu baris `detections` (jika ada) dalam transaksi yang sama.
+    `record["boxes"]` berisi tuple (class_id, score, x1, y1, x2, y2); nama kelasnya disimpan
+    lewat `class_map_id` baris deteksi (lihat `_class_map_id`).
+    """
+    boxes = record.get("boxes")
+    if boxes:
+        conn.executemany("INSERT INTO detection_boxes (detection_id, class_id, score, x1, y1, x2, y2) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(detection_id,) + tuple(box) for box in boxes])
+
+def box_class_stats(boxes, class_names, threshold=None):
+    """
+    {nama kelas: rata-rata skor} dari kotak satu deteksi yang lolos `threshold`, sama
+    seperti diagnosisnya: jika ada kelas penyakit, hanya kelas penyakit yang dihitung;
+    "Daun Sehat" hanya jika tidak ada penyakit. Deteksi tanpa kotak (misalnya model tidak
+    dimuat atau tidak ada yang terdeteksi) tidak menghasilkan kelas apa pun.
+
+    Args:
+        boxes (list): Tuple (class_id, score, ...) seperti di `detection_boxes`.
+        class_names (dict): class_id -> nama kelas.
+    """
+    threshold = DEFAULT_STATS_THRESHOLD if threshold is None else threshold
+    names = {int(class_id): name for class_id, name in (class_names or {}).items()}
+    per_class = {}
+    for class_id, score, *_ in boxes or []:
+        if score >= threshold:
+            per_class.setdefault(names.get(int(class_id), str(class_id)), []).append(float(score))
+    diseases = {name: scores for name, scores in per_class.items() if name != HEALTHY_CLASS_NAME}
+    if diseases:
+        per_class = diseases
+    return {name: sum(scores) / len(scores) for name, scores in per_class.items()}
+
+def diagnosis_classes(diseases, confidence):
+    """
+    Menguraikan daftar penyakit tersimpan menjadi {nama kelas: keyakinan}. Hanya untuk
+    deteksi lama yang disimpan sebelum ada `detection_boxes` (lihat `backfill_daily_stats`).
+    Entri yang bukan kelas model ("Penyakit Tidak Terdeteksi", pesan error) diabaikan.
+    """
+    per_class = {}
+    for entry in diseases or []:
+        match = _DISEASE_ENTRY_PATTERN.match(entry)
+        if match:
+            per_class.setdefault(match.group("name"), []).append(float(match.group("percent")) / 100.0)
+        elif entry == HEALTHY_CLASS_NAME:
+            per_class.setdefault(entry, []).append(float(confidence or 0.0))
+    return {name: sum(values) / len(values) for name, values in per_class.items()}
+
+def _update_daily_stats(conn, detection_id, record):
+    """
+    Menambahkan satu deteksi ke rekap `detection_daily_stats` (dipanggil di dalam
+    transaksi insert yang sama, sehingga rekap selalu konsisten dengan `detections`).
+    Kelas dan skor diambil dari kotak yang ikut disimpan, pada ambang `record["threshold"]`.
+    """
+    class_stats = box_class_stats(record.get("boxes"), record.get("class_names"), record.get("threshold"))
+    rows = [(class_name, class_confidence, detection_id) for class_name, class_confidence in class_stats.items()]
+    conn.executemany(
+        "INSERT INTO detection_daily_stats (user_id, day, class_name, detection_count, confidence_sum) "
+        "SELECT user_id, date(detection_date), ?, 1, ? FROM detections WHERE id = ? "
+        "ON CONFLICT (user_id, day, class_name) DO UPDATE SET "
+        "detection_count = detection_count + excluded.detection_count, "
+        "confidence_sum = confidence_sum + excluded.confidence_sum",
+        rows)
+
+def _frame_size(record):
+    frame_size = record.get("frame_size")
+    return frame_size if frame_size else (None, None)
+
+def save_detection(username, image_path, diseases, confidence, recommendations,
+                   thumbnail_path=None, preview_path=None, boxes=None, class_names=None, frame_size=None,
+                   threshold=None):
     """
     Menyimpan hasil deteksi ke tabel `detections`.
     `diseases` akan disimpan sebagai JSON string karena bisa berisi daftar.
+    `boxes` (opsional) disimpan ke tabel `detection_boxes` dalam transaksi yang sama;
+    `frame_size` adalah (lebar, tinggi) gambar tempat koordinat kotak berlaku dan
+    `threshold` adalah ambang keyakinan yang dipakai untuk `diseases`.
     """
-    user_id = get_user_id(username)
-    if user_id:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        diseases_json = json.dumps(diseases) # Mengubah daftar penyakit menjadi string JSON
-        c.execute("INSERT INTO detections (user_id, image_path, diseases, confidence, recommendations) VALUES (?, ?, ?, ?, ?)",
-                  (user_id, image_path, diseases_json, confidence, recommendations))
-        conn.commit()
-        conn.close()
-        return True
-    return False
+    diseases_json = json.dumps(diseases) # Mengubah daftar penyakit menjadi string JSON
+    frame_width, frame_height = frame_size if frame_size else (None, None)
+    with get_connection() as conn:
+        # user_id dicari di dalam INSERT yang sama, tanpa query terpisah
+        cursor = conn.execute(
+            "INSERT INTO detections (user_id, image_path, diseases, confidence, recommendations, "
+            "thumbnail_path, preview_path, frame_width, frame_height, threshold, class_map_id) "
+            "SELECT id, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? FROM users WHERE username = ?",
+            (image_path, diseases_json, confidence, recommendations, thumbnail_path, preview_path,
+             frame_width, frame_height, threshold, _class_map_id(conn, class_names), username))
+        if cursor.rowcount == 0:
+            return False
+        record = {"boxes": boxes, "class_names": class_names, "threshold": threshold}
+        _insert_boxes(conn, cursor.lastrowid, record)
+        _update_daily_stats(conn, cursor.lastrowid, record)
+    return True
+
+def save_detections_bulk(username, detections):
+    """
+    Menyimpan banyak hasil deteksi milik satu user sekaligus dalam satu transaksi.
+    `detections` adalah list dict dengan kunci yang sama seperti `save_detection_records`
+    (tanpa `username`). Mengembalikan jumlah baris yang disimpan (0 jika user tidak ditemukan).
+    """
+    return save_detection_records([dict(detection, username=username) for detection in detections])
+
+def save_detection_records(records):
+    """
+    Menyimpan hasil deteksi dari banyak pengguna sekaligus dalam satu transaksi.
+    `records` adalah list dict dengan kunci username, image_path, diseases, confidence,
+    recommendations, dan opsional thumbnail_path, preview_path, boxes, class_names, frame_size,
+    threshold (lihat `save_detection`).
+    Baris untuk username yang tidak dikenal dilewati. Mengembalikan jumlah baris yang disimpan.
+    """
+    if not records:
+        return 0
+    saved = 0
+    with get_connection() as conn:
+        usernames = sorted({record["username"] for record in records})
+        placeholders = ", ".join("?" for _ in usernames)
+        user_ids = dict(conn.execute(f"SELECT username, id FROM users WHERE username IN ({placeholders})",
+                                     usernames).fetchall())
+        for record in records:
+            if record["username"] not in user_ids:
+                continue
+            # Insert satu per satu (tetap satu transaksi) agar id baris diketahui untuk detection_boxes
+            cursor = conn.execute(
+                "INSERT INTO detections (user_id, image_path, diseases, confidence, recommendations, "
+                "thumbnail_path, preview_path, frame_width, frame_height, threshold, class_map_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_ids[record["username"]], record["image_path"], json.dumps(record["diseases"]),
+                 record["confidence"], record["recommendations"],
+                 record.get("thumbnail_path"), record.get("preview_path")) + tuple(_frame_size(record)) +
+                (record.get("threshold"), _class_map_id(conn, record.get("class_names"))))
+            _insert_boxes(conn, cursor.lastrowid, record)
+            _update_daily_stats(conn, cursor.lastrowid, record)
+            saved += 1
+    return saved
+
+def get_detection_boxes(detection_id):
+    """
+    Mengambil semua kotak mentah milik satu deteksi beserta peta nama kelas yang berlaku
+    saat deteksi itu disimpan.
+
+    Returns:
+        tuple: (list tuple (class_id, score, x1, y1, x2, y2), dict class_id -> nama kelas)
+    """
+    with get_connection() as conn:
+        boxes = conn.execute("SELECT class_id, score, x1, y1, x2, y2 FROM detection_boxes "
+                             "WHERE detection_id = ? ORDER BY id", (detection_id,)).fetchall()
+        row = conn.execute("SELECT class_maps.names FROM detections JOIN class_maps ON class_maps.id = detections.class_map_id "
+                           "WHERE detections.id = ?", (detection_id,)).fetchone()
+    return boxes, _load_class_map(row[0] if row else None)
+
+def update_detection_thumbnails(detection_id, thumbnail_path, preview_path):
+    """
+    Mengisi thumbnail/preview untuk deteksi lama yang disimpan sebelum fitur thumbnail ada.
+    """
+    with get_connection() as conn:
+        conn.execute("UPDATE detections SET thumbnail_path = ?, preview_path = ? WHERE id = ?",
+                     (thumbnail_path, preview_path, detection_id))
 
-def get_user_detections(username):
+def get_user_detections(username, limit=None, before_cursor=None):
     """
-    Mengambil semua riwayat deteksi untuk user tertentu.
+    Mengambil riwayat deteksi untuk user tertentu, terbaru lebih dulu, dengan paginasi keyset.
     `diseases` yang tersimpan sebagai JSON string akan diuraikan kembali menjadi daftar.
+
+    Args:
+        username (str): Nama pengguna.
+        limit (int): Jumlah baris maksimum (None = semua).
+        before_cursor (tuple): (detection_date, id) dari baris terakhir halaman sebelumnya;
+            hanya baris yang lebih lama dari cursor ini yang dikembalikan.
+
+    Returns:
+        list[dict]: Baris dengan kunci id, detection_date, image_path, diseases,
+                    confidence, recommendations, thumbnail_path, preview_path, frame_size.
+    """
+    query = ("SELECT d.id, d.detection_date, d.image_path, d.diseases, d.confidence, d.recommendations, "
+             "d.thumbnail_path, d.preview_path, d.frame_width, d.frame_height "
+             "FROM detections d JOIN users u ON u.id = d.user_id WHERE u.username = ?")
+    params = [username]
+    if before_cursor is not None:
+        # Keyset: (detection_date, id) lebih kecil dari cursor, tanpa OFFSET yang makin lambat
+        query += " AND (d.detection_date, d.id) < (?, ?)"
+        params.extend(before_cursor)
+    # Memakai indeks (user_id, detection_date) sehingga tidak perlu pemindaian penuh + sort
+    query += " ORDER BY d.detection_date DESC, d.id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with get_connection() as conn:
+        detections = conn.execute(query, params).fetchall()
+
+    parsed_detections = []
+    for det in detections:
+        (detection_id, date, path, diseases_json_str, conf, reco,
+         thumbnail_path, preview_path, frame_width, frame_height) = det
+        parsed_detections.append({
+            "id": detection_id,
+            "detection_date": date,
+            "image_path": path,
+            "diseases": json.loads(diseases_json_str) if diseases_json_str else [],
+            "confidence": conf,
+            "recommendations": reco,
+            "thumbnail_path": thumbnail_path,
+            "preview_path": preview_path,
+            "frame_size": (frame_width, frame_height) if frame_width else None,
+        })
+    return parsed_detections
+
+def detection_cursor(detection):
+    """
+    Cursor keyset (detection_date, id) untuk satu baris hasil `get_user_detections`,
+    dipakai sebagai `before_cursor` untuk mengambil halaman berikutnya.
+    """
+    return (detection["detection_date"], detection["id"])
+
+def count_user_detections(username):
+    """
+    Menghitung jumlah deteksi milik user (hanya membaca indeks, tanpa mengurai JSON).
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT COUNT(*) FROM detections d JOIN users u ON u.id = d.user_id WHERE u.username = ?",
+                           (username,)).fetchone()
+    return row[0]
+
+def get_user_image_paths(username):
+    """
+    Semua image_path milik user, untuk melewati gambar yang sudah pernah disimpan
+    (misalnya saat bulk ingest dilanjutkan setelah terhenti).
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT d.image_path FROM detections d JOIN users u ON u.id = d.user_id "
+                            "WHERE u.username = ?", (username,)).fetchall()
+    return {row[0] for row in rows}
+
+def get_daily_stats(username, start_day=None, end_day=None):
+    """
+    Membaca rekap harian milik user dari `detection_daily_stats` saja (tanpa menyentuh
+    tabel `detections`), sehingga biayanya tidak bergantung pada panjang riwayat.
+
+    Args:
+        start_day, end_day (str): Batas tanggal 'YYYY-MM-DD' dalam UTC (inklusif, opsional).
+            Hari rekap adalah date(detection_date), dan detection_date diisi CURRENT_TIMESTAMP (UTC).
+
+    Returns:
+        list[tuple]: (day, class_name, detection_count, mean_confidence), urut per hari.
+    """
+    query = ("SELECT s.day, s.class_name, s.detection_count, s.confidence_sum / s.detection_count "
+             "FROM detection_daily_stats s JOIN users u ON u.id = s.user_id WHERE u.username = ?")
+    params = [username]
+    if start_day is not None:
+        query += " AND s.day >= ?"
+        params.append(start_day)
+    if end_day is not None:
+        query += " AND s.day <= ?"
+        params.append(end_day)
+    query += " ORDER BY s.day, s.class_name"
+    with get_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+def backfill_daily_stats(batch_size=5000):
+    """
+    Membangun ulang seluruh `detection_daily_stats` dari tabel `detections`
+    (untuk data yang tersimpan sebelum rekap ada). Dijalankan dalam satu transaksi.
+    Sumbernya sama dengan insert biasa (`box_class_stats` atas `detection_boxes`); hanya
+    deteksi lama yang disimpan sebelum ada kotak (frame_width NULL) yang memakai daftar
+    `diseases`. Mengembalikan jumlah deteksi yang diproses.
+    """
+    totals = {}
+    processed = 0
+    with get_connection() as conn:
+        class_maps = {map_id: _load_class_map(names_json)
+                      for map_id, names_json in conn.execute("SELECT id, names FROM class_maps")}
+        cursor = conn.execute("SELECT id, user_id, date(detection_date), diseases, confidence, threshold, frame_width, "
+                              "class_map_id FROM detections ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            boxes_by_detection = {}
+            for detection_id, class_id, score in conn.execute(
+                    "SELECT detection_id, class_id, score FROM detection_boxes WHERE detection_id BETWEEN ? AND ?",
+                    (rows[0][0], rows[-1][0])):
+                boxes_by_detection.setdefault(detection_id, []).append((class_id, score))
+            for detection_id, user_id, day, diseases_json_str, confidence, threshold, frame_width, class_map_id in rows:
+                if frame_width is None:
+                    diseases = json.loads(diseases_json_str) if diseases_json_str else []
+                    class_stats = diagnosis_classes(diseases, confidence)
+                else:
+                    class_stats = box_class_stats(boxes_by_detection.get(detection_id), class_maps.get(class_map_id),
+                                                  threshold)
+                for class_name, class_confidence in class_stats.items():
+                    count, confidence_sum = totals.get((user_id, day, class_name), (0, 0.0))
+                    totals[(user_id, day, class_name)] = (count + 1, confidence_sum + class_confidence)
+                processed += 1
+
+        conn.execute("DELETE FROM detection_daily_stats")
+        conn.executemany("INSERT INTO detection_daily_stats (user_id, day, class_name, detection_count, confidence_sum) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [key + value for key, value in totals.items()])
+    return processed
+
+def get_cached_inference(cache_key):
+    """
+    Mengambil payload hasil inferensi (JSON string) dari tabel `inference_cache`.
+    Mengembalikan None jika kunci belum pernah disimpan.
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT payload FROM inference_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+    return row[0] if row else None
+
+def save_cached_inference(cache_key, payload, max_rows=10000):
+    """
+    Menyimpan payload hasil inferensi ke tabel `inference_cache`.
+    Baris tertua (berdasarkan rowid) dibuang agar tabel tidak melebihi `max_rows`.
     """
-    user_id = get_user_id(username)
-    if user_id:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute("SELECT detection_date, image_path, diseases, confidence, recommendations FROM detections WHERE user_id = ? ORDER BY detection_date DESC", (user_id,))
-        detections = c.fetchall()
-        conn.close()
-        
-        parsed_detections = []
-        for det in detections:
-            date, path, diseases_json_str, conf, reco = det
-            parsed_diseases = json.loads(diseases_json_str) if diseases_json_str else []
-            parsed_detections.append((date, path, parsed_diseases, conf, reco))
-        return parsed_detections
-    return []
+    with get_connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO inference_cache (cache_key, payload) VALUES (?, ?)",
+                     (cache_key, payload))
+        conn.execute("DELETE FROM inference_cache WHERE rowid <= (SELECT MAX(rowid) FROM inference_cache) - ?",
+                     (max_rows,))
 
 # Panggil fungsi inisialisasi database saat modul ini dimuat
-init_db()
\ No newline at end of file
+# (pemanggilan berikutnya, misalnya dari app.py, tidak melakukan apa-apa)
+init_db()
@@ -0,0 +1,542 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2 # Digunakan untuk menggambar bounding box
+
+from utils.backends import load_backend_model
+from utils.metrics import observe, increment
+from utils.resolution import AdaptiveResolutionController, DEFAULT_IMGSZ_CANDIDATES
+from utils.tiling import tile_grid, merge_across_tiles, TILE_MERGE_MIN_SCORE
+
+# Modul ini sengaja TIDAK mengimpor streamlit, sehingga mesin deteksi bisa dipakai
+# dari worker process, skrip CLI, benchmark, maupun thread webcam tanpa efek samping UI.
+
+# Ambang batas keyakinan untuk pass mentah YOLO. Semua kotak di atas nilai ini disimpan,
+# sehingga perubahan slider cukup memfilter ulang tanpa memanggil model lagi.
+RAW_DETECTION_CONFIDENCE = 0.01
+
+# Ukuran sisi terpanjang gambar yang dikirim ke model (kelipatan 32)
+DEFAULT_IMGSZ = 640
+
+# Nama kelas daun sehat persis seperti di model
+HEALTHY_CLASS_NAME = "Daun Sehat"
+
+# Rekomendasi per kelas penyakit (nama kelas persis seperti di model)
+DISEASE_RECOMMENDATIONS = {
+    "Downy_Mildew": "Untuk embun bulu, pastikan drainase yang baik dan pertimbangkan fungisida yang tepat. ",
+    "Virus_Gemini": "Virus Gemini sulit diobati; fokus pada pengendalian vektor (kutu kebul) dan pemusnahan tanaman terinfeksi. ",
+    # Tambahkan rekomendasi untuk kelas penyakit lain jika ada di model Anda
+}
+
+# Teks rekomendasi sesuai urutan DISEASE_RECOMMENDATIONS (diindeks oleh tabel aturan per class_id)
+_RECOMMENDATION_TEXTS = list(DISEASE_RECOMMENDATIONS.values())
+
+MODEL_NOT_LOADED_RESULT = (["Error: Model tidak dimuat."], 0.0, "Model deteksi tidak tersedia. Silakan hubungi administrator.")
+
+
+def _to_numpy(values):
+    """
+    Mengubah tensor (torch) atau array apa pun menjadi numpy.ndarray.
+    """
+    if hasattr(values, 'cpu'):
+        values = values.cpu()
+    if hasattr(values, 'numpy'):
+        return values.numpy()
+    return np.asarray(values)
+
+def empty_raw_detections(names=None):
+    """
+    Deteksi mentah kosong (tidak ada kotak), dengan bentuk yang sama seperti hasil `infer`.
+    """
+    return {
+        "boxes": np.zeros((0, 4), dtype=np.float32),
+        "scores": np.zeros((0,), dtype=np.float32),
+        "class_ids": np.zeros((0,), dtype=np.int64),
+        "names": dict(names or {}),
+    }
+
+def raw_detections_to_record(raw_detections, image_shape, threshold=None):
+    """
+    Mengubah deteksi mentah menjadi field penyimpanan untuk `save_detection` /
+    `save_detection_records`: boxes, class_names, frame_size (lebar, tinggi) dan
+    threshold (ambang keyakinan yang dipakai untuk diagnosis, untuk rekap harian).
+    """
+    if raw_detections is None:
+        return {}
+    boxes = [(int(cls_id), float(score), *map(float, box))
+             for box, score, cls_id in zip(raw_detections["boxes"], raw_detections["scores"], raw_detections["class_ids"])]
+    return {
+        "boxes": boxes,
+        "class_names": dict(raw_detections["names"]),
+        "frame_size": (int(image_shape[1]), int(image_shape[0])),
+        "threshold": threshold,
+    }
+
+def scale_raw_detections(raw_detections, factor):
+    """
+    Deteksi mentah dengan koordinat kotak dikalikan `factor` (misalnya dari gambar
+    resolusi penuh ke salinan tampilan yang lebih kecil).
+    """
+    if raw_detections is None or factor == 1.0:
+        return raw_detections
+    return dict(raw_detections, boxes=(raw_detections["boxes"] * factor).astype(np.float32))
+
+def box_rows_to_raw_detections(box_rows, class_names, scale=1.0):
+    """
+    Kebalikan dari `raw_detections_to_record`: baris tabel `detection_boxes`
+    (class_id, score, x1, y1, x2, y2) -> dict deteksi mentah. `scale` mengubah koordinat
+    ke ukuran gambar yang ditampilkan (misalnya preview yang lebih kecil).
+    """
+    if not box_rows:
+        return empty_raw_detections(class_names)
+    rows = np.asarray(box_rows, dtype=np.float64)
+    return {
+        "boxes": (rows[:, 2:6] * scale).astype(np.float32),
+        "scores": rows[:, 1].astype(np.float32),
+        "class_ids": rows[:, 0].astype(np.int64),
+        "names": dict(class_names),
+    }
+
+
+class MelonDiseaseEngine:
+    """
+    Mesin deteksi penyakit daun melon tanpa ketergantungan pada Streamlit.
+
+    Memegang seluruh alur: memuat model, preprocessing, inferensi (dengan cache opsional),
+    postprocessing (threshold + keterangan) dan anotasi. Halaman Streamlit cukup menjadi
+    adapter tipis di atas kelas ini (lihat utils/model.py).
+
+    Args:
+        model_path (str): Lokasi file bobot YOLO.
+        model: Objek model yang sudah dimuat (opsional, misalnya stub untuk benchmark).
+        cache (InferenceResultCache): Cache hasil inferensi (opsional).
+        imgsz (int): Ukuran inferensi default (sisi terpanjang, kelipatan 32).
+        resolution_controller (AdaptiveResolutionController): Pemilih imgsz berdasarkan
+            anggaran latensi (opsional, dibuat otomatis jika tidak diberikan).
+        backend (str): "pytorch", "onnx", "openvino" atau "onnx-int8" (lihat utils/backends.py).
+        remote (InferenceServerClient): Jika diberikan, forward pass dikirim ke server
+            inferensi (utils/model_server.py) alih-alih model di proses ini.
+    """
+
+    def __init__(self, model_path, model=None, cache=None, imgsz=DEFAULT_IMGSZ, resolution_controller=None,
+                 backend="pytorch", remote=None):
+        self.model_path = model_path
+        self.model = model
+        self.cache = cache
+        self.imgsz = imgsz
+        # Ukuran default yang dikonfigurasi (MELON_INFERENCE_IMGSZ) selalu termasuk kandidat
+        self.resolution_controller = resolution_controller or \
+            AdaptiveResolutionController(candidates=DEFAULT_IMGSZ_CANDIDATES + (imgsz,))
+        self.backend = backend
+        self.remote = remote
+        self._class_rule_cache = {}
+        self._remote_class_names = {} # Peta kelas terakhir dari server inferensi (mode remote)
+        # Model Ultralytics tidak aman dipanggil bersamaan dari banyak thread: setiap forward
+        # pass lokal (upload, batch, tiled, webcam, video) lewat predict_raw di bawah kunci ini.
+        # Thread pool mode tiled hanya menumpuk persiapan tile dan konversi hasil di luar kunci.
+        self._model_lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        if self.remote is not None:
+            return self.remote.is_ready
+        return self.model is not None
+
+    @property
+    def class_names(self):
+        """
+        Peta class_id -> nama kelas model: dari model lokal, atau (mode remote) dari
+        hasil terakhir yang dikirim server inferensi.
+        """
+        if self.remote is not None:
+            return dict(self._remote_class_names)
+        return dict(getattr(self.load(), "names", {}) or {})
+
+    def load(self):
+        """
+        Memuat model YOLO dari `model_path` untuk backend yang dipilih jika belum dimuat
+        (ONNX/OpenVINO diekspor sekali dan disimpan di sebelah file .pt). Exception dari
+        Ultralytics diteruskan ke pemanggil agar adapter yang memutuskan cara menampilkannya.
+        """
+        if self.model is None:
+            self.model = load_backend_model(self.model_path, self.backend, self.imgsz)
+        return self.model
+
+    def _cache_variant(self, imgsz):
+        # Backend berbeda bisa memberi skor yang sedikit berbeda, jadi dibedakan di kunci cache
+        return f"{self.backend}:imgsz{imgsz}"
+
+    # --- Preprocessing ---
+
+    def preprocess(self, image_array):
+        """
+        Menyiapkan gambar RGB uint8 yang bersebelahan di memori untuk model.
+        """
+        if image_array.dtype != np.uint8:
+            image_array = np.clip(image_array, 0, 255).astype(np.uint8)
+        if image_array.ndim == 2:
+            image_array = cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB)
+        return np.ascontiguousarray(image_array)
+
+    @staticmethod
+    def resize_for_inference(image_array, imgsz):
+        """
+        Mengecilkan gambar sehingga sisi terpanjangnya = `imgsz` sebelum dikirim ke model,
+        agar Ultralytics tidak perlu menyalin array beresolusi penuh.
+
+        Returns:
+            tuple: (gambar untuk model, faktor skala kembali ke koordinat asli)
+        """
+        height, width = image_array.shape[:2]
+        longest_side = max(height, width)
+        if longest_side <= imgsz:
+            return image_array, 1.0
+        scale = imgsz / longest_side
+        resized = cv2.resize(image_array, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        return resized, longest_side / imgsz
+
+    def choose_imgsz(self, latency_budget_ms=None):
+        """
+        imgsz untuk satu permintaan: ukuran default jika tanpa anggaran latensi, atau
+        ukuran terbesar yang muat dalam anggaran menurut riwayat latensi.
+        """
+        if latency_budget_ms is None:
+            return self.imgsz
+        return self.resolution_controller.choose(latency_budget_ms, max_imgsz=self.imgsz)
+
+    # --- Inferensi ---
+
+    def infer(self, image_array, use_cache=True, imgsz=None, latency_budget_ms=None):
+        """
+        Menjalankan model sekali pada ambang batas rendah dan mengembalikan deteksi mentah:
+        {"boxes": (N, 4) xyxy, "scores": (N,), "class_ids": (N,), "names": {id: nama}}.
+        Koordinat kotak selalu dalam koordinat `image_array` asli.
+
+        `use_cache=False` dipakai untuk frame video yang praktis tidak pernah berulang,
+        agar tidak membanjiri cache hasil inferensi. `imgsz` memaksa ukuran inferensi
+        tertentu; `latency_budget_ms` memilih ukuran secara adaptif.
+        """
+        image_array = self.preprocess(image_array)
+        if imgsz is None:
+            imgsz = self.choose_imgsz(latency_budget_ms)
+        use_cache = use_cache and self.cache is not None
+        cache_key = None
+        if use_cache:
+            cache_key = self.cache.make_key(image_array, variant=self._cache_variant(imgsz))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                increment("inference_cache_hits")
+                return cached
+            increment("inference_cache_misses")
+
+        model_input, scale = self.resize_for_inference(image_array, imgsz)
+        started = time.perf_counter()
+        raw_detections = scale_raw_detections(self.predict_raw([model_input], imgsz)[0], scale)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.resolution_controller.record(imgsz, elapsed_ms)
+        observe("inference", elapsed_ms)
+
+        if use_cache:
+            self.cache.put(cache_key, raw_detections)
+        return raw_detections
+
+    def infer_batch(self, image_arrays, batch_size=8, imgsz=None, use_cache=True):
+        """
+        Versi batch dari `infer`. Gambar diambil dari `image_arrays` (list atau generator)
+        dalam micro-batch, dan setiap micro-batch dikirim ke model dalam satu forward pass.
+        `use_cache=False` untuk frame video yang tidak pernah berulang.
+
+        Yields:
+            tuple: (index, image_array, raw_detections) sesuai urutan input.
+        """
+        imgsz = imgsz or self.imgsz
+        batch = []
+        for index, image_array in enumerate(image_arrays):
+            batch.append((index, self.preprocess(image_array)))
+            if len(batch) >= batch_size:
+                yield from self._infer_micro_batch(batch, imgsz, use_cache)
+                batch = []
+        if batch:
+            yield from self._infer_micro_batch(batch, imgsz, use_cache)
+
+    def _infer_micro_batch(self, batch, imgsz, use_cache=True):
+        cache = self.cache if use_cache else None
+        raw_by_index = {}
+        pending = []
+        for index, image_array in batch:
+            cache_key = cache.make_key(image_array, variant=self._cache_variant(imgsz)) if cache is not None else None
+            cached = cache.get(cache_key) if cache is not None else None
+            if cached is not None:
+                raw_by_index[index] = cached
+            else:
+                model_input, scale = self.resize_for_inference(image_array, imgsz)
+                pending.append((index, model_input, scale, cache_key))
+
+        if pending:
+            # Satu forward pass untuk semua gambar yang belum ada di cache
+            started = time.perf_counter()
+            raws = self.predict_raw([model_input for _, model_input, _, _ in pending], imgsz)
+            observe("inference_batch", (time.perf_counter() - started) * 1000)
+            increment("inference_batch_images", len(pending))
+            for (index, _, scale, cache_key), raw in zip(pending, raws):
+                raw_detections = scale_raw_detections(raw, scale)
+                if cache is not None:
+                    cache.put(cache_key, raw_detections)
+                raw_by_index[index] = raw_detections
+
+        for index, image_array in batch:
+            yield index, image_array, raw_by_index[index]
+
+    def infer_tiled(self, image_array, tile_size=None, overlap=0.2, batch_size=8, workers=2,
+                    ios_threshold=0.6, use_cache=True):
+        """
+        Inferensi tiled untuk gambar beresolusi sangat tinggi (drone/DSLR): gambar dipotong
+        menjadi tile bertumpuk berukuran `tile_size` (default imgsz) yang dikirim ke model
+        pada resolusi aslinya, lalu kotak dari semua tile digabung dengan `merge_across_tiles`.
+
+        Memori puncak tetap terbatas berapa pun ukuran gambarnya: tile hanya berupa view
+        dari `image_array`, dan paling banyak `workers` batch berisi `batch_size` tile yang
+        sedang diproses sekaligus.
+
+        Returns:
+            dict: Deteksi mentah dengan bentuk yang sama seperti `infer`, dalam koordinat
+                  `image_array`.
+        """
+        image_array = self.preprocess(image_array)
+        tile_size = tile_size or self.imgsz
+        use_cache = use_cache and self.cache is not None
+        cache_key = None
+        if use_cache:
+            cache_key = self.cache.make_key(image_array, variant=f"{self.backend}:tiled{tile_size}:{overlap}:{TILE_MERGE_MIN_SCORE}")
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                increment("inference_cache_hits")
+                return cached
+            increment("inference_cache_misses")
+
+        height, width = image_array.shape[:2]
+        tiles = tile_grid(width, height, tile_size, overlap)
+        batches = [list(enumerate(tiles))[start:start + batch_size] for start in range(0, len(tiles), batch_size)]
+        if self.remote is None:
+            self.load()
+
+        started = time.perf_counter()
+        parts = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tiled-inference") as pool:
+            in_flight = []
+            for batch in batches:
+                in_flight.append(pool.submit(self._infer_tile_batch, image_array, batch, tile_size))
+                if len(in_flight) >= workers:
+                    parts.extend(in_flight.pop(0).result())
+            for future in in_flight:
+                parts.extend(future.result())
+        observe("inference_tiled", (time.perf_counter() - started) * 1000)
+        increment("inference_tiles", len(tiles))
+
+        names = parts[0][1]["names"] if parts else self.class_names
+        raw_detections = empty_raw_detections(names)
+        if parts:
+            boxes = np.concatenate([raw["boxes"] for _, raw in parts])
+            scores = np.concatenate([raw["scores"] for _, raw in parts])
+            class_ids = np.concatenate([raw["class_ids"] for _, raw in parts])
+            tile_ids = np.concatenate([np.full(len(raw["scores"]), tile_id) for tile_id, raw in parts])
+            raw_detections["boxes"], raw_detections["scores"], raw_detections["class_ids"] = \
+                merge_across_tiles(boxes, scores, class_ids, tile_ids, tiles, ios_threshold)
+
+        if use_cache:
+            self.cache.put(cache_key, raw_detections)
+        return raw_detections
+
+    def _infer_tile_batch(self, image_array, batch, tile_size):
+        # Dijalankan di thread pool: potong tile (view), satu forward pass per batch,
+        # lalu geser kotak dari koordinat tile ke koordinat gambar utuh
+        tile_inputs = [np.ascontiguousarray(image_array[y0:y1, x0:x1]) for _, (x0, y0, x1, y1) in batch]
+        raws = self.predict_raw(tile_inputs, tile_size)
+        parts = []
+        for (tile_id, (x0, y0, _, _)), raw in zip(batch, raws):
+            raw["boxes"] = raw["boxes"] + np.array([x0, y0, x0, y0], dtype=np.float32)
+            parts.append((tile_id, raw))
+        return parts
+
+    def predict_raw(self, model_inputs, imgsz):
+        """
+        Satu forward pass untuk gambar-gambar yang sudah dikecilkan ke `imgsz`; mengembalikan
+        deteksi mentah dalam koordinat masing-masing input. Dikirim ke server inferensi jika
+        `remote` diatur (dan dipakai oleh worker server itu sendiri).
+
+        Forward pass lokal diserialkan dengan `_model_lock`, karena satu objek model dipakai
+        bersama oleh thread skrip semua sesi, thread webcam dan thread pool mode tiled.
+        """
+        if self.remote is not None:
+            raws = self.remote.predict_raw(model_inputs, imgsz) # Server sendiri yang mengantrekan permintaan
+            if raws:
+                self._remote_class_names = raws[0]["names"]
+            return raws
+        with self._model_lock:
+            results = self.load()(model_inputs, conf=RAW_DETECTION_CONFIDENCE, imgsz=imgsz, verbose=False)
+        return [self._result_to_raw(result) for result in results]
+
+    def warm_up(self, imgsz=None):
+        """
+        Satu inferensi dummy (gambar hitam) agar inisialisasi graph dan kernel backend
+        terjadi sekarang, bukan pada permintaan pengguna pertama. Tidak memakai cache.
+        """
+        imgsz = imgsz or self.imgsz
+        started = time.perf_counter()
+        self.predict_raw([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], imgsz)
+        observe("warm_up", (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _result_to_raw(result, scale=1.0):
+        """
+        Mengubah satu objek hasil Ultralytics (untuk satu gambar) menjadi dict deteksi mentah.
+        `scale` memetakan kotak dari gambar yang dikecilkan kembali ke koordinat asli.
+        """
+        boxes = _to_numpy(result.boxes.xyxy).reshape(-1, 4).astype(np.float32)
+        if scale != 1.0:
+            boxes *= scale
+        return {
+            "boxes": boxes,
+            "scores": _to_numpy(result.boxes.conf).reshape(-1).astype(np.float32),
+            "class_ids": _to_numpy(result.boxes.cls).reshape(-1).astype(np.int64),
+            "names": dict(result.names),
+        }
+
+    # --- Postprocessing ---
+
+    def postprocess(self, raw_detections, confidence_threshold=0.25):
+        """
+        Memfilter deteksi mentah dengan ambang batas pengguna dan menyusun ringkasan diagnosis.
+        Tidak menyentuh gambar maupun model.
+
+        Returns:
+            dict: {"disease_boxes": list (label, conf, [x1, y1, x2, y2]),
+                   "diseases": list str, "avg_confidence": float, "keterangan": str,
+                   "detected_disease_names": set, "threshold": float}
+        """
+        started = time.perf_counter()
+        rules = self._class_rules(raw_detections["names"], raw_detections["class_ids"])
+
+        # Semua pemfilteran dilakukan sekaligus dengan mask NumPy, bukan per kotak
+        keep = raw_detections["scores"] >= confidence_threshold
+        class_ids = raw_detections["class_ids"][keep]
+        scores = raw_detections["scores"][keep]
+        boxes = raw_detections["boxes"][keep]
+        healthy_mask = rules["is_healthy"][class_ids]
+        disease_mask = ~healthy_mask
+
+        # Kelas penyakit (bukan 'Daun Sehat') yang memenuhi ambang batas pengguna
+        disease_ids = class_ids[disease_mask]
+        disease_scores = scores[disease_mask].astype(np.float64)
+        labels = rules["labels"]
+        disease_boxes = [(labels[cls_id], conf, box)
+                         for cls_id, conf, box in zip(disease_ids.tolist(), disease_scores.tolist(),
+                                                      boxes[disease_mask].astype(np.int64).tolist())]
+        diseases_found_list = [f"{label} ({conf*100:.1f}%)" for label, conf, _ in disease_boxes]
+        detected_ids = np.unique(disease_ids)
+        detected_disease_names = {labels[cls_id] for cls_id in detected_ids.tolist()}
+
+        # --- LOGIKA KETERANGAN DAN KEYAKINAN AKHIR ---
+        keterangan_text = ""
+        avg_confidence_output = 0.0
+
+        if len(disease_ids) > 0:
+            avg_confidence_output = float(disease_scores.mean())
+            # Rekomendasi diambil dari tabel per class_id, berurutan seperti DISEASE_RECOMMENDATIONS
+            recommendation_indices = np.unique(rules["recommendation_index"][detected_ids])
+            keterangan_text = "".join(_RECOMMENDATION_TEXTS[index] for index in recommendation_indices.tolist() if index >= 0)
+
+            if not keterangan_text:
+                keterangan_text = "Beberapa penyakit tidak terdeteksi. Mohon konsultasi dengan ahli pertanian."
+
+        elif healthy_mask.any():
+            # Sama seperti sebelumnya: kotak 'Daun Sehat' terakhir yang lolos ambang batas
+            diseases_found_list = [HEALTHY_CLASS_NAME]
+            avg_confidence_output = float(scores[healthy_mask][-1])
+
+        else:
+            diseases_found_list = ["Penyakit Tidak Terdeteksi"]
+            keterangan_text = "Tidak ada penyakit yang terdeteksi pada daun melon ini pada tingkat keyakinan yang ditentukan. Daun mungkin sehat atau penyakit belum dapat terdeteksi."
+
+        observe("postprocess", (time.perf_counter() - started) * 1000)
+        return {
+            "disease_boxes": disease_boxes,
+            "diseases": diseases_found_list,
+            "avg_confidence": avg_confidence_output,
+            "keterangan": keterangan_text,
+            "detected_disease_names": detected_disease_names,
+            "threshold": confidence_threshold,
+        }
+
+    def _class_rules(self, names, class_ids):
+        """
+        Tabel aturan per class_id (dibuat sekali per peta nama kelas): label, apakah kelas
+        daun sehat, dan indeks rekomendasinya di DISEASE_RECOMMENDATIONS (-1 = tidak ada).
+        """
+        max_id = max(max(names, default=-1), int(class_ids.max()) if len(class_ids) else -1)
+        key = (tuple(sorted(names.items())), max_id)
+        rules = self._class_rule_cache.get(key)
+        if rules is None:
+            size = max_id + 1
+            labels = [names.get(cls_id, str(cls_id)) for cls_id in range(size)]
+            recommendation_index = {name: index for index, name in enumerate(DISEASE_RECOMMENDATIONS)}
+            rules = {
+                "labels": labels,
+                "is_healthy": np.array([label == HEALTHY_CLASS_NAME for label in labels], dtype=bool),
+                "recommendation_index": np.array([recommendation_index.get(label, -1) for label in labels],
+                                                 dtype=np.int64),
+            }
+            self._class_rule_cache[key] = rules
+        return rules
+
+    # --- Anotasi ---
+
+    def annotate(self, image_array, summary):
+        """
+        Menggambar kotak dan label penyakit dari hasil `postprocess` pada salinan gambar.
+        """
+        started = time.perf_counter()
+        annotated_image = image_array.copy()
+        color = (0, 0, 255) # Merah untuk penyakit
+        for label, conf, (x1, y1, x2, y2) in summary["disease_boxes"]:
+            cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
+            text = f"{label}: {conf:.2f}"
+            text_y_pos = max(15, y1 - 10)
+            cv2.putText(annotated_image, text, (x1, text_y_pos),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        observe("annotate", (time.perf_counter() - started) * 1000)
+        return annotated_image
+
+    # --- Alur Lengkap ---
+
+    def apply_threshold(self, image_array, raw_detections, confidence_threshold=0.25):
+        """
+        Postprocessing + anotasi atas deteksi mentah yang sudah ada (tanpa memanggil model).
+
+        Returns:
+            tuple: (annotated_image, diseases_found_list, avg_confidence_output, keterangan_text)
+        """
+        if raw_detections is None:
+            return (image_array,) + MODEL_NOT_LOADED_RESULT
+        summary = self.postprocess(raw_detections, confidence_threshold)
+        return self.annotate(image_array, summary), summary["diseases"], summary["avg_confidence"], summary["keterangan"]
+
+    def predict(self, image_array, confidence_threshold=0.25):
+        """
+        Inferensi + postprocessing + anotasi untuk satu gambar RGB.
+
+        Returns:
+            tuple: (annotated_image, diseases_found_list, avg_confidence_output, keterangan_text)
+        """
+        image_array = self.preprocess(image_array)
+        return self.apply_threshold(image_array, self.infer(image_array), confidence_threshold)
+
+    def iter_predict_batch(self, image_arrays, confidence_threshold=0.25, batch_size=8):
+        """
+        Generator: (index, hasil `predict`) per gambar segera setelah micro-batch-nya selesai.
+        """
+        for index, image_array, raw_detections in self.infer_batch(image_arrays, batch_size):
+            yield index, self.apply_threshold(image_array, raw_detections, confidence_threshold)
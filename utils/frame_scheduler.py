@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+
+from utils.metrics import increment
+
+
+class LatestFrameScheduler:
+    """
+    Penjadwal inferensi asinkron "frame terbaru menang" untuk mode webcam.
+
+    `submit` hanya menaruh frame ke satu slot (menimpa frame lama yang belum diproses),
+    sehingga tidak pernah ada antrean yang menumpuk. Thread latar belakang selalu
+    mengambil frame terbaru, menjalankan `infer_fn`, lalu menyimpan hasilnya agar
+    `recv` bisa langsung menggambar kotak terakhir pada frame berikutnya.
+
+    Args:
+        infer_fn (callable): Fungsi frame -> hasil (dipanggil di thread latar belakang).
+        target_fps (float): Batas atas laju inferensi per detik (0 = secepat mungkin).
+    """
+
+    def __init__(self, infer_fn, target_fps=5.0, stats_window=60):
+        self.infer_fn = infer_fn
+        self.target_fps = target_fps
+
+        self._condition = threading.Condition()
+        self._pending_frame = None
+        self._latest_result = None
+        self._running = False
+        self._thread = None
+
+        self.submitted_frames = 0
+        self.dropped_frames = 0
+        self.inferred_frames = 0
+        self.failed_inferences = 0
+        self._submit_times = deque(maxlen=stats_window)
+        self._inference_times = deque(maxlen=stats_window)
+        self._latencies = deque(maxlen=stats_window)
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._worker_loop, name="webcam-inference", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, frame):
+        """
+        Menaruh frame terbaru untuk diinferensi. Frame sebelumnya yang belum sempat
+        diproses dibuang (dihitung sebagai drop).
+        """
+        with self._condition:
+            if self._pending_frame is not None:
+                self.dropped_frames += 1
+                increment("frames_dropped")
+            self._pending_frame = frame
+            self.submitted_frames += 1
+            increment("frames_submitted")
+            self._submit_times.append(time.monotonic())
+            self._condition.notify()
+
+    def latest_result(self):
+        """
+        Hasil inferensi terakhir yang sudah selesai (None jika belum ada).
+        """
+        with self._condition:
+            return self._latest_result
+
+    def _worker_loop(self):
+        last_start = 0.0
+        while True:
+            with self._condition:
+                while self._running and self._pending_frame is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+
+            # Batasi laju inferensi; frame yang datang selama menunggu tetap menimpa slot
+            if self.target_fps and self.target_fps > 0:
+                wait_time = last_start + 1.0 / self.target_fps - time.monotonic()
+                if wait_time > 0:
+                    time.sleep(wait_time)
+
+            with self._condition:
+                if not self._running:
+                    return
+                frame = self._pending_frame
+                self._pending_frame = None
+
+            last_start = time.monotonic()
+            try:
+                result = self.infer_fn(frame)
+            except Exception:
+                # Jangan hentikan thread karena satu frame gagal; frame berikutnya dicoba lagi
+                with self._condition:
+                    self.failed_inferences += 1
+                continue
+            finished = time.monotonic()
+
+            with self._condition:
+                self._latest_result = result
+                self.inferred_frames += 1
+                self._inference_times.append(finished)
+                self._latencies.append(finished - last_start)
+
+    @staticmethod
+    def _rate(timestamps):
+        if len(timestamps) < 2:
+            return 0.0
+        elapsed = timestamps[-1] - timestamps[0]
+        return (len(timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        """
+        Statistik penjadwal: fps kamera, fps inferensi, latensi dan tingkat drop frame.
+        """
+        with self._condition:
+            return {
+                "camera_fps": self._rate(self._submit_times),
+                "inference_fps": self._rate(self._inference_times),
+                "avg_latency_ms": (sum(self._latencies) / len(self._latencies) * 1000) if self._latencies else 0.0,
+                "submitted_frames": self.submitted_frames,
+                "inferred_frames": self.inferred_frames,
+                "dropped_frames": self.dropped_frames,
+                "failed_inferences": self.failed_inferences,
+                "drop_rate": self.dropped_frames / self.submitted_frames if self.submitted_frames else 0.0,
+            }
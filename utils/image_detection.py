@@ -1,51 +1,117 @@
 import streamlit as st
-import numpy as np
-from PIL import Image
 import io
 import os
 import datetime
 
-from utils.model import predict_melon_disease, MODEL
-from utils.database import save_detection
+from utils.model import detect_raw, detect_raw_batch, detect_raw_tiled, apply_detection_threshold, require_model, INFERENCE_CACHE
+from utils.model import ENGINE, TILED_MAX_SIDE
+from utils.engine import raw_detections_to_record, scale_raw_detections
+from utils.database import save_detections_bulk
+from utils.persistence import get_write_queue
+from utils.thumbnails import create_thumbnails
+from utils.metrics import span
+from utils.ingest import decode_image, INGEST_MAX_SIDE
+from utils.model_server import InferenceServerBusy
+from utils.session_store import store_payload, load_payload, set_session_payload, get_session_payload
+
+# Jumlah gambar per forward pass pada mode unggah banyak gambar
+BATCH_UPLOAD_SIZE = 8
 
 
 # Fungsi untuk memproses gambar dan menyimpan hasilnya ke session_state
-def process_and_store_detection_results(image_bytes, image_name, source_type):
+def process_and_store_detection_results(image_bytes, image_name, source_type, tiled=False):
     """
     Melakukan deteksi pada gambar yang diberikan (dalam bentuk bytes) dan menyimpan hasilnya
     serta informasi gambar ke st.session_state['detection_results_display'].
     Ini adalah fungsi inti yang dipanggil untuk memicu pemrosesan gambar.
+
+    Bytes unggahan, buffer kerja dan gambar hasil anotasi disimpan di session store bersama
+    (utils/session_store.py); st.session_state hanya memegang referensinya.
+
+    Jika `tiled` True, gambar di-decode hingga TILED_MAX_SIDE dan dideteksi per tile;
+    setelah itu hanya salinan berukuran buffer kerja (beserta kotak yang diskalakan)
+    yang disimpan, sehingga anotasi dan penyimpanan memakai jalur yang sama.
+
+    Kunci sesi gambar baru baru ditulis setelah inferensi berhasil, sehingga jika model belum
+    siap atau server inferensi penuh, hasil gambar sebelumnya tetap utuh dan konsisten.
+
+    Returns:
+        bool: True jika deteksi berhasil dan hasilnya sudah disimpan ke session_state.
     """
-    if MODEL is None:
-        st.session_state['detection_results_display'] = {
-            "annotated_image": None, "diseases": [], "avg_confidence": 0.0, 
-            "keterangan": "Model AI belum dimuat. Mohon periksa kembali konfigurasi model Anda.",
-            "original_image_name": image_name, "threshold_used": -1.0
-        }
-        st.error("Model AI belum dimuat. Fitur deteksi tidak berfungsi.")
-        return
+    if not require_model(): # Menampilkan pesan sendiri jika model masih dimuat atau gagal
+        return False
+
+    try:
+        with span("decode"):
+            # Mode tiled: decode hingga TILED_MAX_SIDE; biasa: langsung ke ukuran buffer kerja
+            # (bukan resolusi penuh foto ponsel), keduanya dengan orientasi EXIF
+            decoded = decode_image(image_bytes, max_side=TILED_MAX_SIDE if tiled else INGEST_MAX_SIDE)
+    except ValueError as e: # Gambar melebihi batas piksel decode
+        st.error(str(e))
+        return False
+
+    if tiled:
+        full_array, decoded = decoded, None # Satu referensi saja agar bisa dilepas di bawah
+        with st.spinner('Menganalisis gambar per tile (resolusi tinggi)...'):
+            try:
+                raw_detections = detect_raw_tiled(full_array)
+            except InferenceServerBusy as e:
+                st.warning(str(e))
+                return False
+            # Gambar resolusi penuh dilepas segera; yang disimpan hanya salinan tampilan
+            img_array, scale = ENGINE.resize_for_inference(full_array, INGEST_MAX_SIDE)
+            del full_array
+            _store_current_image(image_bytes, image_name, source_type, tiled, img_array,
+                                 scale_raw_detections(raw_detections, 1.0 / scale))
+        return True
+
+    img_array = decoded
+    with st.spinner('Menganalisis gambar dan mendeteksi penyakit...'):
+        # Simpan buffer kerja dan deteksi mentah (semua kotak dari pass conf=0.01, dalam koordinat
+        # buffer kerja) agar perubahan threshold berikutnya tidak perlu decode ulang maupun memanggil YOLO.
+        try:
+            raw_detections = detect_raw(img_array)
+        except InferenceServerBusy as e:
+            st.warning(str(e))
+            return False
+        _store_current_image(image_bytes, image_name, source_type, tiled, img_array, raw_detections)
+    return True
 
-    st.session_state['current_image_bytes'] = image_bytes
+def _store_current_image(image_bytes, image_name, source_type, tiled, img_array, raw_detections):
+    # Semua kunci gambar aktif ditulis bersamaan, lalu hasil tampilannya dihitung ulang
+    set_session_payload('current_image_bytes', image_bytes)
     st.session_state['current_image_name'] = image_name
     st.session_state['last_detection_source'] = source_type
+    st.session_state['current_tiled_mode'] = tiled
+    set_session_payload('current_image_array', img_array)
+    st.session_state['current_raw_detections'] = raw_detections
+    refilter_detection_results()
 
-    image_pil = Image.open(io.BytesIO(image_bytes))
-    img_array = np.array(image_pil.convert('RGB'))
 
+# Fungsi untuk menerapkan ulang threshold pada deteksi mentah yang sudah tersimpan
+def refilter_detection_results():
+    """
+    Memfilter ulang deteksi mentah di st.session_state['current_raw_detections'] dengan
+    threshold saat ini dan menggambar ulang anotasinya. Tidak ada pemanggilan model,
+    sehingga cukup cepat untuk dijalankan setiap kali slider digeser.
+    """
     current_threshold = st.session_state.get('confidence_threshold', 0.5) 
 
-    with st.spinner('Menganalisis gambar dan mendeteksi penyakit...'):
-        annotated_img_array, diseases_output, avg_confidence_output, keterangan_output_text = \
-            predict_melon_disease(img_array, current_threshold)
-        
-        st.session_state['detection_results_display'] = {
-            "annotated_image": annotated_img_array,
-            "diseases": diseases_output,
-            "avg_confidence": avg_confidence_output,
-            "keterangan": keterangan_output_text,
-            "original_image_name": image_name,
-            "threshold_used": current_threshold 
-        }
+    annotated_img_array, diseases_output, avg_confidence_output, keterangan_output_text = \
+        apply_detection_threshold(
+            get_session_payload('current_image_array'),
+            st.session_state['current_raw_detections'],
+            current_threshold
+        )
+    
+    st.session_state['detection_results_display'] = {
+        "annotated_image": store_payload(annotated_img_array), # Referensi ke session store
+        "diseases": diseases_output,
+        "avg_confidence": avg_confidence_output,
+        "keterangan": keterangan_output_text,
+        "original_image_name": st.session_state.get('current_image_name'),
+        "threshold_used": current_threshold 
+    }
 
 
 # Fungsi untuk menampilkan UI hasil deteksi untuk mode unggah gambar
@@ -54,7 +120,8 @@ def display_detection_results_ui():
     Menampilkan UI hasil deteksi dari st.session_state['detection_results_display'].
     Fungsi ini hanya bertanggung jawab pada tampilan, tidak memicu pemrosesan ulang.
     """
-    if st.session_state.get('current_image_bytes') is None or \
+    image_bytes = get_session_payload('current_image_bytes') # None juga jika sudah dibuang dari store
+    if image_bytes is None or \
        st.session_state.get('last_detection_source') != 'upload':
         if 'detection_results_display' in st.session_state:
             del st.session_state['detection_results_display']
@@ -62,18 +129,26 @@ def display_detection_results_ui():
             del st.session_state['current_image_bytes']
         if 'current_image_name' in st.session_state:
             del st.session_state['current_image_name']
+        if 'current_image_array' in st.session_state:
+            del st.session_state['current_image_array']
+        if 'current_raw_detections' in st.session_state:
+            del st.session_state['current_raw_detections']
         return 
 
     st.subheader("Gambar yang diunggah:")
-    st.image(io.BytesIO(st.session_state['current_image_bytes']), 
-             caption=st.session_state['current_image_name'], 
-             use_container_width=True) # Gunakan use_container_width
+    with span("render"):
+        st.image(io.BytesIO(image_bytes), 
+                 caption=st.session_state['current_image_name'], 
+                 use_container_width=True) # Gunakan use_container_width
     
     if st.session_state['detection_results_display']:
         display_results = st.session_state['detection_results_display']
         
         st.subheader("Hasil Deteksi:")
-        st.image(display_results['annotated_image'], caption='Hasil Deteksi', use_container_width=True) # Gunakan use_container_width
+        annotated_image = load_payload(display_results['annotated_image'])
+        if annotated_image is not None:
+            with span("render"): # Termasuk encode gambar hasil anotasi oleh st.image
+                st.image(annotated_image, caption='Hasil Deteksi', use_container_width=True) # Gunakan use_container_width
 
         if "Daun Sehat" in display_results['diseases']:
             st.success(f"✅ Daun melon terlihat **Sehat** (Keyakinan: {display_results['avg_confidence']*100:.1f}%)")
@@ -84,6 +159,18 @@ def display_detection_results_ui():
             
             if display_results['keterangan']: 
                 st.info(f"**Keterangan:** {display_results['keterangan']}")
+
+        # DEBUG: nama kelas persis dari model (dulu ditulis ke sidebar di setiap prediksi,
+        # sekarang hanya di halaman unggah agar tidak ada panggilan UI di jalur inferensi)
+        raw_detections = st.session_state.get('current_raw_detections')
+        if raw_detections is not None:
+            with st.expander("DEBUG: Nama Kelas Model"):
+                for class_name in raw_detections['names'].values():
+                    st.text(f"- '{class_name}'")
+
+        cache_stats = INFERENCE_CACHE.stats()
+        st.caption(f"Cache inferensi: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+                   f"(tingkat hit {cache_stats['hit_rate']*100:.0f}%)")
         
         # Logika simpan otomatis dipindahkan ke handle_image_upload_detection
 
@@ -97,20 +184,32 @@ def handle_image_upload_detection():
     st.header("Deteksi Penyakit dari Gambar")
     st.write("Unggah gambar daun melon Anda untuk analisis.")
 
+    if st.checkbox("Mode unggah banyak gambar (batch)", key="batch_upload_mode"):
+        handle_batch_upload_detection()
+        return
+
+    tiled_mode = st.checkbox("Mode tiled untuk gambar resolusi tinggi (drone/DSLR)", key="tiled_inference_mode",
+                             help="Gambar dipotong menjadi tile bertumpuk agar lesi kecil tidak hilang saat gambar dikecilkan.")
+
     uploaded_file = st.file_uploader("Pilih gambar dari perangkat Anda", type=['png', 'jpg', 'jpeg'], key="image_uploader_main")
 
-    # Deteksi otomatis saat file baru diunggah atau beralih sumber
+    # Deteksi otomatis saat file baru diunggah, beralih sumber, atau mode tiled diubah
     if uploaded_file is not None:
         if st.session_state.get('current_image_name') != uploaded_file.name or \
            st.session_state.get('last_detection_source') != 'upload' or \
-           st.session_state.get('current_image_bytes') is None:
+           get_session_payload('current_image_bytes') is None or \
+           st.session_state.get('current_tiled_mode', False) != tiled_mode: # Payload bisa sudah dibuang dari store
             
             image_bytes = uploaded_file.read()
-            process_and_store_detection_results(image_bytes, uploaded_file.name, 'upload')
-            st.session_state['pending_auto_save_upload'] = True # Set flag di session_state
-            st.rerun() 
+            # Jika gagal (model belum siap, server penuh), pesannya tetap terlihat dan tidak ada
+            # yang disimpan; deteksi dicoba lagi pada interaksi berikutnya
+            if process_and_store_detection_results(image_bytes, uploaded_file.name, 'upload', tiled=tiled_mode):
+                st.session_state['pending_auto_save_upload'] = True # Set flag di session_state
+                st.rerun() 
 
-    # Logika untuk memicu pemrosesan ulang (update live) saat slider digeser.
+    # Logika untuk update live saat slider digeser: cukup filter ulang deteksi mentah
+    # yang sudah tersimpan, tanpa decode ulang gambar dan tanpa memanggil YOLO.
+    # Di sini cukup cek referensinya; payload baru dimuat (dan dicek None) jika threshold berubah.
     if st.session_state.get('current_image_bytes') is not None and \
        st.session_state.get('last_detection_source') == 'upload':
         
@@ -118,12 +217,20 @@ def handle_image_upload_detection():
         display_threshold_used = st.session_state.get('detection_results_display', {}).get('threshold_used', -1.0)
         
         if abs(display_threshold_used - current_threshold) > 0.001:
-            process_and_store_detection_results(
-                st.session_state['current_image_bytes'], 
-                st.session_state['current_image_name'], 
-                'upload'
-            )
-            st.rerun() 
+            image_bytes = get_session_payload('current_image_bytes')
+            if st.session_state.get('current_raw_detections') is not None and \
+               get_session_payload('current_image_array') is not None:
+                refilter_detection_results()
+                st.rerun()
+            elif image_bytes is not None:
+                if process_and_store_detection_results(
+                    image_bytes,
+                    st.session_state['current_image_name'],
+                    'upload',
+                    tiled=tiled_mode
+                ):
+                    st.rerun()
+            # Jika keduanya sudah dibuang dari session store, tampilan di bawah ikut dikosongkan
     
     display_detection_results_ui()
 
@@ -134,24 +241,129 @@ def handle_image_upload_detection():
         display_results = st.session_state['detection_results_display']
         
         save_dir = "temp_images"
-        os.makedirs(save_dir, exist_ok=True)
         unique_filename = f"{st.session_state['username']}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{st.session_state['current_image_name']}"
         image_path_to_save = os.path.join(save_dir, unique_filename)
         
+        # Semua kotak mentah ikut disimpan agar riwayat bisa menggambar ulang anotasi tanpa model
+        image_array = get_session_payload('current_image_array')
+        record_fields = raw_detections_to_record(st.session_state.get('current_raw_detections'), image_array.shape,
+                                                 display_results['threshold_used']) \
+            if image_array is not None else {}
+        
         try:
-            Image.open(io.BytesIO(st.session_state['current_image_bytes'])).save(image_path_to_save)
-
-            save_detection(
+            # Penulisan file dan insert ke database dikerjakan antrean write-behind di latar
+            # belakang; bytes asli ditulis apa adanya tanpa dibuka dan di-encode ulang dengan PIL.
+            get_write_queue().submit(
                 st.session_state['username'],
                 image_path_to_save,
                 display_results['diseases'],
                 display_results['avg_confidence'],
-                display_results['keterangan']
+                display_results['keterangan'],
+                image_bytes=get_session_payload('current_image_bytes'),
+                **record_fields
             )
             st.success("Hasil deteksi telah disimpan secara otomatis ke riwayat Anda!")
-            st.session_state['pending_auto_save_upload'] = False # Reset flag setelah berhasil disimpan
+            st.session_state['pending_auto_save_upload'] = False # Reset flag setelah berhasil dijadwalkan
         except Exception as e:
             st.error(f"Gagal menyimpan hasil deteksi ke riwayat: {e}")
             # Opsional: tambahkan st.session_state['pending_auto_save_upload'] = False
             # agar tidak mencoba menyimpan lagi jika ada error.
-            st.session_state['pending_auto_save_upload'] = False
\ No newline at end of file
+            st.session_state['pending_auto_save_upload'] = False
+
+
+# Fungsi untuk mode unggah banyak gambar sekaligus
+def handle_batch_upload_detection():
+    """
+    Menangani unggah banyak gambar sekaligus. Gambar dianalisis dalam micro-batch
+    (satu forward pass YOLO per batch) dalam satu kali eksekusi skrip, hasil per gambar
+    ditampilkan segera setelah batch-nya selesai, lalu semuanya disimpan ke riwayat
+    dengan satu bulk insert.
+    """
+    if not require_model():
+        return
+
+    uploaded_files = st.file_uploader("Pilih beberapa gambar dari perangkat Anda", type=['png', 'jpg', 'jpeg'],
+                                      accept_multiple_files=True, key="image_uploader_batch")
+    if not uploaded_files:
+        return
+
+    if not st.button(f"Analisis {len(uploaded_files)} Gambar", use_container_width=True):
+        # Tampilkan ringkasan batch terakhir (jika ada) tanpa memproses ulang
+        if st.session_state.get('batch_detection_summary'):
+            st.subheader("Ringkasan Batch Terakhir:")
+            st.dataframe(st.session_state['batch_detection_summary'], use_container_width=True)
+        return
+
+    current_threshold = st.session_state.get('confidence_threshold', 0.5)
+    image_bytes_list = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+
+    def decoded_images():
+        # Decode secara malas agar hanya satu micro-batch yang ada di memori
+        for image_bytes in image_bytes_list:
+            with span("decode"):
+                image_array = decode_image(image_bytes)
+            yield image_array
+
+    progress = st.progress(0.0, text="Menganalisis gambar...")
+    results_container = st.container()
+    summary_rows = []
+    pending_saves = []
+
+    save_dir = "temp_images"
+    os.makedirs(save_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    try:
+        for done, (index, img_array, raw_detections) in enumerate(
+                detect_raw_batch(decoded_images(), BATCH_UPLOAD_SIZE), start=1):
+            annotated_img_array, diseases_output, avg_confidence_output, keterangan_output_text = \
+                apply_detection_threshold(img_array, raw_detections, current_threshold)
+            image_name = uploaded_files[index].name
+
+            with results_container:
+                col_img, col_info = st.columns([1, 2])
+                col_img.image(annotated_img_array, caption=image_name, use_container_width=True)
+                if "Daun Sehat" in diseases_output:
+                    col_info.success(f"✅ **Sehat** (Keyakinan: {avg_confidence_output*100:.1f}%)")
+                else:
+                    col_info.error(f"❗ {', '.join(diseases_output)}")
+
+            image_path_to_save = os.path.join(save_dir, f"{st.session_state['username']}_{timestamp}_{index}_{image_name}")
+            try:
+                # Simpan bytes asli apa adanya, tanpa decode dan encode ulang
+                with open(image_path_to_save, 'wb') as f:
+                    f.write(image_bytes_list[index])
+                thumbnail_path, preview_path = create_thumbnails(image_path_to_save, image_bytes_list[index])
+                pending_saves.append({
+                    "image_path": image_path_to_save,
+                    "diseases": diseases_output,
+                    "confidence": avg_confidence_output,
+                    "recommendations": keterangan_output_text,
+                    "thumbnail_path": thumbnail_path,
+                    "preview_path": preview_path,
+                    **raw_detections_to_record(raw_detections, img_array.shape, current_threshold),
+                })
+            except Exception as e:
+                st.error(f"Gagal menyimpan gambar {image_name}: {e}")
+
+            summary_rows.append({
+                "Gambar": image_name,
+                "Penyakit Terdeteksi": ", ".join(diseases_output),
+                "Keyakinan Rata-rata": f"{avg_confidence_output*100:.1f}%",
+            })
+            progress.progress(done / len(uploaded_files), text=f"Menganalisis gambar... ({done}/{len(uploaded_files)})")
+    except InferenceServerBusy as e:
+        # Hasil yang sudah selesai tetap disimpan; sisanya bisa diunggah ulang
+        st.warning(str(e))
+    except ValueError as e: # Salah satu gambar melebihi batas piksel decode
+        st.error(str(e))
+
+    progress.empty()
+    st.session_state['batch_detection_summary'] = summary_rows
+
+    try:
+        with span("db_write"):
+            saved_count = save_detections_bulk(st.session_state['username'], pending_saves)
+        st.success(f"{saved_count} hasil deteksi telah disimpan secara otomatis ke riwayat Anda!")
+    except Exception as e:
+        st.error(f"Gagal menyimpan hasil deteksi ke riwayat: {e}")
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.database import get_cached_inference, save_cached_inference
+
+
+def serialize_raw_detections(raw_detections):
+    """
+    Mengubah deteksi mentah (dict berisi array NumPy) menjadi JSON string
+    agar bisa disimpan di tabel `inference_cache`.
+    """
+    return json.dumps({
+        "boxes": raw_detections["boxes"].tolist(),
+        "scores": raw_detections["scores"].tolist(),
+        "class_ids": raw_detections["class_ids"].tolist(),
+        "names": {str(k): v for k, v in raw_detections["names"].items()},
+    })
+
+def deserialize_raw_detections(payload):
+    """
+    Kebalikan dari `serialize_raw_detections`: JSON string -> dict berisi array NumPy.
+    """
+    data = json.loads(payload)
+    return {
+        "boxes": np.asarray(data["boxes"], dtype=np.float32).reshape(-1, 4),
+        "scores": np.asarray(data["scores"], dtype=np.float32).reshape(-1),
+        "class_ids": np.asarray(data["class_ids"], dtype=np.int64).reshape(-1),
+        "names": {int(k): v for k, v in data["names"].items()},
+    }
+
+
+class InferenceResultCache:
+    """
+    Cache hasil inferensi berbasis isi (content-addressed), dipakai bersama oleh semua sesi.
+
+    Kunci cache = hash isi gambar + hash file bobot model, sehingga foto yang sama
+    (dari pengguna mana pun) tidak perlu melewati YOLO lagi, dan cache otomatis
+    tidak berlaku ketika file model diganti.
+
+    Terdiri dari dua tingkat:
+    - LRU di memori proses dengan ukuran terbatas (`max_entries`).
+    - Tier persisten di tabel `inference_cache` SQLite (utils/database.py).
+    """
+
+    def __init__(self, model_path, max_entries=256, persistent=True):
+        self.model_path = model_path
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_hash = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def model_hash(self):
+        """
+        Hash SHA256 dari file bobot model (dihitung sekali lalu disimpan).
+        Jika file tidak ada, path model yang dipakai sebagai gantinya.
+        """
+        if self._model_hash is None:
+            digest = hashlib.sha256()
+            if os.path.exists(self.model_path):
+                with open(self.model_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+            else:
+                digest.update(self.model_path.encode())
+            self._model_hash = digest.hexdigest()
+        return self._model_hash
+
+    def make_key(self, image_array, variant=""):
+        """
+        Membuat kunci cache dari isi piksel gambar (termasuk bentuk dan dtype) dan hash model.
+        `variant` membedakan pengaturan inferensi yang mengubah hasil (misalnya imgsz).
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(str((image_array.shape, image_array.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(image_array).data)
+        return f"{digest.hexdigest()}:{self.model_hash[:16]}:{variant}"
+
+    def get(self, key):
+        """
+        Mencari hasil di LRU memori lalu di SQLite. Mengembalikan None jika tidak ada (miss).
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+
+        if self.persistent:
+            payload = get_cached_inference(key)
+            if payload is not None:
+                raw_detections = deserialize_raw_detections(payload)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, raw_detections)
+                return raw_detections
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, raw_detections):
+        """
+        Menyimpan hasil ke LRU memori dan (jika aktif) ke tier persisten SQLite.
+        """
+        with self._lock:
+            self._remember(key, raw_detections)
+        if self.persistent:
+            save_cached_inference(key, serialize_raw_detections(raw_detections))
+
+    def _remember(self, key, raw_detections):
+        # Dipanggil dengan self._lock sudah dipegang
+        self._entries[key] = raw_detections
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Mengembalikan penghitung hit/miss cache untuk ditampilkan atau dicatat.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
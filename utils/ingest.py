@@ -0,0 +1,53 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Sisi terpanjang buffer kerja hasil decode (piksel). Cukup besar untuk anotasi yang tajam
+# di layar dan tetap >= ukuran inferensi model (MELON_INFERENCE_IMGSZ), tetapi jauh lebih
+# kecil dari foto ponsel 12-48 MP. Inferensi, anotasi dan koordinat kotak yang disimpan
+# semuanya memakai buffer ini (frame_size = ukuran buffer kerja).
+INGEST_MAX_SIDE = int(os.environ.get("MELON_INGEST_MAX_SIDE", 1280))
+# Batas piksel yang boleh di-decode (setelah reduksi draft JPEG). PNG dan format lain tidak
+# bisa di-decode pada skala kecil, jadi file yang lebih besar ditolak sebelum decode agar
+# memori puncak tetap terbatas berapa pun ukuran file unggahan (50 MP ~ 150 MB RGB).
+INGEST_MAX_DECODE_PIXELS = int(os.environ.get("MELON_INGEST_MAX_DECODE_PIXELS", 50_000_000))
+
+# Ekstensi file gambar yang diproses oleh alat offline (kalibrasi, evaluasi, bulk ingest)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def decode_image(image_source, max_side=INGEST_MAX_SIDE, max_pixels=INGEST_MAX_DECODE_PIXELS):
+    """
+    Decode gambar unggahan menjadi satu buffer kerja RGB uint8 dengan sisi terpanjang
+    paling besar `max_side`, tanpa pernah membuat array beresolusi penuh.
+
+    - JPEG di-decode langsung pada skala 1/2, 1/4 atau 1/8 (draft) yang masih >= `max_side`.
+    - Orientasi EXIF diterapkan, sehingga foto ponsel tidak lagi tampil miring.
+    - Format lain (PNG) di-decode penuh oleh PIL lalu langsung dikecilkan sebelum
+      diubah menjadi array NumPy.
+    - Gambar yang masih lebih besar dari `max_pixels` setelah draft ditolak (ValueError)
+      sebelum di-decode.
+
+    Args:
+        image_source (bytes | str): Bytes gambar atau path file.
+        max_side (int): Sisi terpanjang maksimum buffer kerja.
+        max_pixels (int): Jumlah piksel maksimum yang boleh di-decode.
+
+    Returns:
+        numpy.ndarray: Gambar RGB (tinggi, lebar, 3) uint8.
+    """
+    source = io.BytesIO(image_source) if isinstance(image_source, (bytes, bytearray)) else image_source
+    with Image.open(source) as image:
+        # Permintaan persegi: hasil draft tetap >= max_side apa pun orientasinya
+        image.draft('RGB', (max_side, max_side))
+        if image.width * image.height > max_pixels:
+            raise ValueError(f"Gambar terlalu besar untuk diproses ({image.width}x{image.height} piksel, "
+                             f"maksimum {max_pixels / 1e6:.0f} MP).")
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        # thumbnail memakai reduce() lebih dulu untuk faktor besar, lalu resampling halus
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return np.array(image)
@@ -0,0 +1,236 @@
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Jumlah sampel terakhir per tahap yang dipakai untuk menghitung persentil (histogram bergulir)
+METRICS_WINDOW = 1024
+
+# Ekspor opsional:
+# - MELON_METRICS_FILE: path file teks format Prometheus (untuk textfile collector node_exporter),
+#   ditulis ulang setiap MELON_METRICS_FILE_INTERVAL_S detik
+# - MELON_METRICS_PORT: port HTTP lokal yang melayani GET /metrics dan GET /ready
+#   (200 jika semua komponen siap, 503 jika belum; untuk health check deploy)
+METRICS_FILE = os.environ.get("MELON_METRICS_FILE")
+METRICS_FILE_INTERVAL_S = float(os.environ.get("MELON_METRICS_FILE_INTERVAL_S", 15))
+METRICS_PORT = os.environ.get("MELON_METRICS_PORT")
+
+# Prefiks nama metrik Prometheus
+METRIC_PREFIX = "melon"
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _percentile(sorted_samples, quantile):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(quantile * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class MetricsRegistry:
+    """
+    Kumpulan metrik untuk seluruh proses: durasi per tahap (ms) dalam jendela bergulir
+    `window` sampel terakhir (untuk p50/p95/p99) beserta jumlah dan total kumulatif,
+    serta counter dan gauge sederhana. Aman dipanggil dari banyak thread (sesi Streamlit,
+    thread webcam, antrean write-behind).
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = {}
+        self._counters = collections.Counter()
+        self._gauges = {}
+
+    def observe(self, stage, duration_ms):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = collections.deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0]
+            samples.append(duration_ms)
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += duration_ms
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Mengukur durasi blok `with` sebagai satu sampel tahap `stage`. Jika blok
+        melempar exception, counter `<stage>_errors` ikut bertambah.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{stage}_errors")
+            raise
+        finally:
+            self.observe(stage, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"stages": {tahap: {count, sum_ms, mean_ms, p50_ms, p95_ms, p99_ms}},
+                   "counters": {nama: nilai}, "gauges": {nama: nilai}}
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            totals = {stage: tuple(values) for stage, values in self._totals.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        stages = {}
+        for stage in sorted(samples):
+            count, sum_ms = totals[stage]
+            stages[stage] = {
+                "count": count,
+                "sum_ms": sum_ms,
+                "mean_ms": sum_ms / count if count else 0.0,
+                **{f"p{int(q * 100)}_ms": _percentile(samples[stage], q) for q in QUANTILES},
+            }
+        return {"stages": stages, "counters": dict(sorted(counters.items())), "gauges": dict(sorted(gauges.items()))}
+
+    def prometheus_text(self):
+        """
+        Metrik dalam format teks eksposisi Prometheus: durasi tahap sebagai summary
+        (kuantil dari jendela bergulir, _sum/_count kumulatif) dan counter sebagai _total.
+        """
+        snapshot = self.snapshot()
+        name = f"{METRIC_PREFIX}_stage_duration_ms"
+        lines = [f"# HELP {name} Durasi tahap pipeline deteksi dalam milidetik.",
+                 f"# TYPE {name} summary"]
+        for stage, stats in snapshot["stages"].items():
+            for q in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {stats[f"p{int(q * 100)}_ms"]:.3f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {stats["sum_ms"]:.3f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+        for counter, value in snapshot["counters"].items():
+            counter_name = f"{METRIC_PREFIX}_{counter}_total"
+            lines.append(f"# TYPE {counter_name} counter")
+            lines.append(f"{counter_name} {value}")
+        for gauge, value in snapshot["gauges"].items():
+            gauge_name = f"{METRIC_PREFIX}_{gauge}"
+            lines.append(f"# TYPE {gauge_name} gauge")
+            lines.append(f"{gauge_name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path):
+        # Ditulis ke file sementara lalu di-rename agar pembaca tidak pernah melihat file setengah jadi
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+
+METRICS = MetricsRegistry()
+
+def span(stage):
+    """
+    Context manager untuk mengukur satu tahap pada registry bersama:
+
+        with span("decode"):
+            ...
+    """
+    return METRICS.span(stage)
+
+def observe(stage, duration_ms):
+    METRICS.observe(stage, duration_ms)
+
+def increment(name, value=1):
+    METRICS.increment(name, value)
+
+def set_gauge(name, value):
+    METRICS.set_gauge(name, value)
+
+
+# --- Kesiapan (readiness) ---
+# Komponen yang butuh waktu untuk siap (misalnya model yang dimuat di latar belakang)
+# mendaftarkan fungsi yang mengembalikan (siap, keterangan). Dipakai GET /ready.
+_READINESS_CHECKS = {}
+
+def register_readiness_check(name, check):
+    _READINESS_CHECKS[name] = check
+
+def readiness():
+    """
+    Returns:
+        tuple: (semua komponen siap, {nama: {"ready": bool, "detail": str}})
+    """
+    components = {}
+    for name, check in list(_READINESS_CHECKS.items()):
+        ready, detail = check()
+        components[name] = {"ready": bool(ready), "detail": detail}
+    return all(component["ready"] for component in components.values()), components
+
+
+# --- Ekspor ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._respond(200, METRICS.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/ready":
+            ready, components = readiness()
+            self._respond(200 if ready else 503, json.dumps({"ready": ready, "components": components}),
+                          "application/json")
+        else:
+            self.send_error(404)
+
+    def _respond(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Jangan mengotori log Streamlit dengan setiap scrape
+
+
+def _file_export_loop(path, interval_s):
+    while True:
+        try:
+            METRICS.write_prometheus_file(path)
+        except OSError:
+            pass
+        time.sleep(interval_s)
+
+
+_EXPORTERS_STARTED = False
+_EXPORTERS_LOCK = threading.Lock()
+
+def start_metrics_exporters():
+    """
+    Menyalakan ekspor metrik sesuai konfigurasi (MELON_METRICS_FILE dan/atau
+    MELON_METRICS_PORT). Aman dipanggil berkali-kali; hanya berjalan sekali per proses.
+    """
+    global _EXPORTERS_STARTED
+    with _EXPORTERS_LOCK:
+        if _EXPORTERS_STARTED:
+            return
+        _EXPORTERS_STARTED = True
+    if METRICS_FILE:
+        threading.Thread(target=_file_export_loop, args=(METRICS_FILE, METRICS_FILE_INTERVAL_S),
+                         name="metrics-file-exporter", daemon=True).start()
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(METRICS_PORT)), _MetricsHandler)
+        except OSError:
+            return # Port sudah dipakai (misalnya proses Streamlit lain); ekspor file tetap jalan
+        threading.Thread(target=server.serve_forever, name="metrics-http-exporter", daemon=True).start()
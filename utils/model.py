@@ -1,30 +1,209 @@
+import os
+import threading
+import time
 import streamlit as st
-import numpy as np
-from PIL import Image
-import cv2 # Digunakan untuk menggambar bounding box
-from ultralytics import YOLO # Import pustaka YOLO dari Ultralytics
+
+from utils.engine import MelonDiseaseEngine
+from utils.inference_cache import InferenceResultCache
+from utils.metrics import start_metrics_exporters, register_readiness_check, observe, increment, set_gauge
+from utils.model_server import InferenceServerClient, SERVER_WORKERS
+
+# Modul ini hanya adapter tipis antara halaman Streamlit dan MelonDiseaseEngine
+# (utils/engine.py). Seluruh logika inferensi ada di engine yang bebas dari Streamlit.
 
 # --- Lokasi File Model YOLO ---
 # Pastikan file 'best.pt' ada di folder utama proyek (sejajar dengan app.py)
-MODEL_PATH = "best.pt" 
+MODEL_PATH = "best.pt"
 
-# --- Memuat Model YOLO ---
-# Menggunakan @st.cache_resource agar model hanya dimuat sekali saat aplikasi dimulai.
-@st.cache_resource
-def load_yolo_model():
-    """
-    Memuat model YOLO dari file .pt.
-    Jika gagal memuat, akan menampilkan pesan error di Streamlit.
-    """
+# --- Backend Inferensi ---
+# "pytorch" (default), "onnx" (ONNX Runtime), "openvino" atau "onnx-int8". Untuk backend
+# selain PyTorch, best.pt diekspor sekali dan artefaknya disimpan di sebelahnya
+# (best.onnx / best_openvino_model/ / best-int8.onnx). "onnx-int8" dikalibrasi dari folder
+# MELON_CALIBRATION_DIR; cek dulu penurunan akurasinya dengan `python -m utils.quant_eval`.
+MODEL_BACKEND = os.environ.get("MELON_MODEL_BACKEND", "pytorch")
+
+# --- Ukuran Inferensi ---
+# Sisi terpanjang gambar yang dikirim ke model (kelipatan 32). Gambar dikecilkan lebih dulu
+# oleh engine, lalu kotak dipetakan kembali ke koordinat asli.
+INFERENCE_IMGSZ = int(os.environ.get("MELON_INFERENCE_IMGSZ", 640))
+# Anggaran latensi per frame webcam (ms). Engine menurunkan imgsz secara adaptif
+# jika riwayat latensi menunjukkan ukuran saat ini tidak muat dalam anggaran.
+WEBCAM_LATENCY_BUDGET_MS = float(os.environ.get("MELON_WEBCAM_LATENCY_BUDGET_MS", 150))
+
+# --- Mode Tiled (foto drone/DSLR 4000-8000 px) ---
+# Ukuran tile = input model (tanpa dikecilkan) dan tumpang tindih antar-tile, agar lesi kecil
+# tetap terdeteksi dan lesi di sambungan tile tetap utuh di salah satu tile.
+TILED_TILE_SIZE = int(os.environ.get("MELON_TILED_TILE_SIZE", INFERENCE_IMGSZ))
+TILED_OVERLAP = float(os.environ.get("MELON_TILED_OVERLAP", 0.2))
+TILED_BATCH_SIZE = int(os.environ.get("MELON_TILED_BATCH_SIZE", 8))
+TILED_WORKERS = int(os.environ.get("MELON_TILED_WORKERS", 2))
+# Sisi terpanjang maksimum gambar yang di-decode untuk mode tiled; membatasi memori
+# berapa pun resolusi file aslinya (4096 px ~ 48 MB RGB, ditambah salinan PIL saat decode)
+TILED_MAX_SIDE = int(os.environ.get("MELON_TILED_MAX_SIDE", 4096))
+
+# --- Cache Hasil Inferensi ---
+# Dipakai bersama oleh semua sesi di proses ini (modul hanya diimpor sekali).
+# Kunci = hash isi gambar + hash bobot model, dengan tier persisten di SQLite.
+INFERENCE_CACHE = InferenceResultCache(MODEL_PATH, max_entries=256, persistent=True)
+
+# --- Server Inferensi ---
+# Jika MELON_INFERENCE_SERVER_WORKERS > 0, model dimuat di worker process terpisah
+# (utils/model_server.py) yang melayani semua sesi dengan micro-batch, alih-alih di
+# proses Streamlit ini. Cocok saat banyak pengguna memakai aplikasi bersamaan.
+
+# --- Memuat Model YOLO di Latar Belakang ---
+# Membuat engine itu murah; Ultralytics/PyTorch baru diimpor dan best.pt baru dimuat oleh
+# thread warm-up (start_model_warmup), yang juga menjalankan satu inferensi dummy. Halaman
+# login tidak pernah menunggu model, dan pengguna pertama setelah restart tidak membayar
+# biaya inisialisasi graph/kernel. Status kesiapan bisa dicek lewat `model_status()`,
+# GET /ready (MELON_METRICS_PORT) dan gauge `melon_model_ready`.
+MODEL_STATUS_NOT_STARTED = "not_started"
+MODEL_STATUS_LOADING = "loading"
+MODEL_STATUS_READY = "ready"
+MODEL_STATUS_FAILED = "failed"
+
+# Berapa lama halaman deteksi menunggu model yang masih dimuat sebelum menampilkan pesan
+MODEL_READY_WAIT_S = float(os.environ.get("MELON_MODEL_READY_WAIT_S", 30))
+
+ENGINE = MelonDiseaseEngine(MODEL_PATH, cache=INFERENCE_CACHE, imgsz=INFERENCE_IMGSZ, backend=MODEL_BACKEND)
+
+_MODEL_STATE = {"status": MODEL_STATUS_NOT_STARTED, "error": None, "load_ms": None}
+_MODEL_STATE_LOCK = threading.Lock()
+_MODEL_READY_EVENT = threading.Event()
+
+def _set_model_state(**fields):
+    with _MODEL_STATE_LOCK:
+        _MODEL_STATE.update(fields)
+    set_gauge("model_ready", int(_MODEL_STATE["status"] == MODEL_STATUS_READY))
+
+def _load_and_warm_up():
+    started = time.perf_counter()
     try:
-        model = YOLO(MODEL_PATH)
-        # st.sidebar.success(f"Model YOLO '{MODEL_PATH}' berhasil dimuat!") # Komen ini agar tidak selalu muncul
-        return model
+        if SERVER_WORKERS > 0:
+            # Worker server memuat dan memanaskan modelnya sendiri
+            ENGINE.remote = InferenceServerClient(MODEL_PATH, MODEL_BACKEND, SERVER_WORKERS).wait_until_ready()
+        else:
+            ENGINE.load()
+            ENGINE.warm_up()
     except Exception as e:
-        st.error(f"Gagal memuat model YOLO dari '{MODEL_PATH}': {e}. Pastikan file model ada di direktori yang benar.")
+        increment("model_load_failures")
+        _set_model_state(status=MODEL_STATUS_FAILED,
+                         error=f"Gagal memuat model YOLO dari '{MODEL_PATH}' (backend '{MODEL_BACKEND}'): {e}. "
+                               "Pastikan file model ada di direktori yang benar.")
+    else:
+        load_ms = (time.perf_counter() - started) * 1000
+        observe("model_load", load_ms)
+        _set_model_state(status=MODEL_STATUS_READY, load_ms=load_ms)
+    finally:
+        _MODEL_READY_EVENT.set()
+
+def start_model_warmup():
+    """
+    Mulai memuat dan memanaskan model di thread latar belakang. Aman dipanggil berkali-kali
+    (dari app.py maupun halaman deteksi); hanya berjalan sekali per proses.
+    """
+    with _MODEL_STATE_LOCK:
+        if _MODEL_STATE["status"] != MODEL_STATUS_NOT_STARTED:
+            return
+        _MODEL_STATE["status"] = MODEL_STATUS_LOADING
+    set_gauge("model_ready", 0)
+    threading.Thread(target=_load_and_warm_up, name="model-warmup", daemon=True).start()
+
+def model_status():
+    """
+    Returns:
+        dict: {"status": "not_started" | "loading" | "ready" | "failed",
+               "error": pesan error atau None, "load_ms": lama muat + warm-up atau None}
+    """
+    with _MODEL_STATE_LOCK:
+        return dict(_MODEL_STATE)
+
+def is_model_ready():
+    return model_status()["status"] == MODEL_STATUS_READY
+
+def wait_for_model(timeout=None):
+    """
+    Memulai warm-up jika belum, lalu menunggu paling lama `timeout` detik.
+    Mengembalikan True jika model siap dipakai.
+    """
+    start_model_warmup()
+    _MODEL_READY_EVENT.wait(timeout)
+    return is_model_ready()
+
+def require_model():
+    """
+    Dipanggil di awal handler deteksi: menunggu model sebentar (dengan spinner) jika masih
+    dimuat, dan menampilkan pesan yang sesuai jika model belum siap atau gagal dimuat.
+    Mengembalikan True jika model siap dipakai.
+    """
+    if is_model_ready():
+        return True
+    if model_status()["status"] != MODEL_STATUS_FAILED:
+        with st.spinner("Model AI sedang disiapkan..."):
+            wait_for_model(MODEL_READY_WAIT_S)
+    status = model_status()
+    if status["status"] == MODEL_STATUS_READY:
+        return True
+    if status["status"] == MODEL_STATUS_FAILED:
+        st.error(status["error"])
+    else:
+        st.info("Model AI masih disiapkan. Silakan muat ulang halaman sebentar lagi.")
+    return False
+
+def _model_readiness_check():
+    status = model_status()
+    if status["status"] == MODEL_STATUS_READY and not ENGINE.is_loaded:
+        # Server inferensi kehilangan semua worker-nya (mati dan sedang/tidak bisa dijalankan ulang)
+        return False, "tidak ada worker server inferensi yang siap"
+    return status["status"] == MODEL_STATUS_READY, status["error"] or status["status"]
+
+register_readiness_check("model", _model_readiness_check)
+start_metrics_exporters() # Ekspor metrik Prometheus jika MELON_METRICS_FILE/MELON_METRICS_PORT diatur
+
+def detect_raw(image_array):
+    """
+    Menjalankan model YOLO sekali pada ambang batas rendah dan mengembalikan deteksi mentah.
+    Hasil ini bisa difilter ulang berkali-kali dengan `apply_detection_threshold`
+    tanpa memanggil model lagi.
+
+    Args:
+        image_array (numpy.array): Gambar input sebagai array NumPy (format RGB).
+
+    Returns:
+        dict: {"boxes": array (N, 4) xyxy, "scores": array (N,), "class_ids": array (N,),
+               "names": dict class_id -> nama kelas}, atau None jika model tidak dimuat.
+    """
+    if not ENGINE.is_loaded:
         return None
+    return ENGINE.infer(image_array)
 
-MODEL = load_yolo_model() # Panggil fungsi untuk memuat model
+def detect_raw_tiled(image_array):
+    """
+    Versi tiled dari `detect_raw` untuk gambar beresolusi sangat tinggi: tile bertumpuk
+    diinferensi dalam batch dari thread pool, lalu kotak di sambungan tile digabung.
+    Hasilnya berbentuk sama dengan `detect_raw` (koordinat `image_array`), sehingga
+    bisa langsung dipakai `apply_detection_threshold` dan jalur penyimpanan yang sama.
+    """
+    if not ENGINE.is_loaded:
+        return None
+    return ENGINE.infer_tiled(image_array, tile_size=TILED_TILE_SIZE, overlap=TILED_OVERLAP,
+                              batch_size=TILED_BATCH_SIZE, workers=TILED_WORKERS)
+
+def detect_raw_batch(image_arrays, batch_size=8):
+    """
+    Versi batch dari `detect_raw`. Gambar diambil dari `image_arrays` (list atau generator)
+    dalam micro-batch berukuran `batch_size`, dan setiap micro-batch dikirim ke YOLO
+    dalam satu forward pass. Gambar yang sudah ada di cache dilewati.
+
+    Yields:
+        tuple: (index, image_array, raw_detections) sesuai urutan input,
+               segera setelah micro-batch-nya selesai.
+    """
+    if not ENGINE.is_loaded:
+        for index, image_array in enumerate(image_arrays):
+            yield index, image_array, None
+        return
+    yield from ENGINE.infer_batch(image_arrays, batch_size)
 
 def predict_melon_disease(image_array, confidence_threshold=0.25):
     """
@@ -39,98 +218,45 @@ def predict_melon_disease(image_array, confidence_threshold=0.25):
     Returns:
         tuple: (annotated_image, diseases_found_list, avg_confidence_output, keterangan_text)
     """
-    # Jika model gagal dimuat sebelumnya, kembalikan error
-    if MODEL is None:
-        return image_array, ["Error: Model tidak dimuat."], 0.0, "Model deteksi tidak tersedia. Silakan hubungi administrator."
-
-    image_input = image_array 
-
-    # Lakukan prediksi dengan ambang batas rendah untuk mendapatkan semua deteksi mentah dari YOLO
-    results = MODEL(image_input, conf=0.01, verbose=False) 
-
-    annotated_image = image_array.copy() 
-    diseases_found_list = [] 
-    detected_disease_names = set() 
-    
-    total_confidence_diseases = 0.0
-    num_disease_detections = 0
-    
-    is_any_disease_detected = False 
-    
-    healthy_detection_info = None 
-
-    for r in results:
-        boxes = r.boxes 
-        names = r.names 
-        
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0]) 
-            conf = float(box.conf[0])             
-            cls_id = int(box.cls[0])              
-            label = names[cls_id]                 
-
-            # --- Pemrosesan Deteksi ---
-            if label == "Daun Sehat": # Gunakan nama kelas persis seperti di model Anda
-                if conf >= confidence_threshold:
-                    healthy_detection_info = {"score": conf, "box": [x1, y1, x2, y2]}
-                continue 
-
-            # Jika ini adalah kelas penyakit (bukan 'Daun Sehat') DAN memenuhi ambang batas pengguna
-            if conf >= confidence_threshold:
-                is_any_disease_detected = True 
-                
-                color = (0, 0, 255) # Merah untuk penyakit
-                cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
-                text = f"{label}: {conf:.2f}"
-                text_y_pos = max(15, y1 - 10)
-                cv2.putText(annotated_image, text, (x1, text_y_pos), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-
-                diseases_found_list.append(f"{label} ({conf*100:.1f}%)")
-                detected_disease_names.add(label)
-                total_confidence_diseases += conf
-                num_disease_detections += 1
-    
-    # --- DEBUG: Tampilkan Nama Kelas yang Terdeteksi (SANGAT PENTING!) ---
-    st.sidebar.markdown("---")
-    st.sidebar.text("DEBUG: Nama Kelas Penyakit Terdeteksi (dari model):")
-    if detected_disease_names:
-        for d_name in detected_disease_names:
-            st.sidebar.text(f"- '{d_name}'") # Tampilkan dengan tanda kutip untuk melihat spasi/karakter tersembunyi
-    else:
-        st.sidebar.text("- Tidak ada kelas penyakit terdeteksi di atas threshold.")
-    st.sidebar.markdown("---")
-    # --- AKHIR DEBUG ---
-
-    # --- LOGIKA KETERANGAN DAN KEYAKINAN AKHIR ---
-    keterangan_text = ""
-    avg_confidence_output = 0.0
-
-    if is_any_disease_detected: 
-        avg_confidence_output = total_confidence_diseases / num_disease_detections if num_disease_detections > 0 else 0.0
-        
-        # --- PERHATIKAN BAGIAN INI ---
-        # GANTI "Downy Mildew" dan "Virus Gemini" di bawah ini
-        # dengan NAMA KELAS YANG PERSIS SAMA seperti yang Anda lihat di output DEBUG di sidebar!
-        if "Downy_Mildew" in detected_disease_names: # <<< GANTI NAMA KELAS INI
-            keterangan_text += "Untuk embun bulu, pastikan drainase yang baik dan pertimbangkan fungisida yang tepat. "
-        if "Virus_Gemini" in detected_disease_names: # <<< GANTI NAMA KELAS INI
-            keterangan_text += "Virus Gemini sulit diobati; fokus pada pengendalian vektor (kutu kebul) dan pemusnahan tanaman terinfeksi. "
-        # Tambahkan kondisi untuk kelas penyakit lain jika ada di model Anda
-        # if "Nama Penyakit Lain Anda" in detected_disease_names:
-        #    keterangan_text += "Rekomendasi untuk penyakit lain. "
-        
-        if not keterangan_text: 
-            keterangan_text = "Beberapa penyakit tidak terdeteksi. Mohon konsultasi dengan ahli pertanian."
-
-    elif healthy_detection_info: 
-        diseases_found_list = ["Daun Sehat"]
-        keterangan_text = "" 
-        avg_confidence_output = healthy_detection_info['score'] 
-
-    else: 
-        diseases_found_list = ["Penyakit Tidak Terdeteksi"]
-        keterangan_text = "Tidak ada penyakit yang terdeteksi pada daun melon ini pada tingkat keyakinan yang ditentukan. Daun mungkin sehat atau penyakit belum dapat terdeteksi."
-        avg_confidence_output = 0.0 
-
-    return annotated_image, diseases_found_list, avg_confidence_output, keterangan_text
\ No newline at end of file
+    return apply_detection_threshold(image_array, detect_raw(image_array), confidence_threshold)
+
+def iter_predict_melon_disease_batch(image_arrays, confidence_threshold=0.25, batch_size=8):
+    """
+    Generator untuk `predict_melon_disease_batch`: menghasilkan (index, hasil) per gambar
+    segera setelah micro-batch-nya selesai, sehingga UI bisa menampilkan hasil bertahap.
+    `hasil` berbentuk sama dengan keluaran `predict_melon_disease`.
+    """
+    for index, image_array, raw_detections in detect_raw_batch(image_arrays, batch_size):
+        yield index, apply_detection_threshold(image_array, raw_detections, confidence_threshold)
+
+def predict_melon_disease_batch(image_arrays, confidence_threshold=0.25, batch_size=8):
+    """
+    Melakukan prediksi pada banyak gambar sekaligus dengan micro-batch ke model YOLO.
+
+    Args:
+        image_arrays (list[numpy.array]): Daftar gambar input (format RGB).
+        confidence_threshold (float): Ambang batas keyakinan (0.0-1.0) untuk melaporkan deteksi.
+        batch_size (int): Jumlah gambar per forward pass.
+
+    Returns:
+        list[tuple]: Satu tuple (annotated_image, diseases_found_list, avg_confidence_output,
+                     keterangan_text) per gambar, sesuai urutan input.
+    """
+    return [result for _, result in
+            iter_predict_melon_disease_batch(image_arrays, confidence_threshold, batch_size)]
+
+def apply_detection_threshold(image_array, raw_detections, confidence_threshold=0.25):
+    """
+    Memfilter deteksi mentah dari `detect_raw` dengan ambang batas pengguna, lalu
+    menganotasi gambar dan menyusun keterangan. Tidak memanggil model YOLO sama sekali,
+    sehingga murah untuk dipanggil ulang setiap kali slider keyakinan digeser.
+
+    Args:
+        image_array (numpy.array): Gambar asli (format RGB) yang dipakai saat `detect_raw`.
+        raw_detections (dict): Hasil dari `detect_raw`.
+        confidence_threshold (float): Ambang batas keyakinan (0.0-1.0) untuk melaporkan deteksi.
+
+    Returns:
+        tuple: (annotated_image, diseases_found_list, avg_confidence_output, keterangan_text)
+    """
+    return ENGINE.apply_threshold(image_array, raw_detections, confidence_threshold)
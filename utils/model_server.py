@@ -0,0 +1,314 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Server inferensi lokal: satu atau beberapa worker process yang masing-masing memuat model
+# sekali, mengumpulkan permintaan dari semua sesi Streamlit (upload, webcam, video) menjadi
+# micro-batch dalam jendela waktu singkat, dan menjalankan PyTorch dengan jumlah thread yang
+# dibatasi per worker. Proses Streamlit hanya mengirim gambar yang sudah dikecilkan ke imgsz
+# dan menerima deteksi mentah, sehingga tidak lagi berebut GIL dan thread intra-op PyTorch.
+
+# Jumlah worker process (0 = nonaktif, model dijalankan langsung di proses Streamlit)
+SERVER_WORKERS = int(os.environ.get("MELON_INFERENCE_SERVER_WORKERS", 0))
+# Jendela pengumpulan micro-batch (ms) dan ukuran batch maksimum per forward pass
+SERVER_BATCH_WINDOW_MS = float(os.environ.get("MELON_INFERENCE_SERVER_BATCH_WINDOW_MS", 10))
+SERVER_MAX_BATCH_SIZE = int(os.environ.get("MELON_INFERENCE_SERVER_MAX_BATCH", 16))
+# Batas permintaan yang menunggu di antrean; jika penuh selama SERVER_SUBMIT_TIMEOUT_S,
+# permintaan baru ditolak (InferenceServerBusy) alih-alih membuat latensi semua orang runtuh
+SERVER_MAX_PENDING = int(os.environ.get("MELON_INFERENCE_SERVER_MAX_PENDING", 64))
+SERVER_SUBMIT_TIMEOUT_S = 1.0
+SERVER_REQUEST_TIMEOUT_S = 60.0
+SERVER_STARTUP_TIMEOUT_S = 300.0
+# Seberapa sering dispatcher memeriksa worker yang mati, dan berapa kali worker yang mati
+# (misalnya kehabisan memori) dijalankan ulang sebelum dianggap hilang permanen
+SERVER_HEALTH_CHECK_S = 0.5
+SERVER_MAX_WORKER_RESTARTS = int(os.environ.get("MELON_INFERENCE_SERVER_MAX_RESTARTS", 3))
+
+
+class InferenceServerBusy(RuntimeError):
+    """
+    Antrean server inferensi penuh (backpressure). Pemanggil sebaiknya meminta pengguna
+    mencoba lagi sebentar lagi.
+    """
+
+
+def _pin_worker(worker_id, threads_per_worker):
+    # Batasi thread OpenMP/MKL/PyTorch sebelum torch diimpor, lalu (di Linux) kunci worker
+    # ke sekumpulan core sendiri agar worker tidak saling berebut core
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads_per_worker)
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        own_cores = cores[worker_id * threads_per_worker:(worker_id + 1) * threads_per_worker]
+        if own_cores:
+            os.sched_setaffinity(0, own_cores)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+def _collect_batch(requests, first, max_batch_size, window_s, acknowledge):
+    # Ambil permintaan tambahan yang datang dalam jendela waktu singkat setelah permintaan pertama
+    batch = [first]
+    deadline = time.monotonic() + window_s
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            requests.put(None) # Sinyal berhenti untuk worker lain
+            break
+        acknowledge(item)
+        batch.append(item)
+    return batch
+
+def _worker_main(worker_id, model_path, backend, threads_per_worker, requests, responses,
+                 max_batch_size, window_s):
+    _pin_worker(worker_id, threads_per_worker)
+    from utils.engine import MelonDiseaseEngine
+    try:
+        engine = MelonDiseaseEngine(model_path, backend=backend)
+        engine.load()
+        engine.warm_up()
+    except Exception as e:
+        responses.put(("failed", worker_id, str(e)))
+        return
+    responses.put(("ready", worker_id, None))
+
+    def acknowledge(request):
+        # Dilaporkan begitu permintaan diambil dari antrean, agar klien bisa menggagalkannya
+        # segera jika worker ini mati di tengah pengumpulan batch maupun inferensi
+        responses.put(("taken", worker_id, [request[0]]))
+
+    while True:
+        first = requests.get()
+        if first is None:
+            requests.put(None)
+            return
+        acknowledge(first)
+        batch = _collect_batch(requests, first, max_batch_size, window_s, acknowledge)
+        # Permintaan dengan imgsz berbeda tidak bisa digabung dalam satu forward pass
+        by_imgsz = {}
+        for request_id, image, imgsz in batch:
+            by_imgsz.setdefault(imgsz, []).append((request_id, image))
+        for imgsz, items in by_imgsz.items():
+            try:
+                raws = engine.predict_raw([image for _, image in items], imgsz)
+                for (request_id, _), raw in zip(items, raws):
+                    responses.put(("result", request_id, raw))
+            except Exception as e:
+                for request_id, _ in items:
+                    responses.put(("error", request_id, str(e)))
+
+
+class InferenceServerClient:
+    """
+    Klien server inferensi untuk proses Streamlit (dipakai bersama oleh semua sesi).
+    Menjalankan `workers` worker process dan satu thread yang meneruskan hasil ke
+    pemanggil yang menunggu. Thread itu juga mengawasi worker: jika worker yang sudah siap
+    mati, permintaan yang sedang dipegangnya digagalkan dan worker dijalankan ulang (paling
+    banyak SERVER_MAX_WORKER_RESTARTS kali per worker). `is_ready` hanya True selama ada
+    worker siap, sehingga /ready ikut melaporkan server yang tidak sehat.
+
+    Args:
+        model_path (str): File bobot model.
+        backend (str): Backend inferensi (lihat utils/backends.py).
+        workers (int): Jumlah worker process.
+        threads_per_worker (int): Thread PyTorch per worker (default: core / workers).
+    """
+
+    def __init__(self, model_path, backend="pytorch", workers=1, threads_per_worker=None,
+                 max_batch_size=SERVER_MAX_BATCH_SIZE, batch_window_ms=SERVER_BATCH_WINDOW_MS,
+                 max_pending=SERVER_MAX_PENDING):
+        self._context = multiprocessing.get_context("spawn") # Jangan mewarisi state torch/Streamlit dari induk
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self._requests = self._context.Queue(maxsize=max_pending)
+        self._responses = self._context.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._worker_ready = [False] * workers
+        self._worker_requests = [set() for _ in range(workers)] # request_id yang sedang dipegang tiap worker
+        self._restarts = [0] * workers
+        self._failures = []
+        self._started = threading.Event()
+        self._closing = False
+        self.rejected = 0
+        self.crashes = 0
+
+        self._worker_args = (model_path, backend, self.threads_per_worker, self._requests, self._responses,
+                             max_batch_size, batch_window_ms / 1000.0)
+        self._processes = [self._start_worker(worker_id) for worker_id in range(workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="inference-server-dispatch", daemon=True)
+        self._dispatcher.start()
+        atexit.register(self.close)
+
+    def _start_worker(self, worker_id):
+        process = self._context.Process(target=_worker_main, name=f"inference-server-{worker_id}", daemon=True,
+                                        args=(worker_id,) + self._worker_args)
+        process.start()
+        return process
+
+    def wait_until_ready(self, timeout=SERVER_STARTUP_TIMEOUT_S):
+        """
+        Menunggu sampai minimal satu worker selesai memuat model. Melempar RuntimeError
+        jika semua worker gagal atau waktu habis.
+        """
+        deadline = time.monotonic() + timeout
+        while not self._started.wait(0.5):
+            # Worker yang mati sebelum sempat melapor (misalnya gagal impor) tidak mengirim "failed"
+            if not any(process.is_alive() for process in self._processes):
+                raise RuntimeError("Semua worker server inferensi berhenti sebelum model dimuat.")
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server inferensi tidak siap dalam batas waktu.")
+        if not self.is_ready:
+            raise RuntimeError(f"Semua worker server inferensi gagal memuat model: {'; '.join(self._failures)}")
+        return self
+
+    @property
+    def ready_workers(self):
+        return sum(self._worker_ready)
+
+    @property
+    def is_ready(self):
+        return self.ready_workers > 0
+
+    def _dispatch_loop(self):
+        next_check = time.monotonic() + SERVER_HEALTH_CHECK_S
+        while not self._closing:
+            try:
+                self._handle_response(*self._responses.get(timeout=SERVER_HEALTH_CHECK_S))
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                return
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + SERVER_HEALTH_CHECK_S
+
+    def _handle_response(self, kind, key, payload):
+        if kind == "ready":
+            self._worker_ready[key] = True
+            self._started.set()
+        elif kind == "failed":
+            self._failures.append(payload)
+            if len(self._failures) >= self.workers and not self.is_ready:
+                self._started.set()
+        elif kind == "taken":
+            self._worker_requests[key].update(payload)
+        else:
+            for requests in self._worker_requests:
+                requests.discard(key)
+            if kind == "result":
+                self._resolve(key, result=payload)
+            else:
+                self._resolve(key, error=RuntimeError(f"Inferensi gagal di server: {payload}"))
+
+    def _resolve(self, request_id, result=None, error=None):
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        if future is None:
+            return # Pemanggil sudah menyerah (timeout)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _check_workers(self):
+        # Worker yang mati tanpa pesan (segfault, OOM killer) tidak akan pernah menjawab
+        # permintaan yang sedang dipegangnya; gagalkan segera alih-alih menunggu timeout
+        dead = [worker_id for worker_id, process in enumerate(self._processes) if not process.is_alive()]
+        if not dead or self._closing:
+            return
+        # Proses yang mati sudah tidak bisa menulis lagi: proses dulu semua pesan yang sempat
+        # dikirimnya (hasil terakhir, daftar "taken") sebelum menggagalkan sisanya
+        while True:
+            try:
+                self._handle_response(*self._responses.get_nowait())
+            except queue.Empty:
+                break
+        for worker_id in dead:
+            process = self._processes[worker_id]
+            lost = self._worker_requests[worker_id]
+            self._worker_requests[worker_id] = set()
+            for request_id in lost:
+                self._resolve(request_id, error=RuntimeError(
+                    f"Worker server inferensi berhenti (exit code {process.exitcode}) saat memproses permintaan."))
+            if not (self._worker_ready[worker_id] or lost):
+                continue # Gagal saat memuat model (sudah dilaporkan lewat "failed") atau sudah ditangani
+            self.crashes += 1
+            self._worker_ready[worker_id] = False
+            if self._restarts[worker_id] < SERVER_MAX_WORKER_RESTARTS:
+                self._restarts[worker_id] += 1
+                self._processes[worker_id] = self._start_worker(worker_id)
+
+    def submit(self, image, imgsz):
+        """
+        Mengirim satu gambar (sudah dikecilkan ke imgsz) dan mengembalikan Future berisi
+        deteksi mentah. Melempar InferenceServerBusy jika antrean penuh, atau RuntimeError
+        jika semua worker sudah berhenti permanen.
+        """
+        return self._submit(image, imgsz)[1]
+
+    def _submit(self, image, imgsz):
+        if self._started.is_set() and not any(process.is_alive() for process in self._processes):
+            raise RuntimeError("Semua worker server inferensi berhenti.")
+        request_id = next(self._ids)
+        future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            self._requests.put((request_id, image, imgsz), timeout=SERVER_SUBMIT_TIMEOUT_S)
+        except queue.Full:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            self.rejected += 1
+            raise InferenceServerBusy("Server inferensi sedang penuh. Silakan coba lagi sebentar lagi.")
+        return request_id, future
+
+    def predict_raw(self, images, imgsz, timeout=SERVER_REQUEST_TIMEOUT_S):
+        """
+        Deteksi mentah untuk beberapa gambar. Setiap gambar dikirim sebagai permintaan
+        sendiri, sehingga server bebas menggabungkannya dengan permintaan sesi lain.
+        """
+        submitted = []
+        try:
+            for image in images:
+                submitted.append(self._submit(image, imgsz))
+            return [future.result(timeout=timeout) for _, future in submitted]
+        finally:
+            # Permintaan yang tidak ditunggu lagi (timeout, antrean penuh di tengah jalan) dilepas
+            # dari _pending agar tidak bocor dan tidak ikut terhitung sebagai in-flight
+            with self._pending_lock:
+                for request_id, _ in submitted:
+                    self._pending.pop(request_id, None)
+
+    def stats(self):
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {"workers_ready": self.ready_workers, "workers": self.workers,
+                "in_flight": in_flight, "rejected": self.rejected, "crashes": self.crashes,
+                "restarts": sum(self._restarts)}
+
+    def close(self):
+        self._closing = True
+        try:
+            self._requests.put(None, timeout=1.0)
+        except (queue.Full, ValueError, OSError):
+            pass
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,212 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import datetime
+
+from utils.database import save_detection_records
+from utils.metrics import span, increment
+from utils.thumbnails import create_thumbnails
+
+# File log untuk hasil deteksi yang tetap gagal disimpan setelah semua percobaan ulang
+FAILED_WRITES_LOG = "failed_writes.jsonl"
+
+
+class DetectionWriteQueue:
+    """
+    Antrean write-behind untuk menyimpan gambar dan hasil deteksi di latar belakang,
+    sehingga latensi halaman tidak lagi mencakup penulisan file dan commit SQLite.
+
+    Thread penulis mengambil hingga `batch_size` entri (atau menunggu `flush_interval_s`),
+    menulis semua file gambarnya, lalu memasukkan semua baris `detections` dalam satu
+    transaksi. Kegagalan database dicoba ulang dengan backoff; jika tetap gagal, entri
+    dicatat ke `retry_log_path` agar bisa diputar ulang dengan `replay_failed_writes`.
+
+    Antrean dibatasi `max_pending`. Jika penuh, `submit` menunggu hingga `submit_timeout_s`
+    lalu menulis langsung (backpressure) agar tidak ada data yang hilang.
+    """
+
+    def __init__(self, max_pending=256, batch_size=32, flush_interval_s=0.5, max_retries=3,
+                 retry_log_path=FAILED_WRITES_LOG, submit_timeout_s=2.0):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_retries = max_retries
+        self.retry_log_path = retry_log_path
+        self.submit_timeout_s = submit_timeout_s
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._log_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker_loop, name="detection-write-behind", daemon=True)
+        self._thread.start()
+
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, username, image_path, diseases, confidence, recommendations, image_bytes=None,
+               boxes=None, class_names=None, frame_size=None, threshold=None):
+        """
+        Menjadwalkan penyimpanan satu hasil deteksi. Jika `image_bytes` diberikan,
+        bytes tersebut ditulis apa adanya ke `image_path` (tanpa decode/encode ulang).
+        `boxes`, `class_names`, `frame_size` dan `threshold` diteruskan ke `save_detection_records`
+        (lihat `raw_detections_to_record` di utils/engine.py).
+        """
+        item = {
+            "username": username,
+            "image_path": image_path,
+            "diseases": diseases,
+            "confidence": confidence,
+            "recommendations": recommendations,
+            "image_bytes": image_bytes,
+            "boxes": boxes,
+            "class_names": class_names,
+            "frame_size": frame_size,
+            "threshold": threshold,
+        }
+        if self._closed:
+            self._write_batch([item])
+            return
+        try:
+            self._queue.put(item, timeout=self.submit_timeout_s)
+        except queue.Full:
+            # Backpressure: antrean penuh, tulis langsung di thread pemanggil
+            self._write_batch([item])
+
+    def flush(self):
+        """
+        Menunggu sampai semua entri di antrean selesai ditulis.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Menulis sisa antrean lalu menghentikan thread penulis. Didaftarkan ke atexit
+        agar hasil deteksi tidak hilang saat server dimatikan.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval_s
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    next_item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(next_item)
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        # Tahap 1: tulis file gambar beserta thumbnail/preview-nya.
+        # Entri yang gambarnya gagal ditulis tidak dimasukkan ke DB.
+        ready = []
+        for item in batch:
+            if item["image_bytes"] is not None:
+                try:
+                    with span("image_write"):
+                        os.makedirs(os.path.dirname(item["image_path"]) or ".", exist_ok=True)
+                        with open(item["image_path"], 'wb') as f:
+                            f.write(item["image_bytes"])
+                except OSError as e:
+                    self._log_failure(item, e)
+                    continue
+                try:
+                    with span("thumbnail"):
+                        item["thumbnail_path"], item["preview_path"] = create_thumbnails(item["image_path"], item["image_bytes"])
+                except Exception:
+                    # Thumbnail bersifat opsional; halaman riwayat bisa membuatnya belakangan
+                    pass
+                item["image_bytes"] = None
+            ready.append(item)
+
+        # Tahap 2: satu transaksi untuk semua baris, dengan percobaan ulang
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("db_write"):
+                    saved = save_detection_records(ready)
+                self.written += saved
+                increment("detections_saved", saved)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    for item in ready:
+                        self._log_failure(item, e)
+                    return
+                time.sleep(0.5 * (2 ** attempt))
+
+    def _log_failure(self, item, error):
+        self.failed += 1
+        increment("detection_write_failures")
+        entry = {key: value for key, value in item.items() if key != "image_bytes"}
+        entry["error"] = str(error)
+        entry["failed_at"] = datetime.datetime.now().isoformat()
+        entry["image_written"] = item["image_bytes"] is None
+        with self._log_lock:
+            with open(self.retry_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def stats(self):
+        return {"pending": self._queue.qsize(), "written": self.written, "failed": self.failed}
+
+
+def replay_failed_writes(retry_log_path=FAILED_WRITES_LOG):
+    """
+    Mencoba lagi entri di log kegagalan. Entri yang gambarnya tidak pernah tertulis
+    tidak bisa dipulihkan dan tetap disimpan di log. Mengembalikan jumlah baris yang berhasil.
+    """
+    if not os.path.exists(retry_log_path):
+        return 0
+    with open(retry_log_path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    recoverable = [entry for entry in entries if entry.get("image_written") and os.path.exists(entry["image_path"])]
+    unrecoverable = [entry for entry in entries if entry not in recoverable]
+    saved = save_detection_records(recoverable)
+
+    with open(retry_log_path, 'w', encoding='utf-8') as f:
+        for entry in unrecoverable:
+            f.write(json.dumps(entry) + "\n")
+    return saved
+
+
+_WRITE_QUEUE = None
+_WRITE_QUEUE_LOCK = threading.Lock()
+
+def get_write_queue():
+    """
+    Antrean write-behind bersama untuk seluruh proses (dibuat saat pertama kali dibutuhkan
+    dan di-flush otomatis saat proses berhenti).
+    """
+    global _WRITE_QUEUE
+    with _WRITE_QUEUE_LOCK:
+        if _WRITE_QUEUE is None:
+            _WRITE_QUEUE = DetectionWriteQueue()
+            atexit.register(_WRITE_QUEUE.close)
+        return _WRITE_QUEUE
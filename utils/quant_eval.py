@@ -0,0 +1,207 @@
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from utils.engine import MelonDiseaseEngine, DEFAULT_IMGSZ
+from utils.ingest import decode_image
+from utils.quantization import list_images
+
+# IoU minimum agar prediksi dihitung benar (mAP@0.5)
+IOU_THRESHOLD = 0.5
+
+
+def load_yolo_labels(label_path, image_shape):
+    """
+    Membaca label format YOLO (class cx cy w h, ternormalisasi) menjadi
+    (class_ids, kotak xyxy dalam piksel). File yang tidak ada = gambar tanpa objek.
+    """
+    if not os.path.exists(label_path):
+        return np.zeros((0,), dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0,), dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+    height, width = image_shape[:2]
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return rows[:, 0].astype(np.int64), boxes
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Matriks IoU (len(a), len(b)) untuk kotak xyxy.
+    """
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+def match_predictions(raw_detections, gt_class_ids, gt_boxes, iou_threshold=IOU_THRESHOLD):
+    """
+    Mencocokkan prediksi (urut skor tertinggi) dengan label secara greedy per kelas.
+
+    Returns:
+        list: (class_id, score, benar/salah) untuk setiap prediksi.
+    """
+    order = np.argsort(-raw_detections["scores"])
+    pred_boxes = raw_detections["boxes"][order]
+    pred_scores = raw_detections["scores"][order]
+    pred_classes = raw_detections["class_ids"][order]
+    ious = box_iou(pred_boxes, gt_boxes) if len(pred_boxes) and len(gt_boxes) else None
+
+    matched = np.zeros(len(gt_boxes), dtype=bool)
+    records = []
+    for i, (cls_id, score) in enumerate(zip(pred_classes, pred_scores)):
+        is_tp = False
+        if ious is not None:
+            candidates = np.where((gt_class_ids == cls_id) & ~matched)[0]
+            if len(candidates):
+                best = candidates[np.argmax(ious[i, candidates])]
+                if ious[i, best] >= iou_threshold:
+                    matched[best] = True
+                    is_tp = True
+        records.append((int(cls_id), float(score), is_tp))
+    return records
+
+def average_precision(scores, true_positives, num_gt):
+    """
+    AP (interpolasi semua titik) dari daftar prediksi satu kelas.
+    """
+    if num_gt == 0 or len(scores) == 0:
+        return 0.0
+    order = np.argsort(-np.asarray(scores))
+    tp = np.asarray(true_positives, dtype=np.float64)[order]
+    tp_cumsum = np.cumsum(tp)
+    recall = tp_cumsum / num_gt
+    precision = tp_cumsum / np.arange(1, len(tp) + 1)
+
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    changes = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[changes + 1] - recall[changes]) * precision[changes + 1]))
+
+def iter_eval_images(image_paths):
+    """
+    Gambar evaluasi satu per satu (bukan semuanya sekaligus di memori), di-decode dengan
+    `decode_image` yang sama seperti unggahan aplikasi. Label YOLO ternormalisasi, jadi
+    tetap cocok dengan buffer kerja yang sudah dikecilkan.
+    """
+    for image_path in image_paths:
+        yield image_path, decode_image(image_path)
+
+def evaluate_backend(model_path, backend, image_paths, labels_dir, imgsz=DEFAULT_IMGSZ,
+                     confidence_threshold=0.25, warmup=3):
+    """
+    Menjalankan satu backend pada semua gambar berlabel dan menghitung per kelas:
+    precision/recall pada `confidence_threshold`, AP@0.5, serta latensi inferensi.
+    """
+    engine = MelonDiseaseEngine(model_path, imgsz=imgsz, backend=backend)
+    engine.load()
+
+    for _, image_array in itertools.islice(iter_eval_images(image_paths), warmup):
+        engine.infer(image_array, use_cache=False, imgsz=imgsz)
+
+    latencies_ms = []
+    predictions = {}  # class_id -> list (score, benar/salah)
+    gt_counts = {}
+    names = {}
+    for image_path, image_array in iter_eval_images(image_paths):
+        started = time.perf_counter()
+        raw_detections = engine.infer(image_array, use_cache=False, imgsz=imgsz)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        names.update(raw_detections["names"])
+
+        label_path = os.path.join(labels_dir, os.path.splitext(os.path.basename(image_path))[0] + ".txt")
+        gt_class_ids, gt_boxes = load_yolo_labels(label_path, image_array.shape)
+        for cls_id in gt_class_ids:
+            gt_counts[int(cls_id)] = gt_counts.get(int(cls_id), 0) + 1
+        for cls_id, score, is_tp in match_predictions(raw_detections, gt_class_ids, gt_boxes):
+            predictions.setdefault(cls_id, []).append((score, is_tp))
+
+    per_class = {}
+    for cls_id in sorted(set(gt_counts) | set(predictions)):
+        class_predictions = predictions.get(cls_id, [])
+        num_gt = gt_counts.get(cls_id, 0)
+        kept = [is_tp for score, is_tp in class_predictions if score >= confidence_threshold]
+        tp = sum(kept)
+        per_class[names.get(cls_id, str(cls_id))] = {
+            "ground_truth": num_gt,
+            "precision": tp / len(kept) if kept else 0.0,
+            "recall": tp / num_gt if num_gt else 0.0,
+            "ap50": average_precision([score for score, _ in class_predictions],
+                                      [is_tp for _, is_tp in class_predictions], num_gt),
+        }
+
+    evaluated = [metrics["ap50"] for metrics in per_class.values() if metrics["ground_truth"] > 0]
+    latencies = np.asarray(latencies_ms)
+    return {
+        "backend": backend,
+        "images": len(image_paths),
+        "map50": float(np.mean(evaluated)) if evaluated else 0.0,
+        "per_class": per_class,
+        "latency_ms": {
+            "mean": float(latencies.mean()) if len(latencies) else 0.0,
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        },
+    }
+
+def print_comparison(reports):
+    baseline = reports[0]
+    print(f"{'backend':<12} {'mAP@0.5':>8} {'Δ mAP':>8} {'mean ms':>9} {'p95 ms':>8} {'speedup':>8}")
+    for report in reports:
+        speedup = baseline["latency_ms"]["mean"] / report["latency_ms"]["mean"] if report["latency_ms"]["mean"] else 0.0
+        print(f"{report['backend']:<12} {report['map50']:>8.4f} {report['map50'] - baseline['map50']:>+8.4f} "
+              f"{report['latency_ms']['mean']:>9.1f} {report['latency_ms']['p95']:>8.1f} {speedup:>7.2f}x")
+
+    print()
+    print(f"{'kelas':<16} " + " ".join(f"{report['backend'] + ' P/R/AP50':>26}" for report in reports))
+    class_names = sorted({name for report in reports for name in report["per_class"]})
+    for name in class_names:
+        cells = []
+        for report in reports:
+            metrics = report["per_class"].get(name)
+            cells.append(f"{metrics['precision']:.3f}/{metrics['recall']:.3f}/{metrics['ap50']:.3f}" if metrics else "-")
+        print(f"{name:<16} " + " ".join(f"{cell:>26}" for cell in cells))
+
+
+def main():
+    """
+    Membandingkan akurasi dan kecepatan model FP32 dan INT8 pada set gambar berlabel
+    (label format YOLO, satu file .txt per gambar):
+
+        python -m utils.quant_eval --images data/val/images --labels data/val/labels
+    """
+    parser = argparse.ArgumentParser(description="Perbandingan akurasi vs kecepatan model FP32 dan INT8.")
+    parser.add_argument("--model", default="best.pt", help="File bobot PyTorch sumber.")
+    parser.add_argument("--images", required=True, help="Folder gambar evaluasi.")
+    parser.add_argument("--labels", required=True, help="Folder label YOLO (.txt) dengan nama file yang sama.")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"],
+                        help="Backend yang dibandingkan; yang pertama menjadi acuan.")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Ukuran inferensi.")
+    parser.add_argument("--conf", type=float, default=0.25, help="Ambang keyakinan untuk precision/recall.")
+    parser.add_argument("--json", help="Simpan laporan lengkap ke file JSON ini.")
+    args = parser.parse_args()
+
+    image_paths = list_images(args.images)
+    if not image_paths:
+        parser.error(f"Tidak ada gambar di '{args.images}'.")
+
+    reports = [evaluate_backend(args.model, backend, image_paths, args.labels, imgsz=args.imgsz,
+                                confidence_threshold=args.conf)
+               for backend in args.backends]
+    print_comparison(reports)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"imgsz": args.imgsz, "conf": args.conf, "reports": reports}, f, indent=2)
+        print(f"\nLaporan disimpan ke {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import cv2
+from PIL import Image, ImageOps
+
+from utils.ingest import IMAGE_EXTENSIONS
+
+# Folder contoh gambar daun untuk kalibrasi INT8 (cukup ~100-300 foto yang mewakili kondisi lapangan)
+CALIBRATION_DIR = os.environ.get("MELON_CALIBRATION_DIR", "calibration_images")
+
+# Jumlah maksimum gambar kalibrasi yang dipakai
+MAX_CALIBRATION_IMAGES = 300
+
+
+def list_images(folder):
+    """
+    Daftar file gambar di `folder` (tidak rekursif), diurutkan agar hasil kalibrasi
+    dan evaluasi bisa diulang.
+    """
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+def load_rgb_image(image_path):
+    """
+    Membaca gambar sebagai array RGB uint8 dengan orientasi EXIF diterapkan,
+    sama seperti gambar yang diunggah lewat aplikasi.
+    """
+    with Image.open(image_path) as image:
+        return np.array(ImageOps.exif_transpose(image).convert('RGB'))
+
+def letterbox(image_array, imgsz):
+    """
+    Mengubah ukuran gambar ke kotak `imgsz` x `imgsz` dengan padding abu-abu (114),
+    sama seperti preprocessing Ultralytics, lalu menjadi tensor NCHW float32 0..1.
+    """
+    height, width = image_array.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    resized = cv2.resize(image_array, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_height) // 2, (imgsz - new_width) // 2
+    canvas[top:top + new_height, left:left + new_width] = resized
+    return np.ascontiguousarray(canvas.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+def quantize_onnx_model(fp32_path, int8_path, calibration_dir=CALIBRATION_DIR, imgsz=640,
+                        max_images=MAX_CALIBRATION_IMAGES):
+    """
+    Kuantisasi statis pasca-pelatihan (INT8) dari model ONNX FP32 dengan ONNX Runtime.
+    Rentang aktivasi dikalibrasi dari gambar di `calibration_dir`; bobot dikuantisasi
+    per-channel. Format QDQ dipakai agar model tetap bisa dimuat Ultralytics seperti
+    ONNX biasa.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    if not os.path.isdir(calibration_dir):
+        raise FileNotFoundError(f"Folder kalibrasi INT8 tidak ditemukan: '{calibration_dir}'.")
+    image_paths = list_images(calibration_dir)[:max_images]
+    if not image_paths:
+        raise ValueError(f"Folder kalibrasi INT8 '{calibration_dir}' tidak berisi gambar.")
+
+    input_name = _onnx_input_name(fp32_path)
+
+    class LeafCalibrationReader(CalibrationDataReader):
+        # Membaca gambar satu per satu agar memori tetap kecil selama kalibrasi
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            image_path = next(self._paths, None)
+            if image_path is None:
+                return None
+            return {input_name: letterbox(load_rgb_image(image_path), imgsz)}
+
+    quantize_static(fp32_path, int8_path, LeafCalibrationReader(),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return int8_path
+
+def _onnx_input_name(onnx_path):
+    import onnxruntime
+    session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    return session.get_inputs()[0].name
@@ -0,0 +1,86 @@
+import threading
+
+# Ukuran inferensi yang boleh dipilih (kelipatan 32 sesuai stride YOLO), dari kecil ke besar
+DEFAULT_IMGSZ_CANDIDATES = (320, 416, 512, 640)
+
+
+class AdaptiveResolutionController:
+    """
+    Memilih ukuran inferensi (imgsz) berdasarkan anggaran latensi per permintaan
+    dan riwayat latensi yang terukur.
+
+    Latensi setiap ukuran dilacak dengan rata-rata bergerak eksponensial (EMA).
+    Untuk ukuran yang belum pernah diukur, latensinya diperkirakan dari ukuran terdekat
+    yang sudah diukur dengan asumsi biaya sebanding dengan luas (imgsz^2).
+
+    Perkiraan suatu ukuran kedaluwarsa jika ukuran itu tidak diukur lagi selama `stale_after`
+    pengukuran berikutnya; setelah itu latensinya diperkirakan ulang dari ukuran yang sedang
+    dipakai. Dengan begitu satu sampel lambat (misalnya cold start pada 640) tidak mengunci
+    ukuran kecil selamanya: ukuran yang lebih besar dicoba lagi secara berkala.
+
+    Args:
+        candidates (tuple[int]): Daftar imgsz yang boleh dipakai.
+        smoothing (float): Bobot sampel baru pada EMA (0-1).
+        stale_after (int): Jumlah pengukuran sebelum perkiraan ukuran yang tidak dipakai diabaikan.
+    """
+
+    def __init__(self, candidates=DEFAULT_IMGSZ_CANDIDATES, smoothing=0.2, stale_after=50):
+        self.candidates = tuple(sorted(set(candidates)))
+        self.smoothing = smoothing
+        self.stale_after = stale_after
+        self._latency_ms = {}
+        self._measured_at = {} # imgsz -> nomor pengukuran terakhir
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, imgsz, latency_ms):
+        """
+        Mencatat latensi satu inferensi pada ukuran `imgsz`.
+        """
+        with self._lock:
+            self._samples += 1
+            previous = self._latency_ms.get(imgsz) if self._is_fresh(imgsz) else None
+            self._measured_at[imgsz] = self._samples
+            if previous is None:
+                self._latency_ms[imgsz] = latency_ms
+            else:
+                self._latency_ms[imgsz] = previous + self.smoothing * (latency_ms - previous)
+
+    def estimate(self, imgsz):
+        """
+        Perkiraan latensi (ms) untuk `imgsz`, atau None jika belum ada data sama sekali.
+        """
+        with self._lock:
+            fresh = [size for size in self._latency_ms if self._is_fresh(size)]
+            if imgsz in fresh:
+                return self._latency_ms[imgsz]
+            if not fresh:
+                return None
+            nearest = min(fresh, key=lambda size: abs(size - imgsz))
+            return self._latency_ms[nearest] * (imgsz / nearest) ** 2
+
+    def _is_fresh(self, imgsz):
+        measured_at = self._measured_at.get(imgsz)
+        return measured_at is not None and self._samples - measured_at < self.stale_after
+
+    def choose(self, latency_budget_ms, max_imgsz=None):
+        """
+        Memilih imgsz terbesar yang perkiraan latensinya masih dalam anggaran.
+        Tanpa riwayat, ukuran terbesar dicoba dulu agar pengukuran pertama tersedia.
+        """
+        candidates = [size for size in self.candidates if max_imgsz is None or size <= max_imgsz] \
+            or [self.candidates[0]]
+        if latency_budget_ms is None:
+            return candidates[-1]
+        for size in reversed(candidates):
+            estimated = self.estimate(size)
+            if estimated is None or estimated <= latency_budget_ms:
+                return size
+        return candidates[0]
+
+    def snapshot(self):
+        """
+        Salinan latensi EMA per imgsz (ms), untuk ditampilkan atau dicatat.
+        """
+        with self._lock:
+            return dict(self._latency_ms)
@@ -0,0 +1,329 @@
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import numpy as np
+import streamlit as st
+
+from utils.metrics import increment, set_gauge
+
+# Payload besar milik sesi (bytes unggahan, buffer kerja, gambar hasil anotasi, key frame
+# video) tidak disimpan langsung di st.session_state, melainkan di satu store bersama per
+# proses. st.session_state hanya memegang PayloadRef kecil. Store menjaga anggaran memori
+# global: jika terlampaui, payload yang paling lama tidak dipakai dipindah (spill) ke disk,
+# dan dimuat kembali saat dibutuhkan. Dengan begitu memori proses tetap datar berapa pun
+# jumlah pengguna yang terhubung.
+
+# Anggaran memori global untuk semua sesi, dan batas memori per sesi (MB)
+SESSION_STORE_MEMORY_MB = float(os.environ.get("MELON_SESSION_STORE_MEMORY_MB", 256))
+SESSION_STORE_SESSION_MB = float(os.environ.get("MELON_SESSION_STORE_SESSION_MB", 48))
+# Folder dan batas ukuran spill di disk (MB). Jika terlampaui, payload tertua dibuang;
+# halaman akan meminta pengguna mengunggah ulang gambarnya.
+SESSION_STORE_DIR = os.environ.get("MELON_SESSION_STORE_DIR",
+                                   os.path.join(tempfile.gettempdir(), "melon_session_store"))
+SESSION_STORE_DISK_MB = float(os.environ.get("MELON_SESSION_STORE_DISK_MB", 2048))
+# Payload yang tidak disentuh selama ini dianggap milik sesi yang sudah ditutup
+SESSION_STORE_IDLE_TTL_S = float(os.environ.get("MELON_SESSION_STORE_IDLE_TTL_S", 3600))
+
+
+def _payload_nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    raise TypeError(f"Session store hanya menyimpan bytes atau numpy.ndarray, bukan {type(value).__name__}.")
+
+
+class PayloadRef:
+    """
+    Referensi kecil ke satu payload di SessionPayloadStore, untuk disimpan di
+    st.session_state. Payload dilepas dari store saat referensinya tidak dipakai lagi
+    (ditimpa, dihapus, atau sesi Streamlit ditutup).
+    """
+    __slots__ = ("entry_id", "session_id", "nbytes", "__weakref__")
+
+    def __init__(self, entry_id, session_id, nbytes):
+        self.entry_id = entry_id
+        self.session_id = session_id
+        self.nbytes = nbytes
+
+    def __repr__(self):
+        return f"PayloadRef({self.entry_id}, {self.nbytes} bytes)"
+
+
+class _Entry:
+    __slots__ = ("session_id", "nbytes", "value", "path", "kind", "dtype", "shape", "last_used")
+
+    def __init__(self, session_id, value):
+        self.session_id = session_id
+        self.nbytes = _payload_nbytes(value)
+        self.value = value
+        self.path = None
+        self.kind = "ndarray" if isinstance(value, np.ndarray) else "bytes"
+        self.dtype = value.dtype if self.kind == "ndarray" else None
+        self.shape = value.shape if self.kind == "ndarray" else None
+        self.last_used = time.monotonic()
+
+
+class SessionPayloadStore:
+    """
+    Store payload bersama dengan anggaran memori global, batas per sesi, spill ke disk
+    dan eviksi LRU. Aman dipanggil dari banyak thread.
+
+    Args:
+        memory_budget_bytes (int): Total payload yang boleh berada di memori.
+        session_budget_bytes (int): Payload satu sesi yang boleh berada di memori.
+        spill_dir (str): Folder file spill.
+        disk_budget_bytes (int): Total ukuran file spill sebelum payload tertua dibuang.
+        idle_ttl_s (float): Payload yang tidak dipakai selama ini dibuang.
+    """
+
+    def __init__(self, memory_budget_bytes, session_budget_bytes, spill_dir, disk_budget_bytes,
+                 idle_ttl_s=SESSION_STORE_IDLE_TTL_S):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.session_budget_bytes = session_budget_bytes
+        self.spill_dir = spill_dir
+        self.disk_budget_bytes = disk_budget_bytes
+        self.idle_ttl_s = idle_ttl_s
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._memory_lru = OrderedDict() # entry_id -> None, urutan dari yang paling lama dipakai
+        self._disk_lru = OrderedDict()
+        self._session_memory = {}
+        self._session_total = {}
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._next_id = 0
+        # Diisi finalizer PayloadRef tanpa mengambil lock (GC bisa berjalan kapan saja,
+        # termasuk saat lock sedang dipegang thread yang sama); diproses pada operasi berikutnya
+        self._released = deque()
+        self._last_sweep = time.monotonic()
+        self.spills = 0
+        self.evictions = 0
+
+    # --- API ---
+
+    def put(self, session_id, value):
+        """
+        Menyimpan `value` (bytes atau numpy.ndarray) milik `session_id` dan mengembalikan
+        PayloadRef-nya. Payload lain (milik sesi ini dulu, lalu global) dipindah ke disk
+        jika anggaran memori terlampaui.
+        """
+        if isinstance(value, np.ndarray):
+            # Payload dibagi lewat referensi: yang disimpan adalah view read-only, sehingga
+            # array milik pemanggil tetap bisa ditulis dan pembaca store tidak bisa mengubahnya
+            value = value.view()
+            value.setflags(write=False)
+        entry = _Entry(session_id, value)
+        with self._lock:
+            self._process_released()
+            entry_id = f"{self._next_id:x}"
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._memory_lru[entry_id] = None
+            self._memory_bytes += entry.nbytes
+            self._session_memory[session_id] = self._session_memory.get(session_id, 0) + entry.nbytes
+            self._session_total[session_id] = self._session_total.get(session_id, 0) + entry.nbytes
+            self._enforce_budgets(session_id, keep=entry_id)
+            self._sweep_idle()
+            self._publish_gauges()
+        ref = PayloadRef(entry_id, session_id, entry.nbytes)
+        weakref.finalize(ref, self._released.append, entry_id)
+        return ref
+
+    def get(self, ref):
+        """
+        Payload untuk `ref`, dimuat ulang dari disk jika sudah di-spill. None jika payload
+        sudah dibuang (batas disk atau TTL terlampaui).
+        """
+        if ref is None:
+            return None
+        with self._lock:
+            self._process_released()
+            entry = self._entries.get(ref.entry_id)
+            if entry is None:
+                return None
+            entry.last_used = time.monotonic()
+            if entry.value is not None:
+                self._memory_lru.move_to_end(ref.entry_id)
+                return entry.value
+            value = self._load_spilled(ref.entry_id, entry)
+            self._enforce_budgets(entry.session_id, keep=ref.entry_id)
+            self._publish_gauges()
+            return value
+
+    def release(self, entry_id):
+        self._released.append(entry_id)
+        with self._lock:
+            self._process_released()
+            self._publish_gauges()
+
+    def stats(self):
+        """
+        Returns:
+            dict: {"memory_bytes", "disk_bytes", "entries", "spills", "evictions",
+                   "sessions": {session_id: {"memory_bytes", "total_bytes"}}}
+        """
+        with self._lock:
+            self._process_released()
+            return {
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "entries": len(self._entries),
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "sessions": {session_id: {"memory_bytes": self._session_memory.get(session_id, 0),
+                                          "total_bytes": total}
+                             for session_id, total in self._session_total.items()},
+            }
+
+    # --- Internal (dipanggil dengan self._lock dipegang) ---
+
+    def _enforce_budgets(self, session_id, keep):
+        # Batas per sesi lebih dulu, agar satu pengguna dengan banyak gambar tidak
+        # mendorong payload pengguna lain ke disk
+        for entry_id in list(self._memory_lru):
+            if self._session_memory.get(session_id, 0) <= self.session_budget_bytes:
+                break
+            if entry_id != keep and self._entries[entry_id].session_id == session_id:
+                self._spill(entry_id)
+        for entry_id in list(self._memory_lru):
+            if self._memory_bytes <= self.memory_budget_bytes:
+                break
+            if entry_id != keep:
+                self._spill(entry_id)
+        while self._disk_bytes > self.disk_budget_bytes and self._disk_lru:
+            entry_id = next(iter(self._disk_lru))
+            self._drop(entry_id, self._entries.pop(entry_id))
+            self.evictions += 1
+            increment("session_store_evictions")
+
+    def _process_released(self):
+        while self._released:
+            entry_id = self._released.popleft()
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                self._drop(entry_id, entry)
+
+    def _spill(self, entry_id):
+        entry = self._entries[entry_id]
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{os.getpid()}_{entry_id}.bin")
+        with open(path, 'wb') as f:
+            f.write(memoryview(np.ascontiguousarray(entry.value)) if entry.kind == "ndarray" else entry.value)
+        entry.path = path
+        entry.value = None
+        del self._memory_lru[entry_id]
+        self._disk_lru[entry_id] = None
+        self._memory_bytes -= entry.nbytes
+        self._session_memory[entry.session_id] -= entry.nbytes
+        self._disk_bytes += entry.nbytes
+        self.spills += 1
+        increment("session_store_spills")
+
+    def _load_spilled(self, entry_id, entry):
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+        value = data
+        if entry.kind == "ndarray":
+            value = np.frombuffer(data, dtype=entry.dtype).reshape(entry.shape)
+        self._remove_file(entry)
+        del self._disk_lru[entry_id]
+        self._disk_bytes -= entry.nbytes
+        entry.value = value
+        self._memory_lru[entry_id] = None
+        self._memory_bytes += entry.nbytes
+        self._session_memory[entry.session_id] = self._session_memory.get(entry.session_id, 0) + entry.nbytes
+        return value
+
+    def _drop(self, entry_id, entry):
+        if entry.value is not None:
+            self._memory_lru.pop(entry_id, None)
+            self._memory_bytes -= entry.nbytes
+            self._session_memory[entry.session_id] -= entry.nbytes
+        else:
+            self._disk_lru.pop(entry_id, None)
+            self._disk_bytes -= entry.nbytes
+            self._remove_file(entry)
+        entry.value = None
+        self._session_total[entry.session_id] -= entry.nbytes
+        if self._session_total[entry.session_id] <= 0:
+            self._session_total.pop(entry.session_id, None)
+            self._session_memory.pop(entry.session_id, None)
+
+    @staticmethod
+    def _remove_file(entry):
+        if entry.path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            entry.path = None
+
+    def _sweep_idle(self):
+        # Cadangan jika finalizer PayloadRef tidak terpanggil (misalnya sesi ditutup
+        # tetapi objek state-nya belum dibersihkan GC); dicek paling sering sekali per menit
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for entry_id, entry in list(self._entries.items()):
+            if now - entry.last_used > self.idle_ttl_s:
+                self._drop(entry_id, self._entries.pop(entry_id))
+                self.evictions += 1
+
+    def _publish_gauges(self):
+        set_gauge("session_store_memory_bytes", self._memory_bytes)
+        set_gauge("session_store_disk_bytes", self._disk_bytes)
+        set_gauge("session_store_sessions", len(self._session_total))
+
+
+# Store bersama untuk seluruh proses (modul hanya diimpor sekali)
+SESSION_STORE = SessionPayloadStore(int(SESSION_STORE_MEMORY_MB * 1024 * 1024),
+                                    int(SESSION_STORE_SESSION_MB * 1024 * 1024),
+                                    SESSION_STORE_DIR, int(SESSION_STORE_DISK_MB * 1024 * 1024))
+
+
+def _current_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "no-session"
+
+def store_payload(value):
+    """
+    Menyimpan payload milik sesi Streamlit saat ini dan mengembalikan PayloadRef-nya
+    (None jika `value` None).
+    """
+    if value is None:
+        return None
+    return SESSION_STORE.put(_current_session_id(), value)
+
+def load_payload(ref):
+    """
+    Payload untuk `ref` (dari `store_payload`), atau None jika `ref` None atau payload
+    sudah dibuang dari store.
+    """
+    return SESSION_STORE.get(ref)
+
+def set_session_payload(key, value):
+    """
+    Seperti `st.session_state[key] = value`, tetapi yang disimpan di session_state hanya
+    referensinya. Payload lama di `key` otomatis dilepas.
+    """
+    st.session_state[key] = store_payload(value)
+
+def get_session_payload(key):
+    """
+    Kebalikan `set_session_payload`. Jika payload sudah dibuang dari store,
+    `st.session_state[key]` dikosongkan dan None dikembalikan.
+    """
+    ref = st.session_state.get(key)
+    if ref is None:
+        return None
+    value = load_payload(ref)
+    if value is None:
+        st.session_state[key] = None
+    return value
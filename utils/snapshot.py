@@ -0,0 +1,160 @@
+import datetime
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from utils.persistence import get_write_queue
+from utils.engine import raw_detections_to_record
+
+# Folder penyimpanan snapshot webcam (sama dengan gambar unggahan)
+SNAPSHOT_DIR = "temp_images"
+
+
+def diagnosis_key(summary):
+    """
+    Kunci diagnosis dari hasil `MelonDiseaseEngine.postprocess`, untuk membandingkan
+    apakah diagnosis antar-frame berubah (misal dari 'Daun Sehat' menjadi 'Downy_Mildew').
+    """
+    if summary["detected_disease_names"]:
+        return tuple(sorted(summary["detected_disease_names"]))
+    return tuple(summary["diseases"])
+
+
+def save_frame(username, frame_rgb, summary, raw_detections=None, source="webcam"):
+    """
+    Meng-encode satu frame RGB ke JPEG lalu menyerahkannya ke antrean write-behind
+    (utils/persistence.py) sebagai hasil deteksi. `source` menjadi akhiran nama file
+    (misalnya "webcam" atau "video").
+    """
+    ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR),
+                               [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise ValueError("Gagal meng-encode frame ke JPEG.")
+
+    filename = f"{username}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{source}.jpg"
+    image_path = os.path.join(SNAPSHOT_DIR, filename)
+
+    # Penulisan file dan insert ke database digabung dalam batch oleh antrean write-behind
+    get_write_queue().submit(username, image_path, summary["diseases"], summary["avg_confidence"],
+                             summary["keterangan"], image_bytes=encoded.tobytes(),
+                             **raw_detections_to_record(raw_detections, frame_rgb.shape, summary.get("threshold")))
+
+
+class SnapshotPolicy:
+    """
+    Kebijakan simpan otomatis snapshot webcam (satu objek per sesi stream).
+
+    Snapshot disimpan hanya jika diagnosis sudah stabil selama `stable_frames` hasil
+    inferensi berturut-turut, dan:
+    - diagnosis tersebut berbeda dari snapshot terakhir, atau
+    - sudah lewat `resave_interval_s` detik sejak snapshot terakhir.
+    Selain itu jarak antar-snapshot minimal `min_interval_s` detik dan jumlahnya
+    dibatasi `max_snapshots` per sesi.
+    """
+
+    def __init__(self, stable_frames=10, min_interval_s=5.0, resave_interval_s=60.0, max_snapshots=20):
+        self.stable_frames = stable_frames
+        self.min_interval_s = min_interval_s
+        self.resave_interval_s = resave_interval_s
+        self.max_snapshots = max_snapshots
+
+        self.saved_count = 0
+        self._current_key = None
+        self._streak = 0
+        self._last_saved_key = None
+        self._last_saved_at = None
+
+    def should_save(self, key, now=None):
+        """
+        Mencatat satu hasil inferensi dengan diagnosis `key` dan memutuskan apakah
+        frame ini perlu disimpan. Jika True, dianggap sudah disimpan.
+        """
+        now = time.monotonic() if now is None else now
+
+        if key == self._current_key:
+            self._streak += 1
+        else:
+            self._current_key = key
+            self._streak = 1
+
+        if self.saved_count >= self.max_snapshots or self._streak < self.stable_frames:
+            return False
+
+        if self._last_saved_at is not None:
+            elapsed = now - self._last_saved_at
+            if elapsed < self.min_interval_s:
+                return False
+            if key == self._last_saved_key and elapsed < self.resave_interval_s:
+                return False
+
+        self._last_saved_key = key
+        self._last_saved_at = now
+        self.saved_count += 1
+        return True
+
+
+class SnapshotWriter:
+    """
+    Thread latar belakang yang melakukan encode JPEG untuk snapshot webcam lalu
+    menyerahkannya ke antrean write-behind (utils/persistence.py), sehingga I/O disk
+    dan database tidak pernah terjadi di dalam `recv`.
+
+    Antrean dibatasi `max_pending`; jika penuh, snapshot baru dibuang (bukan menunggu).
+    """
+
+    def __init__(self, max_pending=8):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._worker_loop, name="webcam-snapshot-writer", daemon=True)
+        self._thread.start()
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, username, frame_rgb, summary, raw_detections=None):
+        """
+        Menjadwalkan penyimpanan satu snapshot. Tidak pernah memblokir.
+        Mengembalikan False jika antrean penuh.
+        """
+        try:
+            self._queue.put_nowait((username, frame_rgb, summary, raw_detections))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _worker_loop(self):
+        while True:
+            username, frame_rgb, summary, raw_detections = self._queue.get()
+            try:
+                self._write_snapshot(username, frame_rgb, summary, raw_detections)
+                self.saved += 1
+            except Exception:
+                self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def _write_snapshot(self, username, frame_rgb, summary, raw_detections=None):
+        save_frame(username, frame_rgb, summary, raw_detections, source="webcam")
+
+    def flush(self):
+        """
+        Menunggu sampai semua snapshot di antrean selesai ditulis.
+        """
+        self._queue.join()
+
+
+_SNAPSHOT_WRITER = None
+_SNAPSHOT_WRITER_LOCK = threading.Lock()
+
+def get_snapshot_writer():
+    """
+    Writer snapshot bersama untuk seluruh proses (dibuat saat pertama kali dibutuhkan).
+    """
+    global _SNAPSHOT_WRITER
+    with _SNAPSHOT_WRITER_LOCK:
+        if _SNAPSHOT_WRITER is None:
+            _SNAPSHOT_WRITER = SnapshotWriter()
+        return _SNAPSHOT_WRITER
@@ -0,0 +1,44 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Folder thumbnail dan preview (di dalam folder gambar asli)
+THUMBNAIL_DIR = os.path.join("temp_images", "thumbs")
+
+# Ukuran maksimum (lebar, tinggi); rasio aspek gambar tetap dipertahankan
+THUMBNAIL_SIZE = (200, 200)
+PREVIEW_SIZE = (800, 800)
+
+
+def _thumbnail_paths(image_path):
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    return (os.path.join(THUMBNAIL_DIR, f"{base_name}_thumb.jpg"),
+            os.path.join(THUMBNAIL_DIR, f"{base_name}_preview.jpg"))
+
+def create_thumbnails(image_path, image_bytes=None):
+    """
+    Membuat thumbnail dan preview JPEG untuk satu gambar riwayat.
+    Jika `image_bytes` diberikan, gambar tidak perlu dibaca ulang dari disk.
+
+    Returns:
+        tuple: (thumbnail_path, preview_path)
+    """
+    thumbnail_path, preview_path = _thumbnail_paths(image_path)
+    source = io.BytesIO(image_bytes) if image_bytes is not None else image_path
+
+    with Image.open(source) as image:
+        # Decode JPEG langsung pada skala kecil (1/2, 1/4, 1/8) jika memungkinkan
+        image.draft('RGB', PREVIEW_SIZE)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        preview = image.copy()
+        preview.thumbnail(PREVIEW_SIZE)
+        preview.save(preview_path, format='JPEG', quality=85)
+
+        # Thumbnail dibuat dari preview yang sudah kecil, bukan dari gambar penuh
+        preview.thumbnail(THUMBNAIL_SIZE)
+        preview.save(thumbnail_path, format='JPEG', quality=80)
+
+    return thumbnail_path, preview_path
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Mode tiled untuk foto drone/DSLR beresolusi sangat tinggi: gambar dipotong menjadi
+# tile bertumpuk berukuran input model, sehingga lesi kecil tidak hilang karena gambar
+# dikecilkan, lalu kotak dari semua tile digabung kembali ke koordinat gambar utuh.
+
+# Skor minimum kotak yang ikut digabung. Pass mentah memakai conf=0.01; kotak di bawah
+# nilai ini tidak berguna untuk slider (langkah 5%) dan hanya memperlambat penggabungan.
+TILE_MERGE_MIN_SCORE = 0.05
+# Kotak yang ditekan hanya memperluas kotak yang dipertahankan jika skornya minimal
+# sebesar rasio ini terhadap skor kotak yang dipertahankan
+TILE_UNION_SCORE_RATIO = 0.5
+
+
+def tile_origins(length, tile_size, overlap):
+    """
+    Posisi awal tile di satu sumbu. Jarak antar-tile = tile_size * (1 - overlap); tile
+    terakhir digeser agar tepat berakhir di tepi gambar (tidak ada tile terpotong).
+    """
+    if length <= tile_size:
+        return [0]
+    stride = max(1, int(tile_size * (1 - overlap)))
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """
+    Daftar tile (x0, y0, x1, y1) yang menutupi seluruh gambar dengan tumpang tindih `overlap`.
+    """
+    return [(x0, y0, min(width, x0 + tile_size), min(height, y0 + tile_size))
+            for y0 in tile_origins(height, tile_size, overlap)
+            for x0 in tile_origins(width, tile_size, overlap)]
+
+def _overlapping_tile_pairs(tiles):
+    # Pasangan tile (a, b), a < b, yang persegi panjangnya bertumpuk, beserta area tumpang tindihnya
+    rects = np.asarray(tiles, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(rects[:, None, :2], rects[None, :, :2])
+    bottom_right = np.minimum(rects[:, None, 2:], rects[None, :, 2:])
+    overlapping = np.all(bottom_right > top_left, axis=2)
+    first, second = np.nonzero(np.triu(overlapping, k=1))
+    bands = np.concatenate([top_left[first, second], bottom_right[first, second]], axis=1)
+    return first, second, bands
+
+def merge_across_tiles(boxes, scores, class_ids, tile_ids, tiles, ios_threshold=0.6,
+                       min_score=TILE_MERGE_MIN_SCORE, union_score_ratio=TILE_UNION_SCORE_RATIO):
+    """
+    Menggabungkan deteksi dari tile yang bertumpuk. NMS di dalam satu tile sudah dilakukan
+    oleh model, jadi di sini hanya pasangan dari tile BERBEDA dengan kelas sama yang
+    dibandingkan. Ukurannya intersection-over-smaller (IoS), karena lesi yang terpotong
+    sambungan tile menghasilkan kotak parsial yang hampir seluruhnya berada di dalam
+    kotak utuh dari tile tetangga (IoU-nya kecil).
+
+    Dua kotak dari tile berbeda hanya bisa beririsan di area tumpang tindih kedua tile,
+    jadi yang dibandingkan hanya kotak di pita sambungan tile yang bertetangga (bukan
+    semua pasangan kotak di seluruh gambar). Kotak dengan skor di bawah `min_score`
+    dibuang lebih dulu. Kotak dengan skor tertinggi dipertahankan; kotak yang ditekannya
+    hanya ikut memperluas kotak itu jika skornya sebanding (>= `union_score_ratio` x skor
+    kotak yang dipertahankan), sehingga kotak samar di sambungan tidak meregangkannya.
+
+    Args:
+        tiles (list): (x0, y0, x1, y1) per tile, diindeks oleh `tile_ids`.
+
+    Returns:
+        tuple: (boxes, scores, class_ids) hasil gabungan, urut skor menurun.
+    """
+    confident = scores >= min_score
+    order = np.argsort(-scores[confident], kind="stable")
+    boxes = boxes[confident][order].astype(np.float32)
+    scores, class_ids, tile_ids = scores[confident][order], class_ids[confident][order], tile_ids[confident][order]
+    areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+    # Kandidat pasangan (i, j) dengan i berskor lebih tinggi (indeks lebih kecil) dari j
+    by_tile = {tile_id: np.flatnonzero(tile_ids == tile_id) for tile_id in np.unique(tile_ids)}
+    pairs_i, pairs_j = [], []
+    for tile_a, tile_b, band in zip(*_overlapping_tile_pairs(tiles)):
+        if tile_a not in by_tile or tile_b not in by_tile:
+            continue
+        in_band = []
+        for members in (by_tile[tile_a], by_tile[tile_b]):
+            member_boxes = boxes[members]
+            in_band.append(members[(member_boxes[:, 0] < band[2]) & (member_boxes[:, 2] > band[0]) &
+                                   (member_boxes[:, 1] < band[3]) & (member_boxes[:, 3] > band[1])])
+        first, second = in_band
+        if not len(first) or not len(second):
+            continue
+        top_left = np.maximum(boxes[first, None, :2], boxes[None, second, :2])
+        bottom_right = np.minimum(boxes[first, None, 2:], boxes[None, second, 2:])
+        intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+        ios = intersection / np.maximum(np.minimum(areas[first, None], areas[None, second]), 1e-9)
+        matched = (ios >= ios_threshold) & (class_ids[first, None] == class_ids[None, second])
+        rows, cols = np.nonzero(matched)
+        pairs_i.append(np.minimum(first[rows], second[cols]))
+        pairs_j.append(np.maximum(first[rows], second[cols]))
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    if pairs_i:
+        pairs_i, pairs_j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+        pair_order = np.lexsort((pairs_j, pairs_i))
+        pairs_i, pairs_j = pairs_i[pair_order], pairs_j[pair_order]
+        starts = np.searchsorted(pairs_i, np.arange(len(boxes) + 1))
+        merged_boxes = boxes.copy()
+        for i in np.unique(pairs_i):
+            if suppressed[i]:
+                continue
+            merged = pairs_j[starts[i]:starts[i + 1]]
+            merged = merged[~suppressed[merged]]
+            if not len(merged):
+                continue
+            suppressed[merged] = True
+            comparable = merged[scores[merged] >= union_score_ratio * scores[i]]
+            if len(comparable):
+                merged_boxes[i, :2] = np.minimum(boxes[i, :2], boxes[comparable, :2].min(axis=0))
+                merged_boxes[i, 2:] = np.maximum(boxes[i, 2:], boxes[comparable, 2:].max(axis=0))
+        boxes = merged_boxes
+
+    keep = ~suppressed
+    return boxes[keep], scores[keep], class_ids[keep]
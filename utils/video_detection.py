@@ -0,0 +1,304 @@
+import streamlit as st
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import cv2
+
+from utils.model import ENGINE, require_model
+from utils.engine import MelonDiseaseEngine
+from utils.ingest import INGEST_MAX_SIDE
+from utils.metrics import span
+from utils.model_server import InferenceServerBusy
+from utils.snapshot import diagnosis_key, save_frame
+from utils.session_store import store_payload, load_payload
+
+# --- Pengaturan Mode Video ---
+# Jarak default antar-frame yang dianalisis (detik) pada mode interval
+VIDEO_SAMPLE_INTERVAL_S = 1.0
+# Mode perubahan adegan: frame diperiksa setiap VIDEO_SCENE_CHECK_INTERVAL_S detik dan dianalisis
+# jika rata-rata selisih piksel (skala abu-abu 64x36, 0..1) dari frame terakhir yang dianalisis
+# melebihi ambang ini
+VIDEO_SCENE_CHECK_INTERVAL_S = 0.25
+VIDEO_SCENE_THRESHOLD = 0.12
+# Jumlah frame per forward pass dan jumlah frame hasil decode yang boleh menunggu di antrean
+VIDEO_BATCH_SIZE = 8
+VIDEO_PREFETCH_FRAMES = 16
+# Batas jumlah key frame (awal setiap segmen diagnosis) per video
+VIDEO_MAX_KEY_FRAMES = 30
+# Sisi terpanjang thumbnail key frame (disimpan di session store, lihat utils/session_store.py)
+KEY_FRAME_THUMB_SIDE = 320
+
+VIDEO_TYPES = ['mp4', 'avi', 'mov', 'mkv']
+
+
+def iter_sampled_frames(video_path, interval_s=VIDEO_SAMPLE_INTERVAL_S, scene_change=False,
+                        scene_threshold=VIDEO_SCENE_THRESHOLD, max_side=INGEST_MAX_SIDE):
+    """
+    Membaca video sebagai stream dengan OpenCV dan menghasilkan frame yang dipilih,
+    tanpa pernah memuat seluruh video ke memori. Frame yang tidak dipilih hanya di-`grab`
+    (tanpa decode penuh ke array).
+
+    Yields:
+        tuple: (timestamp detik, frame RGB dengan sisi terpanjang <= max_side)
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError("Video tidak dapat dibuka. Pastikan format dan codec-nya didukung.")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    step = max(1, round(fps * (VIDEO_SCENE_CHECK_INTERVAL_S if scene_change else interval_s)))
+
+    frame_index = 0
+    last_signature = None
+    try:
+        while True:
+            if frame_index % step:
+                if not capture.grab():
+                    break
+                frame_index += 1
+                continue
+            ok, frame_bgr = capture.read()
+            if not ok:
+                break
+            timestamp = frame_index / fps
+            frame_index += 1
+
+            if scene_change:
+                signature = cv2.resize(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY), (64, 36),
+                                       interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+                if last_signature is not None and np.abs(signature - last_signature).mean() < scene_threshold:
+                    continue
+                last_signature = signature
+
+            frame_bgr, _ = MelonDiseaseEngine.resize_for_inference(frame_bgr, max_side)
+            yield timestamp, cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
+
+def video_duration_s(video_path):
+    capture = cv2.VideoCapture(video_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        return capture.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    finally:
+        capture.release()
+
+def prefetch(iterable, max_pending=VIDEO_PREFETCH_FRAMES):
+    """
+    Menjalankan `iterable` (decode video) di thread latar belakang dengan antrean terbatas,
+    sehingga decode dan inferensi berjalan bersamaan sementara memori tetap dibatasi
+    `max_pending` frame. Exception dari thread decode diteruskan ke pemanggil.
+    """
+    items = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Put dengan timeout agar thread tidak macet selamanya jika konsumen sudah berhenti
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            # Menutup generator decode menjalankan blok finally-nya (capture.release())
+            # di thread ini juga, termasuk saat konsumen berhenti lebih awal
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=producer, name="video-decode", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Konsumen berhenti lebih awal (error atau selesai): hentikan thread decode dan tunggu
+        # sampai selesai (put-nya berhenti dalam 0,1 detik), agar sumbernya sudah ditutup
+        stop.set()
+        thread.join()
+
+@contextmanager
+def video_detections(video_path, batch_size=VIDEO_BATCH_SIZE, **sampling):
+    """
+    Pipeline video: decode + sampling (thread latar belakang) -> inferensi micro-batch.
+    Saat blok `with` selesai (termasuk karena error atau skrip dihentikan), thread decode
+    dihentikan dan ditunggu sampai capture dilepas, sehingga file video aman dihapus.
+
+        with video_detections(path, interval_s=1.0) as detections:
+            for timestamp, frame, raw_detections in detections: ...
+
+    Yields:
+        iterator: (timestamp detik, frame RGB, deteksi mentah) sesuai urutan waktu.
+    """
+    decoded = prefetch(iter_sampled_frames(video_path, **sampling))
+    timestamps = {}
+
+    def frames():
+        for index, (timestamp, frame) in enumerate(decoded):
+            timestamps[index] = timestamp
+            yield frame
+
+    def detections():
+        for index, frame, raw_detections in ENGINE.infer_batch(frames(), batch_size, use_cache=False):
+            yield timestamps.pop(index), frame, raw_detections
+
+    try:
+        yield detections()
+    finally:
+        decoded.close() # Menghentikan dan menunggu thread decode (lihat `prefetch`)
+
+def _format_timestamp(seconds):
+    return f"{int(seconds // 60):02d}:{seconds % 60:04.1f}"
+
+def _class_confidences(summary):
+    # Keyakinan tertinggi per kelas pada satu frame, untuk grafik timeline
+    confidences = {}
+    for label, conf, _ in summary["disease_boxes"]:
+        confidences[label] = max(conf, confidences.get(label, 0.0))
+    if not confidences and summary["diseases"] == ["Daun Sehat"]:
+        confidences["Daun Sehat"] = summary["avg_confidence"]
+    return confidences
+
+
+def analyze_video(video_path, video_name, confidence_threshold, interval_s, scene_change, save_key_frames):
+    """
+    Menganalisis satu video dan mengembalikan timeline diagnosis, data grafik per kelas
+    dan key frame (awal setiap segmen diagnosis). Key frame disimpan ke riwayat lewat
+    antrean write-behind jika `save_key_frames` True.
+    """
+    duration = video_duration_s(video_path)
+    progress = st.progress(0.0, text="Menganalisis video...")
+
+    segments = []
+    chart_rows = []
+    key_frames = []
+    saved_count = 0
+    last_key = None
+    with video_detections(video_path, interval_s=interval_s, scene_change=scene_change) as detections:
+        for timestamp, frame, raw_detections in detections:
+            summary = ENGINE.postprocess(raw_detections, confidence_threshold)
+            chart_rows.append({"Detik": round(timestamp, 2), **_class_confidences(summary)})
+
+            key = diagnosis_key(summary)
+            if key == last_key:
+                segments[-1]["end"] = timestamp
+            else:
+                last_key = key
+                segments.append({"start": timestamp, "end": timestamp, "diagnosis": ", ".join(key),
+                                 "confidence": summary["avg_confidence"]})
+                if len(key_frames) < VIDEO_MAX_KEY_FRAMES:
+                    annotated = ENGINE.annotate(frame, summary)
+                    thumb, _ = MelonDiseaseEngine.resize_for_inference(annotated, KEY_FRAME_THUMB_SIDE)
+                    key_frames.append({"timestamp": timestamp, "diagnosis": ", ".join(summary["diseases"]),
+                                       "image": store_payload(thumb)})
+                    if save_key_frames:
+                        save_frame(st.session_state['username'], frame, summary, raw_detections, source="video")
+                        saved_count += 1
+
+            if duration > 0:
+                progress.progress(min(1.0, timestamp / duration),
+                                  text=f"Menganalisis video... {_format_timestamp(timestamp)} / {_format_timestamp(duration)}")
+    progress.empty()
+
+    return {
+        "video_name": video_name,
+        "threshold_used": confidence_threshold,
+        "segments": segments,
+        "chart_rows": chart_rows,
+        "key_frames": key_frames,
+        "saved_count": saved_count,
+    }
+
+def display_video_results(result):
+    st.subheader(f"Timeline Diagnosis: {result['video_name']}")
+    if not result["segments"]:
+        st.warning("Tidak ada frame yang berhasil dianalisis dari video ini.")
+        return
+
+    chart_df = pd.DataFrame(result["chart_rows"]).set_index("Detik").fillna(0.0)
+    if len(chart_df.columns):
+        st.line_chart(chart_df)
+
+    st.dataframe(pd.DataFrame([{
+        "Mulai": _format_timestamp(segment["start"]),
+        "Selesai": _format_timestamp(segment["end"]),
+        "Diagnosis": segment["diagnosis"],
+        "Keyakinan Awal": f"{segment['confidence']*100:.1f}%",
+    } for segment in result["segments"]]), use_container_width=True)
+
+    st.subheader("Key Frame")
+    columns = st.columns(4)
+    for index, key_frame in enumerate(result["key_frames"]):
+        image = load_payload(key_frame["image"])
+        if image is None:
+            continue # Sudah dibuang dari session store
+        with columns[index % 4]:
+            with span("render"):
+                st.image(image, caption=f"{_format_timestamp(key_frame['timestamp'])} - {key_frame['diagnosis']}",
+                         use_container_width=True)
+    if result["saved_count"]:
+        st.success(f"{result['saved_count']} key frame telah disimpan ke riwayat Anda.")
+
+
+def handle_video_detection():
+    """
+    Menangani unggah video rekaman (misalnya jalan menyusuri bedengan greenhouse): frame
+    diambil per interval waktu atau saat adegan berubah, dianalisis dalam batch, lalu
+    ditampilkan sebagai timeline diagnosis beserta key frame-nya.
+    """
+    st.header("Deteksi Penyakit dari Video")
+    st.write("Unggah video rekaman daun melon untuk dianalisis per potongan waktu.")
+
+    if not require_model():
+        return
+
+    uploaded_video = st.file_uploader("Pilih video dari perangkat Anda", type=VIDEO_TYPES, key="video_uploader")
+    sampling_mode = st.radio("Pengambilan frame", ["Interval waktu", "Perubahan adegan"], horizontal=True,
+                             key="video_sampling_mode")
+    interval_s = VIDEO_SAMPLE_INTERVAL_S
+    if sampling_mode == "Interval waktu":
+        interval_s = st.slider("Interval (detik)", min_value=0.2, max_value=10.0, value=VIDEO_SAMPLE_INTERVAL_S,
+                               step=0.2, key="video_interval_s")
+    save_key_frames = st.checkbox("Simpan key frame ke riwayat", value=True, key="video_save_key_frames")
+
+    if uploaded_video is not None and st.button("Analisis Video", use_container_width=True):
+        # OpenCV membutuhkan path file; video ditulis ke file sementara secara bertahap
+        suffix = os.path.splitext(uploaded_video.name)[1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_video:
+            shutil.copyfileobj(uploaded_video, temp_video, length=1024 * 1024)
+            video_path = temp_video.name
+        try:
+            st.session_state['video_detection_result'] = analyze_video(
+                video_path, uploaded_video.name, st.session_state.get('confidence_threshold', 0.5),
+                interval_s, sampling_mode == "Perubahan adegan", save_key_frames)
+        except ValueError as e:
+            st.error(str(e))
+        except InferenceServerBusy as e:
+            st.warning(str(e))
+        finally:
+            os.remove(video_path)
+
+    if st.session_state.get('video_detection_result'):
+        display_video_results(st.session_state['video_detection_result'])
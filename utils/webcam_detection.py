@@ -2,11 +2,19 @@ import streamlit as st
 import cv2
 import datetime
 import os
+import time
 from PIL import Image
 
 # Impor dari utils (modul lain di folder yang sama)
-from utils.model import predict_melon_disease, MODEL
+from utils.model import ENGINE, WEBCAM_LATENCY_BUDGET_MS, require_model
 from utils.database import save_detection
+from utils.frame_scheduler import LatestFrameScheduler
+from utils.snapshot import SnapshotPolicy, diagnosis_key, get_snapshot_writer
+from utils.metrics import observe
+
+# Batas atas laju inferensi webcam (frame per detik). Video tetap mengalir pada laju kamera,
+# sementara kotak deteksi diperbarui secepat yang sanggup dilakukan perangkat keras.
+WEBCAM_TARGET_INFERENCE_FPS = 5.0
 
 # Pustaka Tambahan untuk Webcam Real-time
 # PERHATIAN: Baris impor ini sangat penting untuk kompatibilitas versi Python 3.12 dan streamlit-webrtc 0.63.3
@@ -33,56 +41,79 @@ def handle_webcam_detection():
 
     if not WEBRTC_AVAILABLE:
         st.error("Fitur webcam tidak tersedia. Silakan instal `streamlit-webrtc`.")
-    elif MODEL is None:
-        st.error("Model AI belum dimuat. Fitur webcam tidak dapat berfungsi tanpa model.")
-    else:
+    elif require_model():
+        # Ditangkap di thread skrip agar bisa dipakai oleh thread inferensi/penulis snapshot
+        username = st.session_state['username']
+        auto_save_enabled = st.checkbox("Simpan snapshot otomatis ke riwayat", value=True,
+                                        key="webcam_auto_save")
+
         # Kelas VideoProcessor untuk Deteksi Real-time
         # Kelas ini akan memproses setiap frame video yang datang dari webcam
         class MelonDiseaseProcessor(VideoProcessorBase):
             def __init__(self):
-                self.model = MODEL
                 self.confidence_threshold = st.session_state.get('confidence_threshold', 0.5)
+                # Inferensi berjalan di thread latar belakang; recv hanya mengirim frame terbaru
+                # dan menggambar kotak dari hasil terakhir yang sudah selesai.
+                self.scheduler = LatestFrameScheduler(
+                    self._infer_frame,
+                    target_fps=st.session_state.get('webcam_target_fps', WEBCAM_TARGET_INFERENCE_FPS)
+                ).start()
                 # Inisialisasi info deteksi di session state untuk webcam
                 if 'current_detection_info' not in st.session_state:
                     st.session_state['current_detection_info'] = None
-                # Flag untuk mencegah penyimpanan otomatis berulang pada setiap frame live
-                st.session_state['webcam_last_saved_detection'] = None 
+                # Kebijakan simpan otomatis per sesi stream: hanya saat diagnosis berubah dan
+                # stabil, dengan jarak minimum antar-snapshot dan batas jumlah per sesi.
+                self.snapshot_policy = SnapshotPolicy()
+                self.auto_save_enabled = auto_save_enabled
+
+            def _infer_frame(self, img_rgb):
+                # Dipanggil oleh thread penjadwal, bukan oleh recv.
+                # Frame video tidak pernah berulang, jadi cache inferensi tidak dipakai.
+                # imgsz dipilih adaptif agar tetap dalam anggaran latensi saat CPU sibuk.
+                raw_detections = ENGINE.infer(img_rgb, use_cache=False, latency_budget_ms=WEBCAM_LATENCY_BUDGET_MS)
+                summary = ENGINE.postprocess(raw_detections, self.confidence_threshold)
+
+                # Encode JPEG dan save_detection dikerjakan thread penulis snapshot, bukan di sini
+                if self.auto_save_enabled and self.snapshot_policy.should_save(diagnosis_key(summary)):
+                    get_snapshot_writer().submit(username, img_rgb, summary, raw_detections)
+                return summary
 
             def recv(self, frame):
+                started = time.perf_counter()
                 img = frame.to_ndarray(format="bgr24") # Mengambil frame sebagai numpy array (BGR)
                 img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) # Konversi ke RGB untuk model
 
                 # Ambil nilai threshold terbaru dari session state di setiap frame
                 self.confidence_threshold = st.session_state.get('confidence_threshold', 0.5)
 
-                annotated_img, diseases, avg_confidence, keterangan = \
-                    predict_melon_disease(img_rgb, self.confidence_threshold)
+                self.scheduler.submit(img_rgb)
+                summary = self.scheduler.latest_result()
+                if summary is None:
+                    # Belum ada hasil inferensi: teruskan frame apa adanya
+                    return frame
+
+                # Gambar kotak deteksi terakhir di atas frame saat ini
+                annotated_img = ENGINE.annotate(img_rgb, summary)
                 
-                # Simpan informasi deteksi terbaru ke session state
+                # Simpan informasi deteksi terbaru ke session state (tanpa frame: frame beranotasi
+                # hanya dikirim ke stream, tidak disalin ke session state di setiap frame)
                 st.session_state['current_detection_info'] = {
-                    "diseases": diseases,
-                    "avg_confidence": avg_confidence,
-                    "keterangan": keterangan, 
-                    "annotated_frame": cv2.cvtColor(annotated_img, cv2.COLOR_RGB2BGR) # Simpan dalam BGR untuk st.image jika perlu
+                    "diseases": summary["diseases"],
+                    "avg_confidence": summary["avg_confidence"],
+                    "keterangan": summary["keterangan"], 
                 }
                 st.session_state['last_detection_source'] = 'webcam_live' 
                 
-                # --- LOGIKA SIMPAN OTOMATIS WEBCAM (PERHATIAN!) ---
-                # Ini adalah tempat di mana Anda bisa mengimplementasikan simpan otomatis.
-                # Namun, SANGAT DISARANKAN untuk tidak menyimpan setiap frame.
-                # Anda perlu logika yang jauh lebih canggih di sini, seperti:
-                # - Simpan hanya jika deteksi berubah signifikan (misal: dari 'Sehat' jadi 'Penyakit').
-                # - Simpan hanya setiap N detik (misal: 5 detik sekali).
-                # - Batasi jumlah total simpan otomatis per sesi.
-
-                # Contoh sangat sederhana (dan berpotensi sangat boros): simpan jika deteksi berubah
-                # if st.session_state['webcam_last_saved_detection'] != st.session_state['current_detection_info']:
-                #     # Lakukan proses penyimpanan di sini. Ini akan memicu I/O disk dan DB yang banyak.
-                #     # Untuk demonstrasi, ini akan menyebabkan banyak entri riwayat.
-                #     pass 
-                # st.session_state['webcam_last_saved_detection'] = st.session_state['current_detection_info'] # Update flag
-
-                return frame.from_ndarray(cv2.cvtColor(annotated_img, cv2.COLOR_RGB2BGR), format="bgr24")
+                # Simpan otomatis tidak dilakukan di sini: keputusan simpan ada di _infer_frame
+                # (SnapshotPolicy) dan I/O-nya di thread SnapshotWriter.
+
+                output_frame = frame.from_ndarray(cv2.cvtColor(annotated_img, cv2.COLOR_RGB2BGR), format="bgr24")
+                observe("webcam_frame", (time.perf_counter() - started) * 1000)
+                return output_frame
+
+            def on_ended(self):
+                # Hentikan thread inferensi saat stream webcam berakhir
+                self.scheduler.stop()
 
         webrtc_ctx = webrtc_streamer(
             key="melon_webcam_detection",
@@ -99,9 +130,33 @@ def handle_webcam_detection():
         )
 
 
+        target_fps = st.slider(
+            "Target Laju Inferensi (fps)",
+            min_value=1.0,
+            max_value=30.0,
+            value=float(st.session_state.get('webcam_target_fps', WEBCAM_TARGET_INFERENCE_FPS)),
+            step=1.0,
+            key="webcam_target_fps_slider"
+        )
+        st.session_state['webcam_target_fps'] = target_fps
+
         # --- Kontrol dan Tampilan Info Real-time ---
         if webrtc_ctx.state.playing:
             st.success("Deteksi real-time aktif! Arahkan kamera Anda ke daun melon.")
+
+            processor = webrtc_ctx.video_processor
+            if processor is not None:
+                processor.scheduler.target_fps = target_fps
+                scheduler_stats = processor.scheduler.stats()
+                st.caption(
+                    f"Kamera: {scheduler_stats['camera_fps']:.1f} fps | "
+                    f"Inferensi: {scheduler_stats['inference_fps']:.1f} fps "
+                    f"({scheduler_stats['avg_latency_ms']:.0f} ms, "
+                    f"imgsz {ENGINE.choose_imgsz(WEBCAM_LATENCY_BUDGET_MS)}) | "
+                    f"Frame dilewati: {scheduler_stats['drop_rate']*100:.0f}% | "
+                    f"Snapshot tersimpan: {processor.snapshot_policy.saved_count}/{processor.snapshot_policy.max_snapshots}"
+                )
+                processor.auto_save_enabled = auto_save_enabled
             
             # Tampilkan info deteksi terbaru yang diupdate dari processor
             if st.session_state['current_detection_info']: 